@@ -0,0 +1,39 @@
+"""基准测试公共工具：百分位统计和结果文件读写"""
+import json
+import math
+import statistics
+from pathlib import Path
+
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    """汇总延迟分布(秒)"""
+    if not latencies:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    return {
+        "mean": statistics.mean(latencies),
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies)
+    }
+
+
+def save_json(path, data):
+    """保存JSON结果"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def load_json(path):
+    """读取JSON结果"""
+    return json.loads(Path(path).read_text(encoding="utf-8"))
@@ -0,0 +1,106 @@
+"""旅行计划快速模式基准测试：对比多Agent模式与单次调用快速模式的延迟、token用量和成本
+
+用法:
+    python benchmarks/fast_mode_benchmark.py --iterations 5 --destination 西安
+    python benchmarks/fast_mode_benchmark.py --output fast_mode.json
+
+模型地址、密钥等取自环境变量（BASE_URL、API_KEY、MODEL_NAME），
+可指向真实的硅基流动接口，也可指向本地的OpenAI兼容服务。
+"""
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from common import percentile, save_json  # noqa: E402
+from whereeatai.agents.agent_manager import AgentManager  # noqa: E402
+from whereeatai.models.qwen_model import track_usage  # noqa: E402
+
+
+def run_mode(agent_manager, mode, input_data, iterations):
+    """
+    多次执行指定模式的旅行计划工作流
+
+    Returns:
+        每次执行的延迟和token用量列表
+    """
+    samples = []
+    for i in range(iterations):
+        with track_usage() as usage:
+            start = time.perf_counter()
+            result = agent_manager.execute_workflow("travel_plan", input_data, mode=mode)
+            elapsed = time.perf_counter() - start
+        samples.append({
+            "latency": elapsed,
+            "status": result.get("status"),
+            **usage.to_dict()
+        })
+        print(f"  [{mode}] #{i + 1}: {elapsed:.2f}s, 状态: {result.get('status')}, "
+              f"调用: {usage.calls}, tokens: {usage.total_tokens}")
+    return samples
+
+
+def summarize(samples, input_price, output_price):
+    """汇总统计，价格单位为 元/百万tokens"""
+    latencies = [s["latency"] for s in samples]
+    input_tokens = statistics.mean(s["input_tokens"] for s in samples)
+    output_tokens = statistics.mean(s["output_tokens"] for s in samples)
+    return {
+        "iterations": len(samples),
+        "success_rate": sum(1 for s in samples if s["status"] == "success") / len(samples),
+        "latency_mean": statistics.mean(latencies),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "llm_calls": statistics.mean(s["calls"] for s in samples),
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens,
+        "cost_per_plan": (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="旅行计划快速模式基准测试")
+    parser.add_argument("--iterations", type=int, default=3, help="每种模式执行次数")
+    parser.add_argument("--destination", default="西安")
+    parser.add_argument("--duration", default="3天2夜")
+    parser.add_argument("--interests", default="历史文化,美食")
+    parser.add_argument("--budget", default="中等")
+    parser.add_argument("--input-price", type=float, default=0.35, help="输入价格(元/百万tokens)")
+    parser.add_argument("--output-price", type=float, default=0.35, help="输出价格(元/百万tokens)")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    input_data = {
+        "destination": args.destination,
+        "duration": args.duration,
+        "interests": [i for i in args.interests.split(",") if i],
+        "budget": args.budget
+    }
+
+    agent_manager = AgentManager()
+    report = {"input": input_data, "modes": {}}
+    for mode in ("standard", "fast"):
+        print(f"运行模式: {mode}")
+        samples = run_mode(agent_manager, mode, input_data, args.iterations)
+        report["modes"][mode] = summarize(samples, args.input_price, args.output_price)
+
+    standard, fast = report["modes"]["standard"], report["modes"]["fast"]
+    print()
+    print(f"{'指标':<16}{'standard':>14}{'fast':>14}")
+    for key in ("latency_mean", "latency_p50", "latency_p95", "llm_calls",
+                "input_tokens", "output_tokens", "total_tokens", "cost_per_plan"):
+        print(f"{key:<16}{standard[key]:>14.4f}{fast[key]:>14.4f}")
+    if fast["latency_mean"]:
+        print(f"\n快速模式延迟加速比: {standard['latency_mean'] / fast['latency_mean']:.2f}x")
+
+    if args.output:
+        save_json(args.output, report)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
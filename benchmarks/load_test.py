@@ -0,0 +1,373 @@
+"""端到端压测：按配置的并发或到达率驱动所有API端点，统计吞吐、延迟分位数和错误率
+
+常用方式（自动启动桩模型和指定worker数的API服务）:
+    python benchmarks/load_test.py --spawn --workers 1 2 4 --concurrency 16 --duration 30
+
+对已运行的服务压测（开环，泊松到达，每秒20个请求）:
+    python benchmarks/load_test.py --target http://127.0.0.1:8000 --rate 20 --endpoints travel-plan agents
+
+对比两次结果，p95延迟或吞吐退化超过阈值时以非零状态退出:
+    python benchmarks/load_test.py --compare old.json new.json --threshold 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+from common import latency_summary, save_json, load_json
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# 端点名称 -> (方法, 路径)
+ENDPOINTS = {
+    "travel-plan": ("POST", "/travel-plan"),
+    "travel-plan-fast": ("POST", "/travel-plan?mode=fast"),
+    "food-recommendation": ("POST", "/food-recommendation"),
+    "itinerary": ("POST", "/itinerary"),
+    "travelogue": ("POST", "/travelogue"),
+    "price-comparison": ("POST", "/price-comparison"),
+    "xiaohongshu-analysis": ("POST", "/xiaohongshu-analysis"),
+    "video-analysis": ("POST", "/video-analysis"),
+    "topic-recommendation": ("POST", "/topic-recommendation"),
+    "agents": ("GET", "/agents"),
+}
+
+DESTINATIONS = ["西安", "成都", "北京", "杭州", "重庆", "厦门", "大理", "桂林"]
+
+
+def sample_body(rng: random.Random, distinct: int) -> dict:
+    """
+    生成请求体
+    
+    Args:
+        rng: 随机数生成器
+        distinct: 不同目的地的数量（控制缓存命中率）
+    """
+    destination = DESTINATIONS[rng.randrange(max(1, min(distinct, len(DESTINATIONS))))]
+    return {
+        "destination": destination,
+        "duration": "3天2夜",
+        "interests": ["历史文化", "美食"],
+        "budget": "中等",
+        "location": destination,
+        "cuisine_type": "地方菜"
+    }
+
+
+async def send(client: httpx.AsyncClient, method: str, path: str, body: dict, started: float) -> dict:
+    """发送一个请求并记录结果"""
+    start = time.perf_counter()
+    sample = {"offset": start - started}
+    try:
+        if method == "GET":
+            response = await client.get(path)
+        else:
+            response = await client.post(path, json=body)
+        sample["latency"] = time.perf_counter() - start
+        sample["http_status"] = response.status_code
+        try:
+            sample["app_status"] = response.json().get("status") if response.status_code == 200 else None
+        except ValueError:
+            sample["app_status"] = None
+    except Exception as e:
+        sample["latency"] = time.perf_counter() - start
+        sample["http_status"] = 0
+        sample["exception"] = type(e).__name__
+    return sample
+
+
+async def closed_loop(client, method, path, args, rng) -> list:
+    """闭环压测：固定并发数，每个虚拟用户完成一个请求后立即发下一个"""
+    samples = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    budget = [args.requests or float("inf")]
+    
+    async def user():
+        while time.perf_counter() < deadline and budget[0] > 0:
+            budget[0] -= 1
+            samples.append(await send(client, method, path, sample_body(rng, args.distinct), started))
+    
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    return samples
+
+
+async def open_loop(client, method, path, args, rng) -> list:
+    """开环压测：按泊松过程以固定到达率发请求，不受服务端响应速度影响"""
+    tasks = []
+    started = time.perf_counter()
+    deadline = started + args.duration
+    sent = 0
+    next_arrival = started
+    while next_arrival < deadline and (not args.requests or sent < args.requests):
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(send(client, method, path, sample_body(rng, args.distinct), started)))
+        sent += 1
+        next_arrival += rng.expovariate(args.rate)
+    return list(await asyncio.gather(*tasks))
+
+
+def summarize(samples: list, wall_time: float) -> dict:
+    """汇总一组请求的统计结果"""
+    total = len(samples)
+    ok = [s for s in samples if 200 <= s["http_status"] < 400]
+    http_errors = total - len(ok)
+    app_errors = sum(1 for s in ok if s.get("app_status") == "error")
+    status_counts = {}
+    for s in samples:
+        key = str(s["http_status"]) if s["http_status"] else s.get("exception", "exception")
+        status_counts[key] = status_counts.get(key, 0) + 1
+    return {
+        "requests": total,
+        "wall_time": wall_time,
+        "throughput": len(ok) / wall_time if wall_time else 0.0,
+        "latency": latency_summary([s["latency"] for s in ok]),
+        "error_rate": http_errors / total if total else 0.0,
+        "app_error_rate": app_errors / total if total else 0.0,
+        "status_counts": status_counts
+    }
+
+
+async def run_endpoint(base_url: str, name: str, args) -> dict:
+    """对单个端点执行预热和压测"""
+    method, path = ENDPOINTS[name]
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=max(args.concurrency, 64), max_keepalive_connections=max(args.concurrency, 64))
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        for _ in range(args.warmup):
+            await send(client, method, path, sample_body(rng, args.distinct), time.perf_counter())
+        start = time.perf_counter()
+        if args.rate:
+            samples = await open_loop(client, method, path, args, rng)
+        else:
+            samples = await closed_loop(client, method, path, args, rng)
+        return summarize(samples, time.perf_counter() - start)
+
+
+class ManagedProcess:
+    """压测期间托管的子进程（桩模型或API服务）"""
+    
+    def __init__(self, name: str, command: list, env: dict, ready_url: str, timeout: float = 60):
+        self.name = name
+        self.command = command
+        self.env = env
+        self.ready_url = ready_url
+        self.timeout = timeout
+        self.process = None
+    
+    def __enter__(self):
+        print(f"启动{self.name}: {' '.join(self.command)}")
+        self.process = subprocess.Popen(self.command, env=self.env, cwd=str(ROOT))
+        deadline = time.time() + self.timeout
+        while time.time() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"{self.name}启动失败，退出码: {self.process.returncode}")
+            try:
+                if httpx.get(self.ready_url, timeout=1).status_code < 500:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"{self.name}未在{self.timeout}秒内就绪")
+    
+    def __exit__(self, *exc):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def stub_process(args) -> ManagedProcess:
+    """构造桩模型子进程"""
+    command = [
+        sys.executable, "-m", "whereeatai.stub.llm_server",
+        "--port", str(args.stub_port),
+        "--latency-dist", args.stub_latency_dist,
+        "--latency-ms", str(args.stub_latency_ms),
+        "--latency-jitter-ms", str(args.stub_latency_jitter_ms),
+        "--tokens-per-second", str(args.stub_tps),
+        "--rate-limit-rate", str(args.stub_rate_limit_rate),
+        "--error-rate", str(args.stub_error_rate),
+        "--seed", str(args.seed)
+    ]
+    return ManagedProcess("桩模型", command, dict(os.environ), f"http://127.0.0.1:{args.stub_port}/v1/models")
+
+
+def api_process(args, workers: int, llm_base_url: str, data_dir: str) -> ManagedProcess:
+    """构造指定worker数的API服务子进程"""
+    env = dict(os.environ)
+    env.update({
+        "BASE_URL": llm_base_url,
+        "API_KEY": env.get("API_KEY") or "stub",
+        "ENVIRONMENT": "production",
+        "RATE_LIMIT_CALLS": "100000000",
+        "CHECKPOINT_DB_PATH": str(Path(data_dir) / "checkpoints.db"),
+        "LOG_LEVEL": "WARNING"
+    })
+    command = [
+        sys.executable, "-m", "uvicorn", "whereeatai.api.main:app",
+        "--host", "127.0.0.1", "--port", str(args.api_port),
+        "--workers", str(workers), "--log-level", "warning", "--no-access-log"
+    ]
+    return ManagedProcess(f"API服务(workers={workers})", command, env, f"http://127.0.0.1:{args.api_port}/status")
+
+
+def print_run(run: dict):
+    """打印单次压测结果"""
+    lat = run["latency"]
+    print(
+        f"  workers={run['workers']!s:<4} {run['endpoint']:<22} 请求: {run['requests']:<6} "
+        f"吞吐: {run['throughput']:8.2f}/s  p50: {lat['p50'] * 1000:8.1f}ms  "
+        f"p95: {lat['p95'] * 1000:8.1f}ms  p99: {lat['p99'] * 1000:8.1f}ms  "
+        f"错误率: {run['error_rate']:.2%}  业务错误率: {run['app_error_rate']:.2%}"
+    )
+
+
+async def run_suite(args) -> dict:
+    """执行全部压测"""
+    endpoints = args.endpoints or list(ENDPOINTS)
+    runs = []
+    
+    async def run_all(base_url, workers):
+        for name in endpoints:
+            summary = await run_endpoint(base_url, name, args)
+            run = {"workers": workers, "endpoint": name, **summary}
+            print_run(run)
+            runs.append(run)
+    
+    if not args.spawn:
+        await run_all(args.target, args.workers_label)
+    else:
+        with tempfile.TemporaryDirectory() as data_dir:
+            llm_base_url = args.stub_url
+            stub = None if llm_base_url else stub_process(args)
+            if stub:
+                stub.__enter__()
+                llm_base_url = f"http://127.0.0.1:{args.stub_port}/v1"
+            try:
+                for workers in args.workers:
+                    with api_process(args, workers, llm_base_url, data_dir):
+                        await run_all(f"http://127.0.0.1:{args.api_port}", workers)
+            finally:
+                if stub:
+                    stub.__exit__(None, None, None)
+    
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "config": {
+            "mode": "open" if args.rate else "closed",
+            "concurrency": args.concurrency,
+            "rate": args.rate,
+            "duration": args.duration,
+            "requests": args.requests,
+            "distinct_destinations": args.distinct,
+            "stub": {
+                "url": args.stub_url,
+                "latency_dist": args.stub_latency_dist,
+                "latency_ms": args.stub_latency_ms,
+                "latency_jitter_ms": args.stub_latency_jitter_ms,
+                "tokens_per_second": args.stub_tps
+            }
+        },
+        "runs": runs
+    }
+
+
+def git_commit() -> str:
+    """当前代码版本"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), text=True).strip()
+    except Exception:
+        return ""
+
+
+def compare(old_path: str, new_path: str, threshold: float) -> int:
+    """
+    对比两次压测结果
+    
+    Returns:
+        退化项数量
+    """
+    old = {(str(r["workers"]), r["endpoint"]): r for r in load_json(old_path)["runs"]}
+    new = {(str(r["workers"]), r["endpoint"]): r for r in load_json(new_path)["runs"]}
+    regressions = 0
+    print(f"{'workers':<8}{'endpoint':<24}{'吞吐变化':>10}{'p50变化':>10}{'p95变化':>10}{'p99变化':>10}{'错误率':>16}")
+    for key in sorted(old.keys() & new.keys()):
+        a, b = old[key], new[key]
+        
+        def delta(x, y):
+            return (y - x) / x * 100 if x else 0.0
+        
+        throughput = delta(a["throughput"], b["throughput"])
+        changes = {p: delta(a["latency"][p], b["latency"][p]) for p in ("p50", "p95", "p99")}
+        regressed = (
+            throughput < -threshold
+            or changes["p95"] > threshold
+            or b["error_rate"] > a["error_rate"] + threshold / 100
+        )
+        regressions += regressed
+        print(
+            f"{key[0]:<8}{key[1]:<24}{throughput:>+9.1f}%{changes['p50']:>+9.1f}%"
+            f"{changes['p95']:>+9.1f}%{changes['p99']:>+9.1f}%"
+            f"{a['error_rate']:>7.2%} -> {b['error_rate']:<7.2%}{'  << 退化' if regressed else ''}"
+        )
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]:<8}{key[1]:<24}仅存在于{'旧' if key in old else '新'}结果中")
+    print(f"\n退化项: {regressions}（阈值 {threshold}%）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WhereEatAI端到端压测")
+    parser.add_argument("--target", default="http://127.0.0.1:8000", help="已运行服务的地址（不使用--spawn时）")
+    parser.add_argument("--workers-label", default="external", help="对已运行服务压测时记录的worker数")
+    parser.add_argument("--spawn", action="store_true", help="自动启动API服务（及桩模型）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1], help="--spawn时依次测试的worker数")
+    parser.add_argument("--api-port", type=int, default=18000)
+    parser.add_argument("--stub-url", help="已运行的桩模型地址，不指定则自动启动")
+    parser.add_argument("--stub-port", type=int, default=19000)
+    parser.add_argument("--stub-latency-dist", default="lognormal")
+    parser.add_argument("--stub-latency-ms", type=float, default=500)
+    parser.add_argument("--stub-latency-jitter-ms", type=float, default=200)
+    parser.add_argument("--stub-tps", type=float, default=200)
+    parser.add_argument("--stub-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--stub-error-rate", type=float, default=0.0)
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), help="压测的端点，默认全部")
+    parser.add_argument("--concurrency", type=int, default=8, help="闭环并发数")
+    parser.add_argument("--rate", type=float, default=0.0, help="开环到达率(请求/秒)，设置后使用开环模式")
+    parser.add_argument("--duration", type=float, default=20.0, help="每个端点的压测时长(秒)")
+    parser.add_argument("--requests", type=int, default=0, help="每个端点的最大请求数，0表示不限")
+    parser.add_argument("--warmup", type=int, default=2, help="每个端点的预热请求数")
+    parser.add_argument("--distinct", type=int, default=len(DESTINATIONS), help="请求中不同目的地的数量")
+    parser.add_argument("--timeout", type=float, default=180.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="结果JSON路径，默认 benchmarks/results/load_test-<时间>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两次结果")
+    parser.add_argument("--threshold", type=float, default=10.0, help="对比时的退化阈值(%%)")
+    args = parser.parse_args()
+    
+    if args.compare:
+        sys.exit(1 if compare(args.compare[0], args.compare[1], args.threshold) else 0)
+    
+    report = asyncio.run(run_suite(args))
+    output = args.output or ROOT / "benchmarks" / "results" / f"load_test-{datetime.now():%Y%m%d-%H%M%S}.json"
+    save_json(output, report)
+    print(f"\n结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+"""框架开销微基准：测量LLM调用之外的热点路径（A2A消息、中间件、图调度、Agent注册）
+
+模型替换为零延迟的进程内桩模型，结果只反映框架自身开销。
+
+用法:
+    python benchmarks/microbench.py                      # 运行全部用例并与基线对比
+    python benchmarks/microbench.py --filter a2a         # 只运行名称包含a2a的用例
+    python benchmarks/microbench.py --save-baseline      # 将本次结果保存为基线
+    python benchmarks/microbench.py --compare-files a.json b.json
+"""
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# 默认关闭检查点，单独的用例再显式开启
+os.environ.setdefault("CHECKPOINT_ENABLED", "false")
+
+from common import save_json, load_json  # noqa: E402
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "microbench.json"
+
+CASES = {}
+
+
+def case(name):
+    """
+    注册基准用例
+    
+    用例函数负责准备环境，返回 (被测函数, 每次调用包含的操作数)
+    """
+    def decorator(fn):
+        CASES[name] = fn
+        return fn
+    return decorator
+
+
+# ---------------------------------------------------------------- A2A消息
+
+@case("a2a_create_message")
+def bench_a2a_create_message():
+    from whereeatai.protocols.a2a_protocol import A2AProtocol, MessageType, ActionType, Priority
+    
+    protocol = A2AProtocol()
+    data = {"destination": "西安", "duration": "3天2夜", "interests": ["历史文化", "美食"]}
+    
+    def run():
+        protocol.create_message(
+            sender="itinerary_agent",
+            receiver="food_recommendation_agent",
+            message_type=MessageType.REQUEST,
+            action=ActionType.EXECUTE,
+            data=data,
+            priority=Priority.HIGH
+        )
+    return run, 1
+
+
+@case("a2a_fast_create_message")
+def bench_a2a_fast_create_message():
+    from whereeatai.protocols.a2a_protocol import A2AProtocol, MessageType, ActionType, Priority
+    
+    protocol = A2AProtocol()
+    data = {"destination": "西安", "duration": "3天2夜", "interests": ["历史文化", "美食"]}
+    
+    def run():
+        protocol.create_fast_message(
+            sender="itinerary_agent",
+            receiver="food_recommendation_agent",
+            message_type=MessageType.REQUEST,
+            action=ActionType.EXECUTE,
+            data=data,
+            priority=Priority.HIGH
+        )
+    return run, 1
+
+
+@case("a2a_send_message")
+def bench_a2a_send_message():
+    from whereeatai.protocols.a2a_protocol import (
+        A2AProtocol, AgentRegistration, MessageType, ActionType
+    )
+    
+    protocol = A2AProtocol()
+    protocol.register_agent(AgentRegistration(
+        agent_id="food_recommendation_agent", agent_name="FoodRecommendationAgent", description="bench"
+    ))
+    message = protocol.create_message(
+        sender="itinerary_agent",
+        receiver="food_recommendation_agent",
+        message_type=MessageType.REQUEST,
+        action=ActionType.EXECUTE,
+        data={"destination": "西安"}
+    )
+    return (lambda: protocol.send_message(message)), 1
+
+
+@case("a2a_message_json")
+def bench_a2a_message_json():
+    from whereeatai.protocols.a2a_protocol import A2AProtocol, MessageType, ActionType
+    
+    message = A2AProtocol().create_message(
+        sender="itinerary_agent",
+        receiver="food_recommendation_agent",
+        message_type=MessageType.REQUEST,
+        action=ActionType.EXECUTE,
+        data={"destination": "西安", "duration": "3天2夜", "interests": ["历史文化", "美食"]}
+    )
+    return message.model_dump_json, 1
+
+
+def _bench_messages():
+    """构造内容相同的pydantic消息和轻量消息"""
+    from whereeatai.protocols.a2a_protocol import A2AProtocol, MessageType, ActionType
+    from whereeatai.protocols.fast_message import FastMessage
+    
+    message = A2AProtocol().create_message(
+        sender="itinerary_agent",
+        receiver="food_recommendation_agent",
+        message_type=MessageType.REQUEST,
+        action=ActionType.EXECUTE,
+        data={"destination": "西安", "duration": "3天2夜", "interests": ["历史文化", "美食"]}
+    )
+    return message, FastMessage.from_model(message)
+
+
+@case("a2a_message_json_roundtrip")
+def bench_a2a_message_json_roundtrip():
+    from whereeatai.protocols.a2a_protocol import A2AMessage
+    
+    message, _ = _bench_messages()
+    return (lambda: A2AMessage.model_validate_json(message.model_dump_json())), 1
+
+
+@case("a2a_fast_encode")
+def bench_a2a_fast_encode():
+    _, fast = _bench_messages()
+    return fast.encode, 1
+
+
+@case("a2a_fast_roundtrip")
+def bench_a2a_fast_roundtrip():
+    from whereeatai.protocols.fast_message import FastMessage
+    
+    _, fast = _bench_messages()
+    return (lambda: FastMessage.decode(fast.encode(), validate=False)), 1
+
+
+@case("a2a_fast_roundtrip_validated")
+def bench_a2a_fast_roundtrip_validated():
+    from whereeatai.protocols.fast_message import FastMessage
+    
+    _, fast = _bench_messages()
+    return (lambda: FastMessage.decode(fast.encode(), validate=True)), 1
+
+
+# ---------------------------------------------------------------- Agent注册
+
+@case("agent_registration")
+def bench_agent_registration():
+    from whereeatai.agents.base_agent import BaseAgent
+    from whereeatai.protocols.a2a_protocol import AgentCapability
+    
+    class BenchAgent(BaseAgent):
+        def __init__(self):
+            super().__init__(name="BenchAgent", description="基准测试Agent", agent_id="bench_agent")
+        
+        def get_capabilities(self):
+            return [AgentCapability(
+                name="bench",
+                description="基准测试能力",
+                input_schema={"type": "object", "properties": {"destination": {"type": "string"}}},
+                output_schema={"type": "object"}
+            )]
+        
+        def execute(self, input_data):
+            return {"status": "success", "data": {}}
+    
+    return BenchAgent, 1
+
+
+# ---------------------------------------------------------------- 中间件
+
+def _asgi_batch(app, count):
+    """构造按顺序发送count个请求的ASGI调用"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/ping",
+        "raw_path": b"/ping",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    
+    async def send(message):
+        pass
+    
+    async def batch():
+        for _ in range(count):
+            await app(dict(scope), receive, send)
+    
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(batch())
+
+
+def _ping_app():
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse
+    from starlette.routing import Route
+    
+    async def ping(request):
+        return JSONResponse({"status": "ok"})
+    
+    return Starlette(routes=[Route("/ping", ping)])
+
+
+@case("asgi_bare")
+def bench_asgi_bare():
+    return _asgi_batch(_ping_app(), 100), 100
+
+
+@case("asgi_middleware")
+def bench_asgi_middleware():
+    from whereeatai.middleware.request_middleware import RequestLoggingMiddleware, RateLimitMiddleware
+    
+    # 与api.main中的添加顺序一致：限流在外层，请求日志在内层
+    app = RateLimitMiddleware(RequestLoggingMiddleware(_ping_app()), calls=10 ** 9, period=60)
+    return _asgi_batch(app, 100), 100
+
+
+# ---------------------------------------------------------------- 图调度
+
+def _stub_agent_manager():
+    """创建使用零延迟桩模型的Agent管理器"""
+    from whereeatai.agents.agent_manager import AgentManager
+    from whereeatai.stub.model import StubModel
+    
+    manager = AgentManager()
+    for name, agent in manager.agents.items():
+        agent.model = StubModel(route=name, length_scale=0.05)
+    return manager
+
+
+BENCH_INPUT = {
+    "destination": "西安",
+    "duration": "3天2夜",
+    "interests": ["历史文化", "美食"],
+    "budget": "中等"
+}
+
+
+@case("agent_execute")
+def bench_agent_execute():
+    manager = _stub_agent_manager()
+    return (lambda: manager.execute_agent("itinerary", BENCH_INPUT)), 1
+
+
+@case("graph_dispatch")
+def bench_graph_dispatch():
+    manager = _stub_agent_manager()
+    return (lambda: manager.travel_workflow.run(BENCH_INPUT)), 1
+
+
+@case("graph_dispatch_checkpointed")
+def bench_graph_dispatch_checkpointed():
+    from whereeatai.graphs.checkpoint import WorkflowCheckpointStore
+    from whereeatai.graphs.travel_workflow import TravelWorkflow
+    
+    manager = _stub_agent_manager()
+    store = WorkflowCheckpointStore(db_path=str(Path(tempfile.mkdtemp()) / "checkpoints.db"))
+    workflow = TravelWorkflow(manager, checkpoint_store=store)
+    return (lambda: workflow.run(BENCH_INPUT)), 1
+
+
+# ---------------------------------------------------------------- 运行与对比
+
+def measure(fn, ops, repeat, min_time):
+    """
+    测量单次操作耗时(微秒)
+    
+    Returns:
+        包含min/median/循环次数的统计
+    """
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    times = timer.repeat(repeat=repeat, number=number)
+    per_op = [t / number / ops * 1e6 for t in times]
+    return {
+        "min_us": min(per_op),
+        "median_us": statistics.median(per_op),
+        "loops": number * ops,
+        "repeat": repeat
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=str(ROOT), text=True).strip()
+    except Exception:
+        return ""
+
+
+def compare(baseline, current, threshold):
+    """
+    对比基线与本次结果（按中位数）
+    
+    Returns:
+        退化用例数量
+    """
+    regressions = 0
+    base_results = baseline.get("results", {})
+    print(f"\n{'用例':<30}{'基线(us)':>12}{'本次(us)':>12}{'变化':>10}")
+    for name, result in current.get("results", {}).items():
+        base = base_results.get(name)
+        if not base:
+            print(f"{name:<30}{'-':>12}{result['median_us']:>12.2f}{'新增':>10}")
+            continue
+        change = (result["median_us"] - base["median_us"]) / base["median_us"] * 100
+        regressed = change > threshold
+        regressions += regressed
+        print(f"{name:<30}{base['median_us']:>12.2f}{result['median_us']:>12.2f}{change:>+9.1f}%"
+              f"{'  << 退化' if regressed else ''}")
+    print(f"\n退化用例: {regressions}（阈值 {threshold}%）")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WhereEatAI框架开销微基准")
+    parser.add_argument("--filter", default="", help="只运行名称包含该字符串的用例")
+    parser.add_argument("--list", action="store_true", help="列出所有用例")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.2, help="每轮最短测量时间(秒)")
+    parser.add_argument("--log-level", default="off", help="日志级别，off表示关闭日志以排除I/O")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="基线文件路径")
+    parser.add_argument("--save-baseline", action="store_true", help="将本次结果保存为基线")
+    parser.add_argument("--output", help="本次结果JSON路径")
+    parser.add_argument("--threshold", type=float, default=20.0, help="退化阈值(%%)")
+    parser.add_argument("--compare-files", nargs=2, metavar=("OLD", "NEW"), help="对比两个结果文件")
+    args = parser.parse_args()
+    
+    if args.list:
+        print("\n".join(CASES))
+        return
+    if args.compare_files:
+        old, new = (load_json(p) for p in args.compare_files)
+        sys.exit(1 if compare(old, new, args.threshold) else 0)
+    
+    if args.log_level == "off":
+        logging.disable(logging.CRITICAL)
+    else:
+        logging.basicConfig(level=args.log_level.upper(), handlers=[logging.NullHandler()])
+    
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "results": {}
+    }
+    for name, setup in CASES.items():
+        if args.filter not in name:
+            continue
+        fn, ops = setup()
+        result = measure(fn, ops, args.repeat, args.min_time)
+        report["results"][name] = result
+        print(f"{name:<30}median {result['median_us']:>12.2f} us    min {result['min_us']:>12.2f} us")
+    
+    if args.output:
+        save_json(args.output, report)
+    if args.save_baseline:
+        save_json(args.baseline, report)
+        print(f"\n基线已保存: {args.baseline}")
+        return
+    if Path(args.baseline).exists():
+        sys.exit(1 if compare(load_json(args.baseline), report, args.threshold) else 0)
+    print("\n未找到基线，使用 --save-baseline 保存")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""中间件前后对比基准：BaseHTTPMiddleware实现 vs 纯ASGI实现
+
+在进程内直接以ASGI协议并发驱动应用（不经过网络和HTTP解析），
+测量中间件链本身能支撑的请求吞吐，分别覆盖普通JSON响应和流式响应。
+
+用法:
+    python benchmarks/middleware_benchmark.py --requests 20000 --concurrency 64
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from starlette.applications import Starlette  # noqa: E402
+from starlette.middleware.base import BaseHTTPMiddleware  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+from starlette.responses import JSONResponse, Response, StreamingResponse  # noqa: E402
+from starlette.routing import Route  # noqa: E402
+
+from common import latency_summary, save_json  # noqa: E402
+from whereeatai.middleware.request_middleware import RequestLoggingMiddleware, RateLimitMiddleware  # noqa: E402
+from whereeatai.utils.context import current_endpoint  # noqa: E402
+
+logger = logging.getLogger("benchmarks.middleware")
+
+
+# ---------------------------------------------------------------- 旧实现（改造前的BaseHTTPMiddleware版本）
+
+class LegacyRequestLoggingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        request_id = str(uuid.uuid4())
+        request.state.request_id = request_id
+        current_endpoint.set(request.url.path)
+        start_time = time.time()
+        logger.info(f"请求开始 - ID: {request_id}, 方法: {request.method}, 路径: {request.url.path}")
+        response = await call_next(request)
+        process_time = time.time() - start_time
+        response.headers["X-Request-ID"] = request_id
+        response.headers["X-Process-Time"] = str(process_time)
+        logger.info(f"请求完成 - ID: {request_id}, 状态码: {response.status_code}, 耗时: {process_time:.3f}秒")
+        return response
+
+
+class LegacyRateLimitMiddleware(BaseHTTPMiddleware):
+    def __init__(self, app, calls: int = 100, period: int = 60):
+        super().__init__(app)
+        self.calls = calls
+        self.period = period
+        self.requests = {}
+    
+    async def dispatch(self, request: Request, call_next):
+        client_ip = request.client.host
+        current_time = time.time()
+        if client_ip in self.requests:
+            self.requests[client_ip] = [t for t in self.requests[client_ip] if current_time - t < self.period]
+        if client_ip in self.requests and len(self.requests[client_ip]) >= self.calls:
+            return Response(content="Too many requests", status_code=429, headers={"Retry-After": str(self.period)})
+        self.requests.setdefault(client_ip, []).append(current_time)
+        return await call_next(request)
+
+
+# ---------------------------------------------------------------- 被测应用
+
+def build_app(variant: str, calls: int):
+    """构造带指定中间件实现的应用"""
+    async def ping(request):
+        return JSONResponse({"status": "ok"})
+    
+    async def stream(request):
+        async def body():
+            for i in range(8):
+                yield f"data: {i}\n\n".encode()
+        return StreamingResponse(body(), media_type="text/event-stream")
+    
+    app = Starlette(routes=[Route("/ping", ping), Route("/stream", stream)])
+    if variant == "legacy":
+        return LegacyRateLimitMiddleware(LegacyRequestLoggingMiddleware(app), calls=calls, period=60)
+    if variant == "asgi":
+        return RateLimitMiddleware(RequestLoggingMiddleware(app), calls=calls, period=60)
+    return app
+
+
+async def drive(app, path: str, total: int, concurrency: int):
+    """
+    以固定并发驱动应用
+    
+    Returns:
+        (总耗时秒, 单请求延迟列表秒, 状态码计数)
+    """
+    scope_template = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    latencies = []
+    statuses = {}
+    remaining = iter(range(total))
+    
+    async def one():
+        status = 0
+        
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+        
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+        
+        start = time.perf_counter()
+        await app(dict(scope_template), receive, send)
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+    
+    async def worker():
+        for _ in remaining:
+            await one()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description="中间件前后对比基准")
+    parser.add_argument("--requests", type=int, default=20000, help="每个场景的请求数")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--log-level", default="off", help="日志级别，off表示关闭日志以排除I/O")
+    parser.add_argument("--output", help="结果JSON路径")
+    args = parser.parse_args()
+    
+    if args.log_level == "off":
+        logging.disable(logging.CRITICAL)
+    else:
+        logging.basicConfig(level=args.log_level.upper(), handlers=[logging.NullHandler()])
+    
+    report = {"requests": args.requests, "concurrency": args.concurrency, "results": {}}
+    print(f"{'场景':<20}{'RPS':>12}{'p50(ms)':>10}{'p99(ms)':>10}  状态码")
+    for path in ("/ping", "/stream"):
+        for variant in ("bare", "legacy", "asgi"):
+            app = build_app(variant, calls=args.requests * 10)
+            loop = asyncio.new_event_loop()
+            loop.run_until_complete(drive(app, path, min(1000, args.requests), args.concurrency))  # 预热
+            elapsed, latencies, statuses = loop.run_until_complete(
+                drive(app, path, args.requests, args.concurrency)
+            )
+            loop.close()
+            summary = latency_summary(latencies)
+            name = f"{variant}{path}"
+            report["results"][name] = {"rps": args.requests / elapsed, "latency": summary, "statuses": statuses}
+            print(f"{name:<20}{args.requests / elapsed:>12.0f}{summary['p50'] * 1000:>10.3f}"
+                  f"{summary['p99'] * 1000:>10.3f}  {statuses}")
+    
+    if args.output:
+        save_json(args.output, report)
+
+
+if __name__ == "__main__":
+    main()
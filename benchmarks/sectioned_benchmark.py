@@ -0,0 +1,138 @@
+"""分段生成基准测试：对比多日行程/游记一次生成与分段生成（逐日大纲 + 并发生成每天内容）的延迟
+
+使用进程内桩模型：每次调用的延迟 = 首token延迟 + 输出token数 / 输出速度，
+行程和游记的输出长度随天数增长，分段生成的单天内容长度固定。
+
+用法:
+    python benchmarks/sectioned_benchmark.py --days 1,3,5,7 --iterations 3
+    python benchmarks/sectioned_benchmark.py --tokens-per-second 50 --output sectioned.json
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 关闭自动分段，一次生成和分段生成由本脚本分别调用
+os.environ["SECTIONED_GENERATION_MIN_DAYS"] = "0"
+
+from common import latency_summary, save_json  # noqa: E402
+from whereeatai.agents.itinerary_agent import ItineraryAgent  # noqa: E402
+from whereeatai.agents.travelogue_agent import TravelogueAgent  # noqa: E402
+from whereeatai.stub.model import StubModel  # noqa: E402
+
+INTERESTS = ["历史文化", "美食"]
+
+
+class CountingStubModel(StubModel):
+    """统计调用次数和输出token数的桩模型（分段生成会在多个线程中并发调用）"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+    
+    def generate_with_usage(self, prompt, system_prompt=None):
+        content, usage = super().generate_with_usage(prompt, system_prompt)
+        with self._lock:
+            self.calls += 1
+            self.output_tokens += usage["output_tokens"]
+        return content, usage
+
+
+def build_agents(latency, tokens_per_second):
+    """
+    创建使用桩模型的Agent及其两种生成方式
+    
+    Returns:
+        {Agent名称: {"model": 桩模型, 模式: 生成函数(天数)}}
+    """
+    itinerary = ItineraryAgent()
+    travelogue = TravelogueAgent()
+    for agent in (itinerary, travelogue):
+        agent.model = CountingStubModel(route=agent.agent_id, latency=latency, tokens_per_second=tokens_per_second)
+    
+    def input_data(days):
+        return {"destination": "西安", "duration": f"{days}天", "interests": INTERESTS, "budget": "中等"}
+    
+    return {
+        "itinerary": {
+            "model": itinerary.model,
+            "single": lambda days: itinerary.execute(input_data(days)),
+            "sectioned": lambda days: itinerary._generate_sectioned(
+                "西安", f"{days}天", days, INTERESTS, "中等", "", ""
+            )
+        },
+        "travelogue": {
+            "model": travelogue.model,
+            "single": lambda days: travelogue.execute(input_data(days)),
+            "sectioned": lambda days: travelogue._generate_sectioned("西安", f"{days}天", days, INTERESTS, "")
+        }
+    }
+
+
+def run(model, fn, days, iterations):
+    """
+    多次执行生成函数
+    
+    Returns:
+        延迟分布、平均模型调用次数和输出token数
+    """
+    latencies = []
+    calls = []
+    output_tokens = []
+    for _ in range(iterations):
+        model.calls = model.output_tokens = 0
+        start = time.perf_counter()
+        fn(days)
+        latencies.append(time.perf_counter() - start)
+        calls.append(model.calls)
+        output_tokens.append(model.output_tokens)
+    return {
+        **latency_summary(latencies),
+        "llm_calls": statistics.mean(calls),
+        "output_tokens": statistics.mean(output_tokens)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多日行程/游记分段生成基准测试")
+    parser.add_argument("--days", default="1,3,5,7", help="行程天数（逗号分隔）")
+    parser.add_argument("--iterations", type=int, default=2, help="每个用例执行次数")
+    parser.add_argument("--agents", default="itinerary,travelogue", help="测试的Agent（逗号分隔）")
+    parser.add_argument("--latency-ms", type=float, default=300, help="桩模型首token延迟(毫秒)")
+    parser.add_argument("--tokens-per-second", type=float, default=200, help="桩模型输出速度")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+    
+    days_list = [int(d) for d in args.days.split(",") if d]
+    agents = build_agents(args.latency_ms / 1000, args.tokens_per_second)
+    report = {
+        "stub": {"latency_ms": args.latency_ms, "tokens_per_second": args.tokens_per_second},
+        "results": {}
+    }
+    
+    print(f"{'Agent':<12}{'天数':>6}{'一次生成(s)':>14}{'分段生成(s)':>14}{'加速比':>10}{'分段调用数':>12}")
+    for name in [a for a in args.agents.split(",") if a]:
+        report["results"][name] = {}
+        for days in days_list:
+            model = agents[name]["model"]
+            single = run(model, agents[name]["single"], days, args.iterations)
+            sectioned = run(model, agents[name]["sectioned"], days, args.iterations)
+            speedup = single["mean"] / sectioned["mean"] if sectioned["mean"] else 0.0
+            report["results"][name][days] = {"single": single, "sectioned": sectioned, "speedup": speedup}
+            print(f"{name:<12}{days:>6}{single['mean']:>14.2f}{sectioned['mean']:>14.2f}"
+                  f"{speedup:>9.2f}x{sectioned['llm_calls']:>12.0f}")
+    
+    if args.output:
+        save_json(args.output, report)
+        print(f"结果已保存: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,16 @@ from whereeatai.config import (
     API_HOST, 
     API_PORT, 
     API_WORKERS,
+    API_PRELOAD,
     PROJECT_NAME, 
     VERSION,
     LOG_LEVEL,
     LOG_DIR,
     LOG_FILE,
     LOG_JSON,
+    LOG_QUEUE_SIZE,
+    LOG_QUEUE_POLICY,
+    LOG_SAMPLING,
     ENVIRONMENT
 )
 from whereeatai.utils.logger import setup_logging
@@ -20,7 +24,10 @@ setup_logging(
     log_level=LOG_LEVEL,
     log_file=LOG_FILE,
     log_dir=LOG_DIR,
-    use_json=LOG_JSON
+    use_json=LOG_JSON,
+    queue_size=LOG_QUEUE_SIZE,
+    queue_policy=LOG_QUEUE_POLICY,
+    sampling=LOG_SAMPLING
 )
 
 logger = logging.getLogger(__name__)
@@ -39,15 +46,21 @@ if __name__ == "__main__":
     logger.info("Press Ctrl+C to stop the server.")
     
     try:
-        uvicorn.run(
-            "whereeatai.api.main:app",
-            host=API_HOST,
-            port=API_PORT,
-            reload=(ENVIRONMENT == "development"),
-            workers=1 if ENVIRONMENT == "development" else API_WORKERS,
-            log_level=LOG_LEVEL.lower(),
-            access_log=True
-        )
+        if ENVIRONMENT != "development" and API_PRELOAD:
+            # 生产环境：主进程预加载应用后fork worker，写时复制共享内存
+            from whereeatai.server import run_server
+            
+            run_server(API_WORKERS)
+        else:
+            uvicorn.run(
+                "whereeatai.api.main:app",
+                host=API_HOST,
+                port=API_PORT,
+                reload=(ENVIRONMENT == "development"),
+                workers=1 if ENVIRONMENT == "development" else API_WORKERS,
+                log_level=LOG_LEVEL.lower(),
+                access_log=True
+            )
     except Exception as e:
         logger.error(f"服务启动失败: {str(e)}", exc_info=True)
         raise
@@ -0,0 +1,5 @@
+"""pytest配置：从项目根目录导入 whereeatai 包"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
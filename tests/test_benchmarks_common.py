@@ -0,0 +1,25 @@
+"""基准测试百分位统计的测试"""
+import pytest
+
+from benchmarks.common import latency_summary, percentile
+
+
+@pytest.mark.parametrize("values, pct, expected", [
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 21)), 95, 19),
+    (list(range(1, 101)), 99, 99),
+    (list(range(1, 11)), 100, 10),
+    (list(range(1, 11)), 0, 1),
+    ([3.0], 95, 3.0)
+])
+def test_percentile_nearest_rank(values, pct, expected):
+    assert percentile(values, pct) == expected
+
+
+def test_percentile_ignores_input_order():
+    assert percentile([9, 1, 5, 3, 7], 50) == 5
+
+
+def test_empty_inputs():
+    assert percentile([], 95) == 0.0
+    assert latency_summary([])["p99"] == 0.0
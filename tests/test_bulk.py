@@ -0,0 +1,141 @@
+"""笔记批量分析（NDJSON流式输入输出）的端到端测试"""
+import asyncio
+import threading
+import time
+from hashlib import blake2b
+
+import httpx
+import orjson
+import pytest
+import uvicorn
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from whereeatai.api import bulk
+from whereeatai.api.bulk import NoteBulkResponse
+from whereeatai.utils.fingerprint import FingerprintIndex
+
+
+class FakeAgentManager:
+    """返回笔记长度作为分析结果，不调用模型"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def execute_agent(self, name, input_data):
+        self.calls += 1
+        return {"status": "success", "data": {"length": len(input_data["note_content"])}}
+
+
+def make_body(count: int) -> bytes:
+    lines = []
+    for i in range(count):
+        words = " ".join(blake2b(f"{i}-{j}".encode(), digest_size=6).hexdigest() for j in range(12))
+        lines.append(orjson.dumps({"id": i, "note_content": f"笔记{i} {words}"}))
+    return b"\n".join(lines) + b"\n"
+
+
+def chunks(body: bytes, size: int):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def parse(output: bytes):
+    rows = [orjson.loads(line) for line in output.splitlines()]
+    return rows[:-1], rows[-1]
+
+
+@pytest.fixture
+def agent_manager(tmp_path, monkeypatch):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    monkeypatch.setattr(bulk, "get_note_index", lambda: index)
+    return FakeAgentManager()
+
+
+def make_app(agent_manager) -> Starlette:
+    async def endpoint(request):
+        return NoteBulkResponse(agent_manager)
+
+    return Starlette(routes=[Route("/bulk", endpoint, methods=["POST"])])
+
+
+async def call_asgi(app, body_chunks, disconnect_after=None):
+    """以ASGI 2.3直接调用应用，请求体分多块发送；disconnect_after指定发送多少块后客户端断开"""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(body_chunks) - 1}
+        for i, chunk in enumerate(body_chunks)
+    ]
+    if disconnect_after is not None:
+        messages = messages[:disconnect_after] + [{"type": "http.disconnect"}]
+    response_complete = asyncio.Event()
+    sent = []
+
+    async def receive():
+        if messages:
+            # 模拟网络：请求体分批到达
+            await asyncio.sleep(0)
+            return messages.pop(0)
+        await response_complete.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            response_complete.set()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+        "method": "POST", "path": "/bulk", "raw_path": b"/bulk", "root_path": "", "scheme": "http",
+        "query_string": b"", "headers": [(b"content-type", b"application/x-ndjson")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80)
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=30)
+    return sent
+
+
+@pytest.mark.asyncio
+async def test_multi_chunk_body_is_read_completely(agent_manager):
+    body = make_body(200)
+    sent = await call_asgi(make_app(agent_manager), chunks(body, 97))
+    assert sent[0]["status"] == 200
+    rows, summary = parse(b"".join(message.get("body", b"") for message in sent[1:]))
+    assert sorted(row["line"] for row in rows) == list(range(1, 201))
+    assert sorted(row["id"] for row in rows) == list(range(200))
+    assert sum(summary["summary"].values()) == 200
+    assert summary["summary"]["error"] == 0
+
+
+@pytest.mark.asyncio
+async def test_client_disconnect_stops_batch(agent_manager):
+    body = make_body(200)
+    sent = await call_asgi(make_app(agent_manager), chunks(body, 97), disconnect_after=20)
+    output = b"".join(message.get("body", b"") for message in sent[1:])
+    assert b"summary" not in output
+    assert agent_manager.calls < 200
+
+
+def test_uvicorn_multi_chunk_body(agent_manager):
+    config = uvicorn.Config(make_app(agent_manager), host="127.0.0.1", port=0, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        deadline = time.monotonic() + 10
+        while not server.started:
+            assert time.monotonic() < deadline, "uvicorn未能启动"
+            time.sleep(0.05)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        body = make_body(300)
+
+        def body_stream():
+            for chunk in chunks(body, 1000):
+                yield chunk
+
+        response = httpx.post(f"http://127.0.0.1:{port}/bulk", content=body_stream(), timeout=30)
+        assert response.status_code == 200
+        rows, summary = parse(response.content)
+        assert sorted(row["line"] for row in rows) == list(range(1, 301))
+        assert sum(summary["summary"].values()) == 300
+        assert summary["summary"]["error"] == 0
+    finally:
+        server.should_exit = True
+        thread.join(10)
@@ -0,0 +1,97 @@
+"""预编码响应的条件请求和压缩协商测试"""
+import gzip
+
+import orjson
+import pytest
+
+from whereeatai.utils.cache import RefreshLeases, build_response, encode_response
+
+CONTENT = {"status": "success", "data": {"itinerary": "西湖、灵隐寺、河坊街" * 200}}
+
+
+@pytest.fixture
+def entry():
+    return encode_response(CONTENT, compress_min_bytes=0)
+
+
+def test_encode_response_precompresses_large_body(entry):
+    assert entry.gzip_body is not None
+    assert gzip.decompress(entry.gzip_body) == entry.body
+    assert orjson.loads(entry.body) == CONTENT
+
+
+def test_small_body_is_not_compressed():
+    assert encode_response({"status": "success"}).gzip_body is None
+
+
+@pytest.mark.parametrize("accept_encoding", [
+    "gzip",
+    "gzip, deflate, br",
+    "br;q=1.0, gzip;q=0.5",
+    "GZIP",
+    "*",
+    "identity, *;q=0.1"
+])
+def test_gzip_when_accepted(entry, accept_encoding):
+    response = build_response(entry, accept_encoding=accept_encoding)
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.body == entry.gzip_body
+
+
+@pytest.mark.parametrize("accept_encoding", [
+    "",
+    "identity",
+    "br",
+    "gzip;q=0",
+    "gzip; q=0.000, br",
+    "*;q=0",
+    "*, gzip;q=0",
+    "gzip;q=invalid"
+])
+def test_identity_when_gzip_not_accepted(entry, accept_encoding):
+    response = build_response(entry, accept_encoding=accept_encoding)
+    assert "Content-Encoding" not in response.headers
+    assert response.body == entry.body
+
+
+def test_vary_and_etag_headers(entry):
+    response = build_response(entry, accept_encoding="gzip", headers={"X-Cache": "fresh"})
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == entry.etag
+    assert response.headers["X-Cache"] == "fresh"
+
+
+@pytest.mark.parametrize("if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_not_modified(entry, if_none_match):
+    response = build_response(entry, if_none_match=if_none_match.format(etag=entry.etag))
+    assert response.status_code == 304
+    assert response.body == b""
+
+
+def test_etag_mismatch_returns_body(entry):
+    response = build_response(entry, if_none_match='"other"')
+    assert response.status_code == 200
+    assert response.body == entry.body
+
+
+def test_refresh_lease_publishes_entry_to_other_workers(tmp_path, entry):
+    leases = RefreshLeases(str(tmp_path / "leases.db"))
+    stale_created_at = entry.created_at - 600
+    assert leases.acquire("plan", stale_created_at) == (True, None)
+    # 持有租约期间其他worker不重新生成
+    assert leases.acquire("plan", stale_created_at) == (False, None)
+    leases.release("plan", entry)
+    
+    regenerate, published = leases.acquire("plan", stale_created_at)
+    assert regenerate is False
+    assert (published.body, published.gzip_body, published.etag) == (entry.body, entry.gzip_body, entry.etag)
+    assert published.created_at == entry.created_at
+    # 已经是发布的结果时需要重新生成
+    assert leases.acquire("plan", published.created_at) == (True, None)
+
+
+def test_failed_refresh_is_regenerated_next_time(tmp_path, entry):
+    leases = RefreshLeases(str(tmp_path / "leases.db"))
+    assert leases.acquire("plan", entry.created_at - 600) == (True, None)
+    leases.release("plan", None)
+    assert leases.acquire("plan", entry.created_at - 600) == (True, None)
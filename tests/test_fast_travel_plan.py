@@ -0,0 +1,44 @@
+"""快速旅行计划分段解析的测试"""
+import pytest
+
+from whereeatai.agents.fast_travel_plan_agent import FastTravelPlanAgent, split_sections
+
+INPUT = {"destination": "杭州", "duration": "2天", "interests": ["美食"]}
+
+
+class StubModel:
+    def __init__(self, response: str):
+        self.response = response
+
+    def generate(self, prompt):
+        return self.response
+
+
+def make_agent(response: str) -> FastTravelPlanAgent:
+    # 跳过构造函数，不创建模型客户端也不注册A2A
+    agent = FastTravelPlanAgent.__new__(FastTravelPlanAgent)
+    agent.model = StubModel(response)
+    return agent
+
+
+def test_split_sections():
+    text = "===游记===\n西湖游记\n=== 行程规划 ===\n第一天\n===美食推荐===\n\n===价格比价===\n携程最低"
+    assert split_sections(text) == {
+        "travelogue": "西湖游记",
+        "itinerary": "第一天",
+        "price_comparison": "携程最低"
+    }
+
+
+def test_missing_section_is_partial_success():
+    result = make_agent("===游记===\n西湖游记\n===行程规划===\n第一天\n===价格比价===\n携程最低").execute(INPUT)
+    assert result["status"] == "partial_success"
+    assert result["data"]["missing_sections"] == ["美食推荐"]
+    assert result["data"]["itinerary"]["itinerary"] == "第一天"
+
+
+@pytest.mark.parametrize("response", ["抱歉，我无法按要求的格式输出。", ""])
+def test_output_without_markers_is_error(response):
+    result = make_agent(response).execute(INPUT)
+    assert result["status"] == "error"
+    assert "data" not in result
@@ -0,0 +1,76 @@
+"""内容指纹和分段LSH索引的测试"""
+import pytest
+
+from whereeatai.utils.fingerprint import (
+    FINGERPRINT_BITS,
+    FingerprintIndex,
+    band_values,
+    hamming_distance,
+    simhash
+)
+
+NOTE = "杭州三天两夜美食攻略：第一天去河坊街吃葱包桧和片儿川，第二天去西湖边的知味观，第三天去胡庆余堂附近的老字号。"
+
+
+def test_simhash_ignores_case_width_and_punctuation():
+    assert simhash(NOTE) == simhash(NOTE.replace("，", ",").replace("：", " ") + "！！")
+    assert simhash("Hangzhou West Lake") == simhash("ｈａｎｇｚｈｏｕ west-lake")
+
+
+def test_simhash_near_duplicates_are_close():
+    edited = NOTE.replace("第三天", "最后一天")
+    assert hamming_distance(simhash(NOTE), simhash(edited)) <= 10
+    other = "成都火锅串串香推荐：玉林路的小龙坎、春熙路的蜀大侠，还有宽窄巷子附近的钵钵鸡。"
+    assert hamming_distance(simhash(NOTE), simhash(other)) > 10
+
+
+def test_simhash_fits_in_64_bits():
+    assert 0 <= simhash(NOTE) < 1 << FINGERPRINT_BITS
+    assert simhash("") == 0
+
+
+@pytest.mark.parametrize("bands", [1, 4, 5, 7, 16])
+def test_band_values_reassemble_fingerprint(bands):
+    fingerprint = simhash(NOTE) | 1 << 63
+    values = band_values(fingerprint, bands)
+    assert len(values) == bands
+    rebuilt, offset = 0, 0
+    for i, value in enumerate(values):
+        width = FINGERPRINT_BITS // bands + (1 if i < FINGERPRINT_BITS % bands else 0)
+        assert value < 1 << width
+        rebuilt |= value << offset
+        offset += width
+    assert offset == FINGERPRINT_BITS
+    assert rebuilt == fingerprint
+
+
+def test_bands_catch_any_distance_below_band_count():
+    # 翻转的位数少于段数时，至少有一段完全相同，候选查询不会漏检
+    fingerprint = simhash(NOTE)
+    for bits in [(0,), (0, 17), (5, 21, 40), (1, 20, 35, 63)]:
+        flipped = fingerprint
+        for bit in bits:
+            flipped ^= 1 << bit
+        same = [a == b for a, b in zip(band_values(fingerprint, 5), band_values(flipped, 5))]
+        assert any(same)
+
+
+def test_index_finds_near_duplicate(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"), bands=5, max_distance=3)
+    fingerprint = simhash(NOTE)
+    index.add(fingerprint, {"summary": "杭州美食"}, source_id="note-1")
+    assert index.find(fingerprint) == ({"summary": "杭州美食"}, 0, "note-1")
+    assert index.find(fingerprint ^ 0b101) == ({"summary": "杭州美食"}, 2, "note-1")
+    assert index.find(fingerprint ^ 0b1111) is None
+
+
+def test_index_handles_high_bit_fingerprints(tmp_path):
+    index = FingerprintIndex(str(tmp_path / "fingerprints.db"))
+    fingerprint = (1 << 64) - 1
+    index.add(fingerprint, {"summary": "高位"})
+    assert index.find(fingerprint) == ({"summary": "高位"}, 0, None)
+
+
+def test_index_rejects_invalid_band_count(tmp_path):
+    with pytest.raises(ValueError):
+        FingerprintIndex(str(tmp_path / "fingerprints.db"), bands=0)
@@ -0,0 +1,62 @@
+"""日志采样和同步写日志的测试"""
+import logging
+
+import pytest
+
+from whereeatai.utils.logger import FanOutHandler, SamplingFilter, parse_sampling
+
+
+def make_record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(name, level, __file__, 0, "message", None, None)
+
+
+class ListHandler(logging.Handler):
+    """把日志记录保存到列表"""
+    
+    def __init__(self, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.records = []
+    
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_sampling_keeps_one_in_interval():
+    sampling = SamplingFilter({"whereeatai.api": 0.25})
+    kept = [sampling.filter(make_record("whereeatai.api")) for _ in range(8)]
+    assert kept == [True, False, False, False, True, False, False, False]
+
+
+def test_sampling_child_logger_inherits_nearest_parent():
+    sampling = SamplingFilter({"whereeatai": 0.5, "whereeatai.api": 0})
+    assert not any(sampling.filter(make_record("whereeatai.api.main")) for _ in range(4))
+    assert sum(sampling.filter(make_record("whereeatai.models")) for _ in range(4)) == 2
+    assert all(sampling.filter(make_record("uvicorn")) for _ in range(4))
+
+
+def test_sampling_always_keeps_warnings():
+    sampling = SamplingFilter({"whereeatai": 0})
+    assert sampling.filter(make_record("whereeatai", logging.WARNING))
+    assert not sampling.filter(make_record("whereeatai", logging.INFO))
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, {}),
+    ("", {}),
+    ("not json", {}),
+    ('{"whereeatai.api": 0.1}', {"whereeatai.api": 0.1}),
+    ({"httpx": 1}, {"httpx": 1.0})
+])
+def test_parse_sampling(value, expected):
+    assert parse_sampling(value) == expected
+
+
+def test_fan_out_applies_sampling_once_per_record():
+    console, errors = ListHandler(), ListHandler(logging.ERROR)
+    fan_out = FanOutHandler(console, errors)
+    fan_out.addFilter(SamplingFilter({"whereeatai": 0.5}))
+    for _ in range(4):
+        fan_out.handle(make_record("whereeatai"))
+    fan_out.handle(make_record("whereeatai", logging.ERROR))
+    assert len(console.records) == 3
+    assert [record.levelno for record in errors.records] == [logging.ERROR]
@@ -0,0 +1,52 @@
+"""过载降级模型路由的测试"""
+import pytest
+
+from whereeatai.models import overload
+from whereeatai.models.model_router import ModelRoute
+from whereeatai.models.overload import DegradationLevel, OverloadController
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(overload, "DEGRADED_MAX_TOKENS_RATIO", 0.5)
+    monkeypatch.setattr(overload, "DEGRADED_MODEL_NAME", "small-model")
+    return OverloadController(enabled=False)
+
+
+def test_normal_level_keeps_route(controller):
+    route = ModelRoute(model="large-model", max_tokens=4096)
+    assert controller.degrade_route(route, DegradationLevel.NORMAL) is route
+
+
+def test_short_output_halves_max_tokens(controller):
+    route = ModelRoute(model="large-model", max_tokens=4096)
+    degraded = controller.degrade_route(route, DegradationLevel.SHORT_OUTPUT)
+    assert degraded.max_tokens == 2048
+    assert degraded.model == "large-model"
+
+
+@pytest.mark.parametrize("max_tokens, expected", [(400, 256), (256, 256), (200, 200), (64, 64)])
+def test_short_output_floor_never_raises_max_tokens(controller, max_tokens, expected):
+    route = ModelRoute(model="large-model", max_tokens=max_tokens)
+    assert controller.degrade_route(route, DegradationLevel.SHORT_OUTPUT).max_tokens == expected
+
+
+@pytest.mark.parametrize("level", [DegradationLevel.SMALL_MODEL, DegradationLevel.SKIP_OPTIONAL, DegradationLevel.STALE_CACHE])
+def test_small_model_from_level_two(controller, level):
+    route = ModelRoute(model="large-model", max_tokens=1024)
+    degraded = controller.degrade_route(route, level)
+    assert degraded.model == "small-model"
+    assert degraded.max_tokens == 512
+
+
+def test_no_small_model_configured(controller, monkeypatch):
+    monkeypatch.setattr(overload, "DEGRADED_MODEL_NAME", "")
+    route = ModelRoute(model="large-model", max_tokens=1024)
+    assert controller.degrade_route(route, DegradationLevel.SMALL_MODEL).model == "large-model"
+
+
+def test_degraded_routes_are_reused(controller):
+    route = ModelRoute(model="large-model", max_tokens=1024)
+    first = controller.degrade_route(route, DegradationLevel.SKIP_OPTIONAL)
+    assert controller.degrade_route(route.model_copy(), DegradationLevel.STALE_CACHE) is first
+    assert controller.degrade_route(route, DegradationLevel.SHORT_OUTPUT) is not first
@@ -0,0 +1,47 @@
+"""共享模型客户端的测试"""
+import threading
+
+import pytest
+
+from whereeatai.models import qwen_model
+
+
+@pytest.fixture
+def fresh_clients(monkeypatch):
+    """模拟进程首次使用（或fork之后）：还没有任何客户端"""
+    monkeypatch.setattr(qwen_model, "API_KEY", "test-key")
+    monkeypatch.setattr(qwen_model, "_clients", {})
+    monkeypatch.setattr(qwen_model, "_http_client", None)
+    monkeypatch.setattr(qwen_model, "_clients_lock", threading.Lock())
+    monkeypatch.setattr(qwen_model, "_http_client_lock", threading.Lock())
+
+
+def call_in_thread(func, *args, timeout: float = 5.0):
+    """在线程中调用，超时未返回视为死锁"""
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(value=func(*args)), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), f"{func.__name__} 未在{timeout}秒内返回"
+    return result["value"]
+
+
+def test_get_chat_client_on_fresh_state(fresh_clients):
+    client = call_in_thread(qwen_model.get_chat_client, "test-model", 0.7, 100)
+    assert qwen_model._http_client is not None
+    assert qwen_model.get_chat_client("test-model", 0.7, 100) is client
+
+
+def test_chat_clients_share_http_client(fresh_clients):
+    first = call_in_thread(qwen_model.get_chat_client, "model-a", 0.7, 100)
+    second = call_in_thread(qwen_model.get_chat_client, "model-b", 0.2, 200)
+    assert first is not second
+    assert call_in_thread(qwen_model.get_http_client) is qwen_model._http_client
+
+
+def test_reset_after_fork_drops_clients(fresh_clients):
+    call_in_thread(qwen_model.get_chat_client, "test-model", 0.7, 100)
+    qwen_model._reset_clients_after_fork()
+    assert qwen_model._http_client is None
+    assert not qwen_model._clients
+    call_in_thread(qwen_model.get_chat_client, "test-model", 0.7, 100)
@@ -0,0 +1,111 @@
+"""会话原文截取、摘要合并和会话存储的测试"""
+import pytest
+
+from whereeatai.utils.sessions import (
+    SessionConflictError,
+    SessionStore,
+    history_chars,
+    recent_turns,
+    split_for_summary
+)
+
+
+def make_turns(count: int, size: int = 10):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": str(i % 10) * size}
+        for i in range(count)
+    ]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SessionStore(str(tmp_path / "sessions.db"), max_sessions=3, max_turns=4)
+
+
+def test_recent_turns_start_from_user_message():
+    turns = make_turns(6)
+    assert recent_turns(turns, 30) == turns[4:]
+    assert recent_turns(turns, 1000) == turns
+    assert recent_turns(turns, 5) == []
+
+
+def test_split_for_summary_below_limits():
+    assert split_for_summary(make_turns(4), max_turns=4, keep_turns=2, max_chars=1000) == 0
+
+
+def test_split_for_summary_over_turn_limit():
+    # 最近4条从助手消息开始，保留部分顺延到下一条用户消息
+    turns = make_turns(7)
+    assert split_for_summary(turns, max_turns=6, keep_turns=4, max_chars=1000) == 4
+    assert split_for_summary(turns[:6], max_turns=5, keep_turns=4, max_chars=1000) == 2
+
+
+def test_split_for_summary_over_char_limit():
+    turns = make_turns(6, size=40)
+    assert history_chars(turns) == 240
+    # 保留部分不超过max_chars的一半
+    assert split_for_summary(turns, max_turns=10, keep_turns=6, max_chars=200) == 4
+
+
+def test_split_for_summary_without_keep_turns():
+    turns = make_turns(6)
+    assert split_for_summary(turns, max_turns=4, keep_turns=0, max_chars=1000) == 6
+
+
+def test_append_and_get(store):
+    session = store.create("tenant-a", {"destination": "杭州"})
+    updated = store.append(session["session_id"], "tenant-a", 0, make_turns(2))
+    assert updated["turn_count"] == 2
+    loaded = store.get(session["session_id"], "tenant-a")
+    assert loaded["context"] == {"destination": "杭州"}
+    assert loaded["turns"] == make_turns(2)
+    assert store.get(session["session_id"], "tenant-b") is None
+
+
+def test_append_conflict_and_missing(store):
+    session = store.create("tenant-a", {})
+    store.append(session["session_id"], "tenant-a", 0, make_turns(2))
+    with pytest.raises(SessionConflictError):
+        store.append(session["session_id"], "tenant-a", 0, make_turns(2))
+    store.delete(session["session_id"], "tenant-a")
+    assert store.append(session["session_id"], "tenant-a", 2, make_turns(2)) is None
+
+
+def test_fold_replaces_oldest_turns(store):
+    session = store.create("tenant-a", {})
+    store.append(session["session_id"], "tenant-a", 0, make_turns(6))
+    assert store.fold(session["session_id"], "tenant-a", 0, 4, "摘要")
+    loaded = store.get(session["session_id"], "tenant-a")
+    assert loaded["summary"] == "摘要"
+    assert loaded["turns"] == make_turns(6)[4:]
+    assert loaded["turn_count"] == 6
+
+
+def test_fold_rejects_stale_base(store):
+    session = store.create("tenant-a", {})
+    store.append(session["session_id"], "tenant-a", 0, make_turns(6))
+    assert store.fold(session["session_id"], "tenant-a", 0, 2, "第一次")
+    # 其他worker已合并过，原文开头已变化
+    assert not store.fold(session["session_id"], "tenant-a", 0, 2, "第二次")
+    assert not store.fold(session["session_id"], "tenant-a", 2, 10, "超出原文")
+    assert store.get(session["session_id"], "tenant-a")["summary"] == "第一次"
+
+
+def test_append_drops_oldest_turns_over_limit(store):
+    session = store.create("tenant-a", {})
+    turns = make_turns(10)
+    updated = store.append(session["session_id"], "tenant-a", 0, turns)
+    assert updated["turns"] == turns[-8:]
+    assert updated["turn_count"] == 10
+
+
+def test_create_evicts_least_recent_sessions(store):
+    sessions = [store.create("tenant-a", {}) for _ in range(4)]
+    assert store.get(sessions[0]["session_id"], "tenant-a") is None
+    assert store.stats()["sessions"] == 3
+
+
+def test_purge_expired(store):
+    session = store.create("tenant-a", {})
+    assert store.purge_expired(session["updated_at"] + store.ttl + 1) == 1
+    assert store.get(session["session_id"], "tenant-a") is None
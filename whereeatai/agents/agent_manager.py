@@ -1,5 +1,6 @@
 """Agent管理器，用于协调和管理所有Agent"""
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import time
 import logging
 from .travelogue_agent import TravelogueAgent
 from .itinerary_agent import ItineraryAgent
@@ -9,6 +10,15 @@ from .xiaohongshu_agent import XiaoHongShuAgent
 from .video_agent import VideoAgent
 from .topic_recommendation_agent import TopicRecommendationAgent
 from .travel_plan_agent import TravelPlanAgent
+from .fast_travel_plan_agent import FastTravelPlanAgent
+from .conversation_agent import ConversationAgent
+from whereeatai.models.dispatcher import LLMOverloadedError
+from whereeatai.models.model_router import get_model_router
+from whereeatai.models.qwen_model import QwenModel, warm_up_connection
+from whereeatai.models.overload import DegradationLevel, get_degradation_level
+from whereeatai.config import PLAN_STORE_ENABLED, PLAN_STORE_EXCLUDE
+from whereeatai.utils.plan_store import get_plan_store
+from whereeatai.utils.sessions import SessionNotFoundError, get_session_store, split_for_summary
 
 logger = logging.getLogger(__name__)
 
@@ -27,7 +37,9 @@ class AgentManager:
             "xiaohongshu": XiaoHongShuAgent(),
             "video": VideoAgent(),
             "topic_recommendation": TopicRecommendationAgent(),
-            "travel_plan": TravelPlanAgent()
+            "travel_plan": TravelPlanAgent(),
+            "fast_travel_plan": FastTravelPlanAgent(),
+            "conversation": ConversationAgent()
         }
         
         # 延迟导入以避免循环依赖
@@ -36,6 +48,31 @@ class AgentManager:
         self.content_workflow = ContentAnalysisWorkflow(self)
         logger.info(f"Agent管理器初始化完成，共{len(self.agents)}个Agent")
     
+    def warm_up(self) -> Dict[str, Any]:
+        """
+        预热：创建所有Agent会用到的模型客户端，并建立到上游的连接
+        
+        工作流图已在初始化时编译；使用预加载启动器时编译结果在主进程中生成，由各worker共享。
+        
+        Returns:
+            预热结果
+        """
+        start = time.perf_counter()
+        endpoints = list(get_model_router().endpoint_routes)
+        clients = 0
+        for agent in self.agents.values():
+            model = getattr(agent, "model", None)
+            if isinstance(model, QwenModel):
+                clients += model.warm_up(endpoints)
+        connected = warm_up_connection()
+        result = {
+            "clients": clients,
+            "upstream_connected": connected,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+        logger.info(f"预热完成: {result}")
+        return result
+    
     def get_agent(self, agent_name: str):
         """
         获取指定名称的Agent
@@ -60,6 +97,52 @@ class AgentManager:
             agent_info[name] = agent.get_info()
         return agent_info
     
+    def _stored_result(self, kind: str, name: str, input_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        从生成内容存储中查找足够新的相同需求输出
+        
+        Args:
+            kind: 存储条目类型（agent:<名称> 或 workflow:<名称>:<模式>）
+            name: Agent或工作流名称
+            input_data: 输入数据
+        
+        Returns:
+            保存的结果，未命中返回None
+        """
+        if not PLAN_STORE_ENABLED or name in PLAN_STORE_EXCLUDE:
+            return None
+        # 降级到只返回旧数据时，保留期内的条目都可以使用
+        stale = get_degradation_level() >= DegradationLevel.STALE_CACHE
+        try:
+            result = get_plan_store().lookup(kind, input_data, stale=stale)
+        except Exception as e:
+            logger.error(f"查询生成内容存储失败: {kind}, 错误: {str(e)}")
+            return None
+        if result is not None:
+            logger.info(f"复用已生成内容: {kind}, 条目ID: {result['plan_store']['id']}")
+        return result
+    
+    def _store_result(self, kind: str, name: str, input_data: Dict[str, Any], result: Dict[str, Any]):
+        """
+        保存成功的输出（降级状态下生成的精简结果不保存）
+        
+        Args:
+            kind: 存储条目类型
+            name: Agent或工作流名称
+            input_data: 输入数据
+            result: 执行结果
+        """
+        if not PLAN_STORE_ENABLED or name in PLAN_STORE_EXCLUDE:
+            return
+        if result.get("status") != "success" or "plan_store" in result:
+            return
+        if get_degradation_level() > DegradationLevel.NORMAL:
+            return
+        try:
+            get_plan_store().record(kind, input_data, result)
+        except Exception as e:
+            logger.error(f"保存生成内容失败: {kind}, 错误: {str(e)}")
+    
     def execute_agent(self, agent_name: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         执行指定Agent的任务
@@ -80,10 +163,20 @@ class AgentManager:
                 "message": f"Agent {agent_name} not found"
             }
         
+        kind = f"agent:{agent_name}"
+        stored = self._stored_result(kind, agent_name, input_data)
+        if stored is not None:
+            return stored
+        
         try:
             result = agent.execute(input_data)
             logger.info(f"Agent执行成功: {agent_name}")
+            self._store_result(kind, agent_name, input_data, result)
             return result
+        except LLMOverloadedError:
+            # 过载拒绝需要传递到API层返回503
+            logger.warning(f"Agent执行被拒绝（上游过载）: {agent_name}")
+            raise
         except Exception as e:
             logger.error(f"Agent执行失败: {agent_name}, 错误: {str(e)}")
             return {
@@ -91,29 +184,142 @@ class AgentManager:
                 "message": f"Agent执行失败: {str(e)}"
             }
     
-    def execute_workflow(self, workflow_name: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def execute_workflow(self, workflow_name: str, input_data: Dict[str, Any], mode: str = "standard") -> Dict[str, Any]:
         """
         执行指定工作流
         
         Args:
             workflow_name: 工作流名称
             input_data: 输入数据
+            mode: 运行模式（travel_plan工作流支持standard/fast）
             
         Returns:
             工作流执行结果
         """
-        logger.info(f"执行工作流: {workflow_name}")
+        logger.info(f"执行工作流: {workflow_name}, 模式: {mode}")
         
-        if workflow_name == "travel_plan":
-            return self.travel_workflow.run(input_data)
-        elif workflow_name == "content_analysis":
-            return self.content_workflow.run(input_data)
-        else:
+        if workflow_name not in ("travel_plan", "content_analysis"):
             logger.error(f"工作流不存在: {workflow_name}")
             return {
                 "status": "error",
                 "message": f"Workflow {workflow_name} not found"
             }
+        
+        kind = f"workflow:{workflow_name}:{mode}"
+        stored = self._stored_result(kind, workflow_name, input_data)
+        if stored is not None:
+            return stored
+        
+        if workflow_name == "travel_plan":
+            result = self.travel_workflow.run(input_data, mode=mode)
+        else:
+            result = self.content_workflow.run(input_data)
+        self._store_result(kind, workflow_name, input_data, result)
+        return result
+    
+    def execute_target(self, target: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        按名称执行Agent或工作流（与缓存和生成内容存储使用的名称一致）
+        
+        Args:
+            target: agent:<Agent名称> 或 workflow:<工作流名称>[:<模式>]
+            input_data: 输入数据
+        
+        Returns:
+            执行结果
+        """
+        if target.startswith("workflow:"):
+            _, name, mode = (target.split(":") + ["standard"])[:3]
+            return self.execute_workflow(name, input_data, mode=mode)
+        return self.execute_agent(target.split(":", 1)[-1], input_data)
+    
+    def resume_workflow(self, workflow_name: str, run_id: str) -> Dict[str, Any]:
+        """
+        断点续跑指定工作流，只重新执行失败或缺失的节点
+        
+        Args:
+            workflow_name: 工作流名称
+            run_id: 运行ID
+            
+        Returns:
+            工作流执行结果
+        """
+        logger.info(f"续跑工作流: {workflow_name}, 运行ID: {run_id}")
+        
+        if workflow_name == "travel_plan":
+            return self.travel_workflow.resume(run_id)
+        
+        logger.error(f"工作流不支持续跑: {workflow_name}")
+        return {
+            "status": "error",
+            "message": f"Workflow {workflow_name} does not support resume"
+        }
+    
+    def converse(self, session: Dict[str, Any], message: str) -> Dict[str, Any]:
+        """
+        在会话中执行一轮对话：基于会话的需求、摘要和最近几轮原文生成回复，并把本轮消息追加到会话
+        
+        对话内容因会话而异，不经过生成内容存储。
+        
+        Args:
+            session: 会话（由会话存储读取）
+            message: 用户消息
+        
+        Returns:
+            对话结果（data中包含回复和会话的累计消息数）
+        
+        Raises:
+            SessionConflictError: 同一会话的上一条消息尚未处理完
+            SessionNotFoundError: 会话在本轮对话期间被删除或已过期
+        """
+        logger.info(f"执行会话对话: {session['session_id']}, 第{session['turn_count'] // 2 + 1}轮")
+        result = self.agents["conversation"].execute({
+            "message": message,
+            "context": session["context"],
+            "summary": session["summary"],
+            "history": session["turns"]
+        })
+        if result.get("status") != "success":
+            return result
+        
+        now = time.time()
+        updated = get_session_store().append(session["session_id"], session["tenant"], session["turn_count"], [
+            {"role": "user", "content": message, "at": now},
+            {"role": "assistant", "content": result["data"]["reply"], "at": now}
+        ])
+        if updated is None:
+            raise SessionNotFoundError(f"会话不存在或已过期: {session['session_id']}")
+        result["data"].update({
+            "session_id": session["session_id"],
+            "turn_count": updated["turn_count"],
+            "needs_summary": split_for_summary(updated["turns"]) > 0
+        })
+        return result
+    
+    def compact_session(self, session_id: str, tenant: str) -> bool:
+        """
+        把会话中较早的消息合并进滚动摘要
+        
+        Args:
+            session_id: 会话ID
+            tenant: 会话所属租户
+        
+        Returns:
+            bool: 是否更新了摘要
+        """
+        store = get_session_store()
+        session = store.get(session_id, tenant)
+        if session is None:
+            return False
+        folded = split_for_summary(session["turns"])
+        if not folded:
+            return False
+        summary = self.agents["conversation"].summarize(session["summary"], session["turns"][:folded])
+        base = session["turn_count"] - len(session["turns"])
+        updated = store.fold(session_id, tenant, base, folded, summary)
+        if updated:
+            logger.info(f"会话摘要已更新: {session_id}, 合并{folded}条消息，摘要{len(summary)}字")
+        return updated
     
     def _execute_travel_plan_workflow(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -1,6 +1,8 @@
 """基础Agent类，定义所有Agent的统一接口"""
 from abc import ABC, abstractmethod
 from typing import Dict, Any, List, Optional
+import math
+import time
 from whereeatai.protocols.a2a_protocol import (
     A2AProtocol,
     AgentRegistration,
@@ -12,6 +14,7 @@ from whereeatai.protocols.a2a_protocol import (
     Priority,
     get_a2a_protocol
 )
+from whereeatai.utils.context import get_current_priority, get_current_deadline
 import logging
 
 logger = logging.getLogger(__name__)
@@ -109,10 +112,13 @@ class BaseAgent(ABC):
         pass
     
     def send_message(self, receiver: str, action: ActionType, data: Dict[str, Any], 
-                    priority: Priority = Priority.MEDIUM) -> Dict[str, Any]:
+                    priority: Optional[Priority] = None) -> Dict[str, Any]:
         """
         发送消息给其他Agent
         
+        优先级默认沿用当前请求的优先级；当前请求有截止时间时，消息超时取剩余时间，
+        使消息携带原请求的调度信息。
+        
         Args:
             receiver: 接收者Agent ID
             action: 操作类型
@@ -122,13 +128,19 @@ class BaseAgent(ABC):
         Returns:
             发送结果
         """
-        message = self.a2a_protocol.create_message(
+        timeout = 30
+        deadline = get_current_deadline()
+        if deadline is not None:
+            timeout = min(300, max(1, math.ceil(deadline - time.monotonic())))
+        # 进程内Agent间通信走轻量消息，跳过pydantic校验
+        message = self.a2a_protocol.create_fast_message(
             sender=self.agent_id,
             receiver=receiver,
             message_type=MessageType.REQUEST,
             action=action,
             data=data,
-            priority=priority
+            priority=priority or Priority(get_current_priority()),
+            timeout=timeout
         )
         return self.a2a_protocol.send_message(message)
     
@@ -0,0 +1,131 @@
+from typing import Dict, Any, List
+from .base_agent import BaseAgent
+from ..models.qwen_model import QwenModel
+from ..protocols.a2a_protocol import AgentCapability
+from ..config import SESSION_HISTORY_CHARS, SESSION_SUMMARY_CHARS
+from ..utils.sessions import recent_turns
+
+# 旅行需求字段及其在提示词中的名称
+CONTEXT_FIELDS = [
+    ("destination", "目的地"),
+    ("duration", "行程时长"),
+    ("interests", "兴趣爱好"),
+    ("budget", "预算水平"),
+    ("travel_dates", "旅游日期"),
+    ("travel_style", "旅行风格"),
+    ("location", "当前位置"),
+    ("cuisine_type", "偏好菜系")
+]
+
+
+class ConversationAgent(BaseAgent):
+    
+    def __init__(self):
+        super().__init__(
+            name="ConversationAgent",
+            description="用于多轮对话式旅行规划的Agent，基于会话摘要和最近几轮对话回复",
+            agent_id="conversation_agent"
+        )
+        self.model = QwenModel(route="conversation")
+    
+    def get_capabilities(self) -> List[AgentCapability]:
+        return [
+            AgentCapability(
+                name="converse",
+                description="结合旅行需求、此前对话摘要和最近几轮对话回复用户消息",
+                input_schema={
+                    "type": "object",
+                    "properties": {
+                        "message": {"type": "string"},
+                        "context": {"type": "object"},
+                        "summary": {"type": "string"},
+                        "history": {"type": "array"}
+                    },
+                    "required": ["message"]
+                },
+                output_schema={"type": "object"},
+                estimated_duration=10
+            )
+        ]
+    
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        required_fields = ["message"]
+        if not self.validate_input(input_data, required_fields):
+            return {
+                "status": "error",
+                "message": f"缺少必填字段：{required_fields}"
+            }
+        
+        message = input_data["message"]
+        context = input_data.get("context") or {}
+        summary = input_data.get("summary", "")
+        history = input_data.get("history") or []
+        
+        requirements = []
+        for field, label in CONTEXT_FIELDS:
+            value = context.get(field)
+            if value:
+                requirements.append(f"{label}：{'、'.join(value) if isinstance(value, list) else value}")
+        
+        system_prompt = f"""
+        你是一位专业的旅行规划助手，正在与用户多轮对话，逐步完善用户的旅行计划。
+        用户的旅行需求：
+        {chr(10).join(requirements) if requirements else '尚未提供，请在对话中了解'}
+        
+        此前对话摘要：
+        {summary or '无'}
+        
+        请结合旅行需求、对话摘要和最近的对话回答用户的最新消息：延续已确定的安排，只修改用户要求变更的部分，
+        回答具体、可执行；需要补充信息时直接向用户提问。
+        """
+        
+        # 提示词只带最近几轮原文，更早的对话已合并进摘要
+        turns = [
+            {"role": turn["role"], "content": turn["content"]}
+            for turn in recent_turns(history, SESSION_HISTORY_CHARS)
+        ]
+        turns.append({"role": "user", "content": message})
+        reply, usage = self.model.generate_from_messages(turns, system_prompt)
+        
+        return {
+            "status": "success",
+            "message": "对话回复生成成功",
+            "data": {
+                "reply": reply,
+                "usage": usage
+            }
+        }
+    
+    def summarize(self, summary: str, turns: List[Dict[str, Any]]) -> str:
+        """
+        把较早的对话合并进滚动摘要
+        
+        Args:
+            summary: 原摘要
+            turns: 需要合并的对话消息
+        
+        Returns:
+            str: 新摘要（不超过SESSION_SUMMARY_CHARS字）
+        """
+        dialogue = "\n".join(
+            f"{'用户' if turn.get('role') == 'user' else '助手'}：{turn.get('content', '')}" for turn in turns
+        )
+        prompt = f"""
+        请更新旅行规划对话的滚动摘要。
+        
+        原摘要：
+        {summary or '无'}
+        
+        新增对话：
+        {dialogue}
+        
+        新摘要需要合并原摘要和新增对话，保留：
+        1. 用户确认的需求和偏好（目的地、日期、预算、人数、饮食禁忌等）
+        2. 已确定的行程安排、住宿和餐厅
+        3. 用户否定或要求修改的内容
+        4. 尚未解决的问题
+        
+        只输出摘要本身，不超过{SESSION_SUMMARY_CHARS}字，较早且已被推翻的细节可以省略。
+        """
+        
+        return self.model.generate(prompt).strip()[:SESSION_SUMMARY_CHARS]
@@ -0,0 +1,149 @@
+"""快速旅行计划Agent，一次模型调用生成游记、行程、美食和比价四个部分"""
+from typing import Dict, Any, List
+import re
+from .base_agent import BaseAgent
+from ..models.qwen_model import QwenModel
+from ..protocols.a2a_protocol import AgentCapability
+
+
+# 分段标记 -> 结果字段
+SECTION_MARKERS = {
+    "游记": "travelogue",
+    "行程规划": "itinerary",
+    "美食推荐": "food_recommendations",
+    "价格比价": "price_comparison"
+}
+
+SECTION_PATTERN = re.compile(r"^\s*=+\s*(游记|行程规划|美食推荐|价格比价)\s*=+\s*$", re.MULTILINE)
+
+PRICE_PLATFORMS = ["携程", "美团", "飞猪", "去哪儿"]
+
+
+def split_sections(text: str) -> Dict[str, str]:
+    """
+    按分段标记切分模型输出
+    
+    Args:
+        text: 模型输出文本
+    
+    Returns:
+        结果字段到分段内容的映射（缺失的分段不出现在结果中）
+    """
+    sections = {}
+    matches = list(SECTION_PATTERN.finditer(text))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        content = text[match.end():end].strip()
+        if content:
+            sections[SECTION_MARKERS[match.group(1)]] = content
+    return sections
+
+
+class FastTravelPlanAgent(BaseAgent):
+    
+    def __init__(self):
+        super().__init__(
+            name="FastTravelPlanAgent",
+            description="用于低延迟场景的旅行计划Agent，单次生成游记、行程、美食和比价",
+            agent_id="fast_travel_plan_agent"
+        )
+        self.model = QwenModel(route="fast_travel_plan")
+    
+    def get_capabilities(self) -> List[AgentCapability]:
+        return [
+            AgentCapability(
+                name="generate_fast_travel_plan",
+                description="单次模型调用生成分段的完整旅行计划",
+                input_schema={
+                    "type": "object",
+                    "properties": {
+                        "destination": {"type": "string"},
+                        "duration": {"type": "string"},
+                        "interests": {"type": "array"}
+                    },
+                    "required": ["destination", "duration", "interests"]
+                },
+                output_schema={"type": "object"},
+                estimated_duration=20
+            )
+        ]
+    
+    def execute(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        required_fields = ["destination", "duration", "interests"]
+        if not self.validate_input(input_data, required_fields):
+            return {
+                "status": "error",
+                "message": f"缺少必填字段：{required_fields}"
+            }
+        
+        destination = input_data["destination"]
+        duration = input_data["duration"]
+        interests = input_data["interests"]
+        budget = input_data.get("budget", "")
+        travel_dates = input_data.get("travel_dates", "")
+        travel_style = input_data.get("travel_style", "")
+        
+        prompt = f"""
+        请为前往{destination}旅游{duration}的游客一次性生成完整的旅行方案。
+        旅游日期：{travel_dates}
+        游客的兴趣爱好是：{', '.join(interests)}
+        预算水平是：{budget}
+        旅行风格是：{travel_style}
+        
+        请严格按照以下四个部分输出，每个部分以单独一行的标记开头，标记必须原样保留：
+        
+        ===游记===
+        一篇生动的游记，包括每日亮点、景点体验、美食、住宿、交通和个人感受。
+        
+        ===行程规划===
+        每日行程安排（时间、地点、活动内容）、交通安排、预算分配、备选方案和实用小贴士。
+        
+        ===美食推荐===
+        {destination}当地符合游客兴趣的餐厅：名称和地址、推荐菜品、人均消费、特色和营业时间。
+        
+        ===价格比价===
+        {destination}旅游套餐在{', '.join(PRICE_PLATFORMS)}的价格对比、优惠信息和购买建议。
+        
+        除以上四个标记外不要输出其他标记。
+        """
+        
+        response = self.model.generate(prompt)
+        sections = split_sections(response)
+        missing = [marker for marker, key in SECTION_MARKERS.items() if key not in sections]
+        if not sections:
+            # 输出中没有任何分段标记，不能当作部分成功返回空计划
+            return {
+                "status": "error",
+                "message": "快速旅行计划生成失败：模型输出缺少全部分段标记"
+            }
+        
+        return {
+            "status": "success" if not missing else "partial_success",
+            "message": "快速旅行计划生成成功" if not missing else f"缺少分段：{', '.join(missing)}",
+            "data": {
+                "travelogue": {
+                    "destination": destination,
+                    "duration": duration,
+                    "interests": interests,
+                    "travel_style": travel_style,
+                    "travelogue": sections.get("travelogue", "")
+                },
+                "itinerary": {
+                    "destination": destination,
+                    "duration": duration,
+                    "interests": interests,
+                    "itinerary": sections.get("itinerary", "")
+                },
+                "food_recommendations": {
+                    "location": destination,
+                    "cuisine_type": interests,
+                    "recommendations": sections.get("food_recommendations", "")
+                },
+                "price_comparison": {
+                    "product": f"{destination}旅游套餐",
+                    "platforms": PRICE_PLATFORMS,
+                    "comparison_result": sections.get("price_comparison", "")
+                },
+                "missing_sections": missing
+            }
+        }
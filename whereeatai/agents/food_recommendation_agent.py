@@ -12,7 +12,7 @@ class FoodRecommendationAgent(BaseAgent):
             description="用于推荐附近美食的Agent",
             agent_id="food_recommendation_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="food_recommendation")
     
     def get_capabilities(self) -> List[AgentCapability]:
         """获取Agent能力列表"""
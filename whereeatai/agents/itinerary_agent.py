@@ -2,6 +2,7 @@ from typing import Dict, Any, List
 from .base_agent import BaseAgent
 from ..models.qwen_model import QwenModel
 from ..protocols.a2a_protocol import AgentCapability
+from ..utils.sectioned import duration_days, generate_sectioned, should_section
 
 
 class ItineraryAgent(BaseAgent):
@@ -12,7 +13,7 @@ class ItineraryAgent(BaseAgent):
             description="用于生成动态行程的Agent",
             agent_id="itinerary_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="itinerary")
     
     def get_capabilities(self) -> List[AgentCapability]:
         return [
@@ -48,7 +49,13 @@ class ItineraryAgent(BaseAgent):
         travel_dates = input_data.get("travel_dates", "")
         travel_style = input_data.get("travel_style", "")
         
-        prompt = f"""
+        days = duration_days(duration)
+        if should_section(days):
+            itinerary = self._generate_sectioned(
+                destination, duration, days, interests, budget, travel_dates, travel_style
+            )
+        else:
+            prompt = f"""
         请为前往{destination}旅游{duration}的游客生成一份详细的动态行程规划。
         旅游日期：{travel_dates}
         游客的兴趣爱好是：{', '.join(interests)}
@@ -67,8 +74,7 @@ class ItineraryAgent(BaseAgent):
         
         请确保行程安排合理，时间充裕，活动内容符合游客兴趣。
         """
-        
-        itinerary = self.model.generate(prompt)
+            itinerary = self.model.generate(prompt)
         
         return {
             "status": "success",
@@ -80,3 +86,64 @@ class ItineraryAgent(BaseAgent):
                 "itinerary": itinerary
             }
         }
+    
+    def _generate_sectioned(self, destination: str, duration: str, days: int, interests: List[str],
+                            budget: str, travel_dates: str, travel_style: str) -> str:
+        """
+        分段生成多日行程：先生成逐日大纲，再并发生成每天的安排和全程通用部分
+        
+        Args:
+            destination: 目的地
+            duration: 行程时长
+            days: 天数
+            interests: 兴趣爱好
+            budget: 预算水平
+            travel_dates: 旅游日期
+            travel_style: 旅行风格
+        
+        Returns:
+            str: 拼接后的行程规划
+        """
+        context = f"""
+        游客的兴趣爱好是：{', '.join(interests)}
+        预算水平是：{budget}
+        旅行风格是：{travel_style}"""
+        
+        outline_prompt = f"""
+        请为前往{destination}旅游{duration}的游客拟定逐日大纲。
+        旅游日期：{travel_dates}{context}
+        
+        请只输出{days}行，每行一天，格式为"第N天：当天主题（主要区域和2-3个核心景点）"，不要输出其他内容。
+        各天的区域和景点不要重复，路线安排合理。
+        """
+        
+        def day_prompt(day: int, theme: str, outline: str) -> str:
+            return f"""
+        以下是前往{destination}旅游{duration}的逐日大纲：
+        {outline}
+        {context}
+        
+        请只写第{day}天（{theme or '按大纲安排'}）的详细动态行程规划，以"第{day}天"为标题，包括：
+        1. 当天的时间安排（时间、地点、活动内容）
+        2. 景点游览时间
+        3. 午餐和晚餐推荐及餐厅信息
+        4. 景点之间的交通方式
+        5. 当天的备选方案
+        
+        不要写其他天的内容，确保时间充裕，活动内容符合游客兴趣。
+        """
+        
+        def closing_prompt(outline: str) -> str:
+            return f"""
+        以下是前往{destination}旅游{duration}的逐日大纲：
+        {outline}
+        旅游日期：{travel_dates}{context}
+        
+        请补充行程规划中全程通用的部分（不要重复逐日安排）：
+        1. 住宿建议
+        2. 往返及城市间交通安排
+        3. 预算分配
+        4. 实用小贴士
+        """
+        
+        return generate_sectioned(self.model.generate, days, outline_prompt, day_prompt, closing_prompt)
@@ -12,7 +12,7 @@ class PriceComparisonAgent(BaseAgent):
             description="用于多平台价格比价的Agent",
             agent_id="price_comparison_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="price_comparison")
     
     def get_capabilities(self) -> List[AgentCapability]:
         return [
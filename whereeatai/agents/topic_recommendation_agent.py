@@ -12,7 +12,7 @@ class TopicRecommendationAgent(BaseAgent):
             description="用于生成专题推荐的Agent",
             agent_id="topic_recommendation_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="topic_recommendation")
     
     def get_capabilities(self) -> List[AgentCapability]:
         return [
@@ -12,7 +12,7 @@ class TravelPlanAgent(BaseAgent):
             description="用于生成完整旅行计划的Agent，包括美食、酒店、路线等",
             agent_id="travel_plan_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="travel_plan")
     
     def get_capabilities(self) -> List[AgentCapability]:
         return [
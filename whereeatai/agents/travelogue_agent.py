@@ -3,6 +3,7 @@ from typing import Dict, Any, List
 from .base_agent import BaseAgent
 from ..models.qwen_model import QwenModel
 from ..protocols.a2a_protocol import AgentCapability
+from ..utils.sectioned import duration_days, generate_sectioned, should_section
 
 
 class TravelogueAgent(BaseAgent):
@@ -15,7 +16,7 @@ class TravelogueAgent(BaseAgent):
             description="用于生成智能游记的Agent",
             agent_id="travelogue_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="travelogue")
     
     def get_capabilities(self) -> List[AgentCapability]:
         """获取Agent能力列表"""
@@ -65,8 +66,12 @@ class TravelogueAgent(BaseAgent):
         interests = input_data["interests"]
         travel_style = input_data.get("travel_style", "")
         
-        # 生成游记
-        prompt = f"""
+        # 多日游记分段生成，其余一次生成
+        days = duration_days(duration)
+        if should_section(days):
+            travelogue = self._generate_sectioned(destination, duration, days, interests, travel_style)
+        else:
+            prompt = f"""
         请为前往{destination}旅行{duration}的游客生成一篇精彩的游记。
         游客的兴趣爱好是：{', '.join(interests)}
         旅行风格是：{travel_style}
@@ -82,8 +87,7 @@ class TravelogueAgent(BaseAgent):
         
         请使用生动有趣的语言，让读者有身临其境的感觉。
         """
-        
-        travelogue = self.model.generate(prompt)
+            travelogue = self.model.generate(prompt)
         
         return {
             "status": "success",
@@ -96,3 +100,54 @@ class TravelogueAgent(BaseAgent):
                 "travelogue": travelogue
             }
         }
+    
+    def _generate_sectioned(self, destination: str, duration: str, days: int,
+                            interests: List[str], travel_style: str) -> str:
+        """
+        分段生成多日游记：先生成逐日大纲，再并发生成每天的篇章和结尾
+        
+        Args:
+            destination: 目的地
+            duration: 行程时长
+            days: 天数
+            interests: 兴趣爱好
+            travel_style: 旅行风格
+        
+        Returns:
+            str: 拼接后的游记
+        """
+        context = f"""
+        游客的兴趣爱好是：{', '.join(interests)}
+        旅行风格是：{travel_style}"""
+        
+        outline_prompt = f"""
+        请为前往{destination}旅行{duration}的游客拟定一篇游记的逐日大纲。{context}
+        
+        请只输出{days}行，每行一天，格式为"第N天：当天的主题和亮点（主要景点和美食）"，不要输出其他内容。
+        各天的景点和美食不要重复。
+        """
+        
+        def day_prompt(day: int, theme: str, outline: str) -> str:
+            return f"""
+        以下是前往{destination}旅行{duration}的游记逐日大纲：
+        {outline}
+        {context}
+        
+        请只写游记中第{day}天（{theme or '按大纲安排'}）的篇章，以"第{day}天"为小标题，包括当天的景点游览体验和美食推荐。
+        不要写其他天的内容，请使用生动有趣的语言，让读者有身临其境的感觉。
+        """
+        
+        def closing_prompt(outline: str) -> str:
+            return f"""
+        以下是前往{destination}旅行{duration}的游记逐日大纲：
+        {outline}
+        {context}
+        
+        请写游记中全程通用的结尾部分（不要重复逐日内容）：
+        1. 住宿建议
+        2. 交通指南
+        3. 实用小贴士
+        4. 个人感受和建议
+        """
+        
+        return generate_sectioned(self.model.generate, days, outline_prompt, day_prompt, closing_prompt)
@@ -1,7 +1,23 @@
 from typing import Dict, Any, List
+import logging
 from .base_agent import BaseAgent
 from ..models.qwen_model import QwenModel
 from ..protocols.a2a_protocol import AgentCapability
+from ..utils.chunking import map_reduce, needs_chunking
+from ..utils.frames import prepare_frames
+
+logger = logging.getLogger(__name__)
+
+# 视频分析应包括的内容（单次分析和分块分析的合并结果一致）
+ANALYSIS_ITEMS = """
+        1. 视频主题和核心内容
+        2. 推荐的地点或产品
+        3. 推荐理由
+        4. 价格信息（如果有）
+        5. 适合人群
+        6. 视频真实性评估
+        7. 有用的旅行或美食建议
+        8. 相关标签和关键词"""
 
 
 class VideoAgent(BaseAgent):
@@ -12,7 +28,7 @@ class VideoAgent(BaseAgent):
             description="用于识别和分析视频内容的Agent",
             agent_id="video_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="video")
     
     def get_capabilities(self) -> List[AgentCapability]:
         return [
@@ -22,7 +38,9 @@ class VideoAgent(BaseAgent):
                 input_schema={
                     "type": "object",
                     "properties": {
-                        "video_url": {"type": "string"}
+                        "video_url": {"type": "string"},
+                        "video_summary": {"type": "string"},
+                        "video_frames": {"type": "array"}
                     },
                     "required": ["video_url"]
                 },
@@ -41,34 +59,84 @@ class VideoAgent(BaseAgent):
         
         video_url = input_data["video_url"]
         video_summary = input_data.get("video_summary", "")
-        video_frames = input_data.get("video_frames", [])
+        # 视频帧去重并按token预算选取，避免几十个相似帧挤占提示词
+        video_frames, frame_stats = prepare_frames(input_data.get("video_frames", []))
+        if frame_stats["input_frames"]:
+            logger.info(
+                f"视频帧预处理: 输入{frame_stats['input_frames']}帧，保留{frame_stats['kept_frames']}帧，"
+                f"去重{frame_stats['duplicates_dropped']}帧，超预算{frame_stats['over_budget_dropped']}帧，"
+                f"节省约{frame_stats['tokens_saved']} tokens"
+            )
         
-        prompt = f"""
+        if needs_chunking(video_summary):
+            analysis_result = self._analyze_chunked(video_url, video_summary, video_frames)
+        else:
+            prompt = f"""
         请分析以下视频内容：
         视频URL：{video_url}
         视频摘要：{video_summary}
-        视频帧：{video_frames}
+        视频帧（按时间顺序，近似重复的帧已合并）：
+{video_frames}
         
-        分析内容应该包括：
-        1. 视频主题和核心内容
-        2. 推荐的地点或产品
-        3. 推荐理由
-        4. 价格信息（如果有）
-        5. 适合人群
-        6. 视频真实性评估
-        7. 有用的旅行或美食建议
-        8. 相关标签和关键词
+        分析内容应该包括：{ANALYSIS_ITEMS}
         
         请使用清晰的结构和语言，提取有用的信息。
         """
-        
-        analysis_result = self.model.generate(prompt)
+            analysis_result = self.model.generate(prompt)
         
         return {
             "status": "success",
             "message": "视频分析成功",
             "data": {
                 "video_url": video_url,
-                "analysis_result": analysis_result
+                "analysis_result": analysis_result,
+                "frame_stats": frame_stats
             }
         }
+    
+    def _analyze_chunked(self, video_url: str, video_summary: str, video_frames: str) -> str:
+        """
+        超长视频摘要/文稿分块并发分析，合并时再结合视频帧，得到与单次分析结构相同的结果
+        
+        Args:
+            video_url: 视频URL
+            video_summary: 视频摘要或文稿
+            video_frames: 预处理后的视频帧文本
+        
+        Returns:
+            str: 分析结果
+        """
+        def map_prompt(chunk: str, index: int, total: int) -> str:
+            return f"""
+        以下是一个旅游视频文稿的第{index}/{total}部分，请只根据这一部分提取信息：
+        {chunk}
+        
+        提取内容包括（本部分没有涉及的项省略）：{ANALYSIS_ITEMS}
+        
+        请简洁列出要点，保留具体的地点、价格和时间。
+        """
+        
+        def reduce_prompt(partials: List[str], final: bool) -> str:
+            sections = "\n\n".join(f"【第{i}部分】\n{partial}" for i, partial in enumerate(partials, 1))
+            if not final:
+                return f"""
+        以下是一个旅游视频文稿相邻几部分的分析要点（按时间顺序）：
+        {sections}
+        
+        请合并为一份要点列表，去掉重复内容，保留具体的地点、价格和时间。
+        """
+            return f"""
+        以下是一个旅游视频文稿各部分的分析要点（按时间顺序）：
+        视频URL：{video_url}
+        {sections}
+        
+        视频帧（按时间顺序，近似重复的帧已合并）：
+{video_frames}
+        
+        请综合各部分和视频帧，对整个视频给出完整分析，去掉重复内容，保留具体的地点、价格和时间。
+        分析内容应该包括：{ANALYSIS_ITEMS}
+        
+        请使用清晰的结构和语言，提取有用的信息。
+        """
+        
+        return map_reduce(self.model.generate, video_summary, map_prompt, reduce_prompt)
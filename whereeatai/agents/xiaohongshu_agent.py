@@ -2,6 +2,18 @@ from typing import Dict, Any, List
 from .base_agent import BaseAgent
 from ..models.qwen_model import QwenModel
 from ..protocols.a2a_protocol import AgentCapability
+from ..utils.chunking import map_reduce, needs_chunking
+
+# 笔记分析应包括的内容（单次分析和分块分析的合并结果一致）
+ANALYSIS_ITEMS = """
+        1. 笔记主题和核心内容
+        2. 推荐的地点或产品
+        3. 推荐理由
+        4. 价格信息（如果有）
+        5. 适合人群
+        6. 笔记真实性评估
+        7. 有用的旅行或美食建议
+        8. 相关标签和关键词"""
 
 
 class XiaoHongShuAgent(BaseAgent):
@@ -12,7 +24,7 @@ class XiaoHongShuAgent(BaseAgent):
             description="用于识别和分析小红书笔记内容的Agent",
             agent_id="xiaohongshu_agent"
         )
-        self.model = QwenModel()
+        self.model = QwenModel(route="xiaohongshu")
     
     def get_capabilities(self) -> List[AgentCapability]:
         return [
@@ -43,26 +55,20 @@ class XiaoHongShuAgent(BaseAgent):
         note_images = input_data.get("note_images", [])
         note_tags = input_data.get("note_tags", [])
         
-        prompt = f"""
+        if needs_chunking(note_content):
+            analysis_result = self._analyze_chunked(note_content, note_images, note_tags)
+        else:
+            prompt = f"""
         请分析以下小红书笔记内容：
         笔记内容：{note_content}
         笔记图片：{note_images}
         笔记标签：{note_tags}
         
-        分析内容应该包括：
-        1. 笔记主题和核心内容
-        2. 推荐的地点或产品
-        3. 推荐理由
-        4. 价格信息（如果有）
-        5. 适合人群
-        6. 笔记真实性评估
-        7. 有用的旅行或美食建议
-        8. 相关标签和关键词
+        分析内容应该包括：{ANALYSIS_ITEMS}
         
         请使用清晰的结构和语言，提取有用的信息。
         """
-        
-        analysis_result = self.model.generate(prompt)
+            analysis_result = self.model.generate(prompt)
         
         return {
             "status": "success",
@@ -72,3 +78,49 @@ class XiaoHongShuAgent(BaseAgent):
                 "analysis_result": analysis_result
             }
         }
+    
+    def _analyze_chunked(self, note_content: str, note_images: List[Any], note_tags: List[Any]) -> str:
+        """
+        超长笔记分块并发分析，再合并为与单次分析结构相同的结果
+        
+        Args:
+            note_content: 笔记内容
+            note_images: 笔记图片
+            note_tags: 笔记标签
+        
+        Returns:
+            str: 分析结果
+        """
+        def map_prompt(chunk: str, index: int, total: int) -> str:
+            return f"""
+        以下是一篇长篇小红书笔记的第{index}/{total}部分，请只根据这一部分提取信息：
+        {chunk}
+        
+        提取内容包括（本部分没有涉及的项省略）：{ANALYSIS_ITEMS}
+        
+        请简洁列出要点，保留具体的地点、价格和时间。
+        """
+        
+        def reduce_prompt(partials: List[str], final: bool) -> str:
+            sections = "\n\n".join(f"【第{i}部分】\n{partial}" for i, partial in enumerate(partials, 1))
+            if not final:
+                return f"""
+        以下是一篇长篇小红书笔记相邻几部分的分析要点（按原文顺序）：
+        {sections}
+        
+        请合并为一份要点列表，去掉重复内容，保留具体的地点、价格和时间。
+        """
+            return f"""
+        以下是一篇长篇小红书笔记各部分的分析要点（按原文顺序）：
+        {sections}
+        
+        笔记图片：{note_images}
+        笔记标签：{note_tags}
+        
+        请综合各部分，对整篇笔记给出完整分析，去掉重复内容，保留具体的地点、价格和时间。
+        分析内容应该包括：{ANALYSIS_ITEMS}
+        
+        请使用清晰的结构和语言，提取有用的信息。
+        """
+        
+        return map_reduce(self.model.generate, note_content, map_prompt, reduce_prompt)
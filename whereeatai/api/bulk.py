@@ -0,0 +1,287 @@
+"""小红书笔记批量分析：NDJSON流式输入输出，跳过近似重复的笔记
+
+每行输入一条笔记（字段同单条分析接口，可带 id），每行输出一条结果。笔记内容先计算SimHash指纹，
+与已分析笔记近似重复的直接返回已有的分析结果（或标记为跳过），只有新笔记交给XiaoHongShuAgent，
+同时分析的笔记数受并发上限约束。同一批次中相互近似重复、且都在分析中的笔记只分析一次。
+
+请求体在响应开始后边读边分析，整个请求期间只有 _read_lines 调用 receive()（读取请求体并检测客户端断开）。
+"""
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import logging
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from whereeatai.config import NOTE_BULK_CONCURRENCY, NOTE_BULK_MAX_LINE_BYTES
+from whereeatai.models.dispatcher import LLMOverloadedError
+from whereeatai.utils.fingerprint import get_note_index, hamming_distance, simhash
+from whereeatai.utils.metrics import NOTE_DEDUP_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+# 输入结束标记
+_END = object()
+
+
+async def _body_chunks(receive: Receive) -> AsyncIterator[bytes]:
+    """逐块读取请求体，读取期间客户端断开时抛出ClientDisconnect"""
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ClientDisconnect()
+        yield message.get("body", b"")
+        if not message.get("more_body", False):
+            return
+
+
+async def _read_lines(receive: Receive, queue: asyncio.Queue, workers: int, max_line_bytes: int):
+    """
+    按行读取请求体并放入队列（队列有上限，分析跟不上时暂停读取），结束后为每个worker放入结束标记
+    
+    请求体读完后继续等待客户端断开，断开时抛出ClientDisconnect。
+    被取消或客户端断开时worker随后也被取消，不再放入结束标记（队列已满时等待放入会一直阻塞）。
+    """
+    buffer = b""
+    line_no = 0
+    oversized = False
+    stopped = False
+    try:
+        async for chunk in _body_chunks(receive):
+            buffer += chunk
+            while True:
+                index = buffer.find(b"\n")
+                if index < 0:
+                    break
+                line, buffer = buffer[:index], buffer[index + 1:]
+                if oversized:
+                    oversized = False
+                    continue
+                if line.strip():
+                    line_no += 1
+                    await queue.put((line_no, line))
+            if len(buffer) > max_line_bytes:
+                line_no += 1
+                await queue.put((line_no, None))
+                buffer = b""
+                oversized = True
+        if buffer.strip() and not oversized:
+            line_no += 1
+            await queue.put((line_no, buffer))
+    except (asyncio.CancelledError, ClientDisconnect):
+        stopped = True
+        raise
+    finally:
+        if not stopped:
+            for _ in range(workers):
+                await queue.put(_END)
+    
+    while (await receive())["type"] != "http.disconnect":
+        pass
+    raise ClientDisconnect()
+
+
+class NoteBatch:
+    """一次批量分析请求的处理状态"""
+    
+    def __init__(self, agent_manager, duplicates: str = "cache"):
+        """
+        Args:
+            agent_manager: Agent管理器实例
+            duplicates: 近似重复笔记的处理方式：cache返回已有分析结果，skip只标记跳过
+        """
+        self.agent_manager = agent_manager
+        self.duplicates = duplicates
+        self.index = get_note_index()
+        # 分析中的笔记：行号 -> (指纹, 分析完成时得到结果的future)
+        self.in_flight: Dict[int, Tuple[int, asyncio.Future]] = {}
+        self.counts = {"novel": 0, "duplicate": 0, "batch_duplicate": 0, "error": 0}
+    
+    def _lookup(self, content: str) -> Tuple[int, Optional[Tuple[Dict[str, Any], int, Optional[str]]]]:
+        """计算指纹并查找已分析的近似重复笔记（在线程池中执行）"""
+        fingerprint = simhash(content)
+        return fingerprint, self.index.find(fingerprint)
+    
+    def _in_flight_match(self, fingerprint: int) -> Optional[Tuple[int, asyncio.Future, int]]:
+        """查找同一批次中正在分析的近似重复笔记"""
+        for line_no, (other, future) in self.in_flight.items():
+            distance = hamming_distance(fingerprint, other)
+            if distance <= self.index.max_distance:
+                return line_no, future, distance
+        return None
+    
+    def _duplicate_line(self, line_no: int, note_id: Any, content: str, result: Dict[str, Any], **extra) -> Dict[str, Any]:
+        """近似重复笔记的输出"""
+        line = {"line": line_no, "id": note_id, **extra}
+        if self.duplicates == "skip":
+            line["status"] = "skipped"
+            return line
+        data = dict(result.get("data", {}))
+        data["note_content"] = content
+        line.update(status="success", data=data)
+        return line
+    
+    async def process(self, line_no: int, raw: Optional[bytes]) -> Dict[str, Any]:
+        """
+        处理一行输入
+        
+        Args:
+            line_no: 行号（从1开始，不计空行）
+            raw: 该行内容，超长时为None
+        
+        Returns:
+            Dict: 该行的输出
+        """
+        if raw is None:
+            return self.error(line_no, None, "行过长")
+        try:
+            note = orjson.loads(raw)
+        except orjson.JSONDecodeError as e:
+            return self.error(line_no, None, f"JSON解析失败: {str(e)}")
+        note_id = note.get("id") if isinstance(note, dict) else None
+        content = note.get("note_content") if isinstance(note, dict) else None
+        if not isinstance(content, str) or not content.strip():
+            return self.error(line_no, note_id, "缺少必填字段：note_content")
+        
+        fingerprint, match = await run_in_threadpool(self._lookup, content)
+        if match is not None:
+            result, distance, source_id = match
+            self.counts["duplicate"] += 1
+            NOTE_DEDUP_REQUESTS.labels(result="duplicate").inc()
+            return self._duplicate_line(
+                line_no, note_id, content, result, dedup="duplicate", duplicate_of=source_id, distance=distance
+            )
+        
+        pending = self._in_flight_match(fingerprint)
+        if pending is not None:
+            other_line, future, distance = pending
+            result = await asyncio.shield(future)
+            if result is not None:
+                self.counts["batch_duplicate"] += 1
+                NOTE_DEDUP_REQUESTS.labels(result="batch_duplicate").inc()
+                return self._duplicate_line(
+                    line_no, note_id, content, result,
+                    dedup="batch_duplicate", duplicate_of_line=other_line, distance=distance
+                )
+        
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[line_no] = (fingerprint, future)
+        result = None
+        try:
+            result = await run_in_threadpool(self.agent_manager.execute_agent, "xiaohongshu", note)
+            if result.get("status") != "success":
+                result = None
+                return self.error(line_no, note_id, "笔记分析失败")
+            await run_in_threadpool(self.index.add, fingerprint, result, None if note_id is None else str(note_id))
+            self.counts["novel"] += 1
+            NOTE_DEDUP_REQUESTS.labels(result="novel").inc()
+            return {"line": line_no, "id": note_id, "status": "success", "dedup": "novel", "data": result.get("data", {})}
+        except LLMOverloadedError as e:
+            return self.error(line_no, note_id, str(e), retry_after=e.retry_after)
+        except Exception as e:
+            logger.error(f"批量分析第{line_no}行失败: {str(e)}")
+            return self.error(line_no, note_id, f"笔记分析失败: {str(e)}")
+        finally:
+            del self.in_flight[line_no]
+            future.set_result(result)
+    
+    def error(self, line_no: int, note_id: Any, message: str, **extra) -> Dict[str, Any]:
+        """错误行"""
+        self.counts["error"] += 1
+        NOTE_DEDUP_REQUESTS.labels(result="error").inc()
+        return {"line": line_no, "id": note_id, "status": "error", "message": message, **extra}
+
+
+async def analyze_notes_ndjson(
+    receive: Receive,
+    agent_manager,
+    duplicates: str = "cache",
+    concurrency: int = NOTE_BULK_CONCURRENCY,
+    max_line_bytes: int = NOTE_BULK_MAX_LINE_BYTES
+) -> AsyncIterator[bytes]:
+    """
+    批量分析NDJSON格式的笔记，按完成顺序逐行输出结果，最后一行为汇总
+    
+    Args:
+        receive: ASGI receive（请求体只能由这里读取）
+        agent_manager: Agent管理器实例
+        duplicates: 近似重复笔记的处理方式（cache/skip）
+        concurrency: 同时处理的笔记数
+        max_line_bytes: 单行最大字节数
+    
+    Yields:
+        bytes: 每行一个JSON对象
+    """
+    batch = NoteBatch(agent_manager, duplicates)
+    inputs: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    outputs: asyncio.Queue = asyncio.Queue()
+    
+    async def worker():
+        while True:
+            item = await inputs.get()
+            if item is _END:
+                await outputs.put(_END)
+                return
+            try:
+                line = await batch.process(*item)
+            except Exception as e:
+                logger.error(f"批量分析第{item[0]}行失败: {str(e)}")
+                line = batch.error(item[0], None, f"笔记处理失败: {str(e)}")
+            await outputs.put(line)
+    
+    reader = asyncio.create_task(_read_lines(receive, inputs, concurrency, max_line_bytes))
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    getter = None
+    try:
+        remaining = concurrency
+        while remaining:
+            getter = asyncio.ensure_future(outputs.get())
+            done, _ = await asyncio.wait({getter, reader}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                # 读取结束只可能是客户端断开或读取出错
+                reader.result()
+            line = getter.result()
+            if line is _END:
+                remaining -= 1
+                continue
+            yield orjson.dumps(line) + b"\n"
+        yield orjson.dumps({"summary": batch.counts}) + b"\n"
+    except ClientDisconnect:
+        logger.info("批量分析的客户端已断开，停止读取和分析")
+    finally:
+        if getter is not None:
+            getter.cancel()
+        # 客户端断开时停止读取和分析
+        for task in [reader, *workers]:
+            task.cancel()
+
+
+class NoteBulkResponse(StreamingResponse):
+    """
+    批量分析的NDJSON流式响应
+    
+    StreamingResponse在ASGI 2.4以下的服务器（如uvicorn）上会同时监听客户端断开，监听时调用receive()并丢弃请求体消息；
+    这里不另行监听，请求体读取和断开检测都由 analyze_notes_ndjson 完成。
+    """
+    
+    def __init__(self, agent_manager, duplicates: str = "cache"):
+        """
+        Args:
+            agent_manager: Agent管理器实例
+            duplicates: 近似重复笔记的处理方式（cache/skip）
+        """
+        super().__init__(iter(()), media_type="application/x-ndjson")
+        self.agent_manager = agent_manager
+        self.duplicates = duplicates
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.body_iterator = analyze_notes_ndjson(receive, self.agent_manager, duplicates=self.duplicates)
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
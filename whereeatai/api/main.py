@@ -1,13 +1,21 @@
 """API服务主入口"""
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Request, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from pydantic import BaseModel
-from typing import List, Dict, Any
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Callable, Optional, Set
 from datetime import datetime
+import asyncio
+import contextvars
+import hmac
+import sqlite3
+import time
 import logging
 
 from whereeatai.agents.agent_manager import AgentManager
+from whereeatai.api.bulk import NoteBulkResponse
+from whereeatai.api.stream import travel_plan_events
 from whereeatai.config import (
     PROJECT_NAME, 
     VERSION, 
@@ -15,12 +23,39 @@ from whereeatai.config import (
     ENVIRONMENT,
     ALLOWED_HOSTS,
     RATE_LIMIT_CALLS,
-    RATE_LIMIT_PERIOD
+    RATE_LIMIT_PERIOD,
+    MONITORING_ENABLED,
+    CACHE_ENABLED,
+    API_KEY_HEADER,
+    API_THREADPOOL_SIZE,
+    ADMIN_API_KEY,
+    DEGRADED_CACHE_TTL,
+    SESSION_HISTORY_CHARS,
+    PREFETCH_ENABLED,
+    WARMUP_ENABLED
 )
 from whereeatai.middleware.request_middleware import (
     RequestLoggingMiddleware,
-    RateLimitMiddleware
+    RateLimitMiddleware,
+    TenantAuthMiddleware,
+    PriorityMiddleware,
+    DegradationMiddleware
+)
+from whereeatai.models.dispatcher import LLMOverloadedError, get_llm_dispatcher
+from whereeatai.models.overload import DegradationLevel, get_overload_controller, get_degradation_level
+from whereeatai.utils.tenants import get_tenant_registry
+from whereeatai.utils.health import get_health_state
+from whereeatai.utils.cache import (
+    CachedResponse,
+    get_response_cache,
+    get_refresh_leases,
+    encode_response,
+    build_response
 )
+from whereeatai.utils.context import current_endpoint, current_tenant, scheduling, get_current_endpoint, get_current_tenant
+from whereeatai.utils.plan_store import get_plan_store, refreshing
+from whereeatai.utils.prefetch import get_prefetcher
+from whereeatai.utils.sessions import SessionConflictError, SessionNotFoundError, get_session_store
 
 logger = logging.getLogger(__name__)
 
@@ -42,14 +77,14 @@ app = FastAPI(
     openapi_url="/openapi.json"
 )
 
-# 配置CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=ALLOWED_HOSTS if ALLOWED_HOSTS != ["*"] else ["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# 添加过载降级中间件（请求开始时确定降级等级，响应头标明）
+app.add_middleware(DegradationMiddleware)
+
+# 添加请求优先级中间件（按端点和请求头设置LLM调度优先级及截止时间）
+app.add_middleware(PriorityMiddleware)
+
+# 添加租户认证中间件（在请求日志内层，认证失败的请求也带请求ID）
+app.add_middleware(TenantAuthMiddleware, header_name=API_KEY_HEADER)
 
 # 添加请求日志中间件
 app.add_middleware(RequestLoggingMiddleware)
@@ -61,9 +96,51 @@ app.add_middleware(
     period=RATE_LIMIT_PERIOD
 )
 
+# 配置CORS（最后添加，位于最外层，401/429等中间件直接返回的响应也带CORS头）
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=ALLOWED_HOSTS if ALLOWED_HOSTS != ["*"] else ["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
 logger.info(f"FastAPI应用初始化完成 - 环境: {ENVIRONMENT}")
 
 
+@app.on_event("startup")
+async def configure_threadpool():
+    """扩大同步调用线程池，等待LLM槽位的请求不会占满线程池而绕过公平调度"""
+    import anyio.to_thread
+    
+    anyio.to_thread.current_default_thread_limiter().total_tokens = API_THREADPOOL_SIZE
+
+
+@app.on_event("startup")
+async def warm_up_worker():
+    """
+    worker预热：创建模型客户端、建立上游连接并完成首次上游探测
+    
+    启动事件完成前worker不接收请求；之后在后台定期探测上游，/readyz 读取缓存的探测结果。
+    """
+    health = get_health_state()
+    start = time.perf_counter()
+    if WARMUP_ENABLED:
+        try:
+            await run_in_threadpool(agent_manager.warm_up)
+        except Exception as e:
+            logger.error(f"预热失败: {str(e)}", exc_info=True)
+    await health.probe_upstream()
+    health.mark_warmed_up(time.perf_counter() - start)
+    health.start_probing()
+
+
+@app.on_event("shutdown")
+async def stop_health_probe():
+    """停止上游探测，/readyz 在退出过程中返回503"""
+    get_health_state().stop_probing()
+
+
 # 全局异常处理器
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -100,6 +177,341 @@ class TravelResponse(BaseModel):
     data: Dict[str, Any]
 
 
+class SessionRequest(BaseModel):
+    """会话创建请求模型（旅行需求均可选，可在对话中逐步补充）"""
+    destination: str = ""
+    duration: str = ""
+    interests: List[str] = []
+    budget: str = ""
+    location: str = ""
+    travel_dates: str = ""
+    travel_style: str = ""
+    cuisine_type: str = ""
+
+
+class SessionMessage(BaseModel):
+    """会话消息模型（单条消息不超过对话原文预算的一半，保证最新一轮总能放进提示词）"""
+    message: str = Field(..., min_length=1, max_length=max(1, SESSION_HISTORY_CHARS // 2))
+
+
+def overloaded_response(error: LLMOverloadedError) -> JSONResponse:
+    """
+    上游过载时快速返回503
+    
+    Args:
+        error: 过载异常
+    
+    Returns:
+        JSONResponse: 带Retry-After的503响应（工作流附带run_id，可稍后续跑）
+    """
+    content = {"status": "error", "message": str(error)}
+    if error.run_id:
+        content["run_id"] = error.run_id
+    return JSONResponse(
+        status_code=503,
+        content=content,
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+# 本worker中正在后台刷新/预取的缓存键，以及后台任务（保持引用，避免任务被回收）
+_revalidating: Set[str] = set()
+_prefetching: Set[str] = set()
+
+# 可预取的端点名称（缓存命名空间）及其请求路径，预取时按路径做模型路由。
+# 只包含以旅行需求（TravelRequest）为输入的端点，预取沿用本次请求输入，缓存键才能被后续请求命中；
+# 笔记/视频分析针对具体内容，会话和自定义Agent的输入各不相同，均不预取
+PREFETCH_ENDPOINTS: Dict[str, str] = {
+    "workflow:travel_plan:standard": "/travel-plan",
+    "workflow:travel_plan:fast": "/travel-plan",
+    "agent:food_recommendation": "/food-recommendation",
+    "agent:itinerary": "/itinerary",
+    "agent:travelogue": "/travelogue",
+    "agent:price_comparison": "/price-comparison",
+    "agent:topic_recommendation": "/topic-recommendation"
+}
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _spawn(coro):
+    """在事件循环中启动后台任务"""
+    task = asyncio.get_running_loop().create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _refresh_entry(
+    key: str,
+    stale_entry: CachedResponse,
+    compute: Callable[[], Dict[str, Any]],
+    endpoint: str,
+    tenant: str
+):
+    """
+    后台刷新一个缓存条目（在线程池中、以空上下文执行，不继承原请求的优先级和截止时间，
+    沿用原请求的端点做模型路由，用量计入原请求的租户）
+    
+    Args:
+        key: 缓存键
+        stale_entry: 已软过期的条目
+        compute: 生成结果的函数
+        endpoint: 触发刷新的请求端点
+        tenant: 触发刷新的请求所属租户
+    """
+    current_endpoint.set(endpoint)
+    current_tenant.set(tenant)
+    leases = get_refresh_leases()
+    regenerate, published = leases.acquire(key, stale_entry.created_at)
+    if published is not None:
+        # 其他worker已刷新过，直接使用其发布的结果
+        get_response_cache().put(key, published)
+        logger.info(f"缓存使用其他worker的刷新结果: {key}")
+        return
+    if not regenerate:
+        # 其他worker正在刷新，本worker下次软过期命中时再读取结果
+        return
+    entry = None
+    try:
+        with scheduling(priority="low"), refreshing():
+            result = compute()
+        if result.get("status") == "success":
+            entry = encode_response(result)
+            get_response_cache().put(key, entry)
+            logger.info(f"缓存后台刷新完成: {key}")
+    finally:
+        leases.release(key, entry)
+
+
+async def _revalidate(
+    key: str,
+    stale_entry: CachedResponse,
+    compute: Callable[[], Dict[str, Any]],
+    endpoint: str,
+    tenant: str
+):
+    """后台刷新任务"""
+    try:
+        await run_in_threadpool(
+            contextvars.Context().run, _refresh_entry, key, stale_entry, compute, endpoint, tenant
+        )
+    except Exception as e:
+        logger.warning(f"缓存后台刷新失败: {key}, 错误: {str(e)}")
+    finally:
+        _revalidating.discard(key)
+
+
+def schedule_revalidation(key: str, stale_entry: CachedResponse, compute: Callable[[], Dict[str, Any]]):
+    """
+    为软过期的条目安排一次后台刷新（同一worker内同一条目只有一个刷新任务）
+    
+    Args:
+        key: 缓存键
+        stale_entry: 已软过期的条目
+        compute: 生成结果的函数
+    """
+    if key in _revalidating:
+        return
+    _revalidating.add(key)
+    _spawn(_revalidate(key, stale_entry, compute, get_current_endpoint(), get_current_tenant()))
+
+
+def cache_hit_headers(
+    key: str,
+    entry: CachedResponse,
+    level: DegradationLevel,
+    compute: Callable[[], Dict[str, Any]]
+) -> Dict[str, str]:
+    """
+    缓存命中时的响应头，软过期的条目同时安排一次后台刷新
+    
+    Args:
+        key: 缓存键
+        entry: 命中的条目
+        level: 本次请求的降级等级
+        compute: 生成结果的函数
+    
+    Returns:
+        Dict[str, str]: X-Cache 等响应头
+    """
+    if entry.fresh:
+        return {"X-Cache": "fresh"}
+    # 降级期间不做后台刷新，恢复后由下一次软过期命中触发
+    if entry.revalidatable and level == DegradationLevel.NORMAL:
+        schedule_revalidation(key, entry, compute)
+    return {"X-Cache": "stale", "Warning": '110 - "Response is Stale"'}
+
+
+def session_id(http_request: Request) -> str:
+    """会话标识：优先使用 X-Session-Id 请求头，否则为租户和客户端地址"""
+    session = http_request.headers.get("x-session-id")
+    if session:
+        return f"{get_current_tenant()}:{session}"
+    client = http_request.client.host if http_request.client else ""
+    return f"{get_current_tenant()}@{client}"
+
+
+def _prefetch_entry(target: str, key: str, input_data: Dict[str, Any], tenant: str):
+    """
+    以低优先级执行一次预取（在线程池中、以空上下文执行，按预取端点做模型路由，用量计入原请求的租户），
+    结果写入生成内容存储和响应缓存
+    
+    Args:
+        target: 预取的端点名称
+        key: 缓存键
+        input_data: 请求输入
+        tenant: 触发预取的请求所属租户
+    """
+    current_endpoint.set(PREFETCH_ENDPOINTS[target])
+    current_tenant.set(tenant)
+    get_prefetcher().mark_issued(key)
+    with scheduling(priority="low"):
+        result = agent_manager.execute_target(target, input_data)
+    if CACHE_ENABLED and result.get("status") == "success":
+        get_response_cache().put(key, encode_response(result))
+
+
+async def _prefetch(target: str, key: str, input_data: Dict[str, Any], tenant: str):
+    """后台预取任务"""
+    try:
+        await run_in_threadpool(contextvars.Context().run, _prefetch_entry, target, key, input_data, tenant)
+    except LLMOverloadedError:
+        logger.debug(f"预取被拒绝（上游过载）: {target}")
+    except Exception as e:
+        logger.warning(f"预取失败: {target}, 错误: {str(e)}")
+    finally:
+        _prefetching.discard(key)
+
+
+def schedule_prefetch(targets: List[str], input_data: Dict[str, Any]):
+    """
+    为预测的后续端点安排预取（不在PREFETCH_ENDPOINTS中、已缓存或正在预取的跳过，超出预算时停止）
+    
+    Args:
+        targets: 预测的后续端点名称
+        input_data: 本次请求输入（后续请求通常沿用同一输入）
+    """
+    cache = get_response_cache()
+    prefetcher = get_prefetcher()
+    tenant = get_current_tenant()
+    for target in targets:
+        if target not in PREFETCH_ENDPOINTS:
+            continue
+        key = cache.make_key(target, input_data)
+        if key in _prefetching or cache.contains(key):
+            continue
+        if not prefetcher.try_acquire():
+            break
+        _prefetching.add(key)
+        _spawn(_prefetch(target, key, input_data, tenant))
+
+
+# 本worker中正在后台合并摘要的会话
+_summarizing: Set[str] = set()
+
+
+def _summarize_entry(session_id: str, tenant: str):
+    """
+    以低优先级合并会话摘要（在线程池中、以空上下文执行，用量计入会话所属租户）
+    
+    Args:
+        session_id: 会话ID
+        tenant: 会话所属租户
+    """
+    current_tenant.set(tenant)
+    with scheduling(priority="low"):
+        agent_manager.compact_session(session_id, tenant)
+
+
+async def _summarize(session_id: str, tenant: str):
+    """后台合并会话摘要任务"""
+    try:
+        await run_in_threadpool(contextvars.Context().run, _summarize_entry, session_id, tenant)
+    except LLMOverloadedError:
+        logger.debug(f"会话摘要合并被拒绝（上游过载），下一轮对话后重试: {session_id}")
+    except Exception as e:
+        logger.warning(f"会话摘要合并失败: {session_id}, 错误: {str(e)}")
+    finally:
+        _summarizing.discard(session_id)
+
+
+def schedule_summary(session_id: str, tenant: str):
+    """
+    回复返回后在后台把会话中较早的消息合并进滚动摘要（同一worker内同一会话只有一个合并任务）
+    
+    Args:
+        session_id: 会话ID
+        tenant: 会话所属租户
+    """
+    if session_id in _summarizing:
+        return
+    _summarizing.add(session_id)
+    _spawn(_summarize(session_id, tenant))
+
+
+async def cached_response(
+    http_request: Request,
+    cache_name: str,
+    input_data: Dict[str, Any],
+    compute: Callable[[], Dict[str, Any]]
+) -> Response:
+    """
+    以预编码JSON返回结果，开启缓存时成功结果按输入缓存
+    
+    缓存命中时直接返回已编码的字节；带ETag，If-None-Match匹配时返回304；
+    大响应在客户端支持时返回预先压缩的gzip。同步的Agent调用在线程池中执行，不阻塞事件循环；
+    上游过载被拒绝时返回503。
+    
+    软过期、未硬过期的条目立即返回并安排一次后台刷新；响应头 X-Cache 标明
+    fresh（未过期）、stale（返回旧结果）或 refreshed（本次请求重新生成）。
+    开启推测预取时，成功响应后在后台预取该会话很可能接着请求的端点。
+    
+    Args:
+        http_request: 原始请求
+        cache_name: 缓存命名空间
+        input_data: 请求输入
+        compute: 未命中时生成结果的函数
+    
+    Returns:
+        Response: 响应
+    """
+    cache = get_response_cache()
+    key = cache.make_key(cache_name, input_data)
+    level = get_degradation_level()
+    # 最高降级等级下接受已过期的缓存结果
+    entry = cache.get(key, allow_stale=level >= DegradationLevel.STALE_CACHE) if CACHE_ENABLED else None
+    targets = []
+    if PREFETCH_ENABLED:
+        try:
+            targets = await run_in_threadpool(get_prefetcher().observe, session_id(http_request), cache_name, key)
+        except sqlite3.Error as e:
+            logger.warning(f"记录预取会话失败: {str(e)}")
+    headers = {}
+    succeeded = True
+    if entry is None:
+        try:
+            result = await run_in_threadpool(compute)
+        except LLMOverloadedError as e:
+            return overloaded_response(e)
+        entry = encode_response(result)
+        succeeded = result.get("status") == "success"
+        if CACHE_ENABLED and succeeded:
+            # 降级生成的结果只短暂缓存，恢复后尽快由完整结果替换
+            cache.put(key, entry, ttl=DEGRADED_CACHE_TTL if level else None)
+        if CACHE_ENABLED:
+            headers["X-Cache"] = "refreshed"
+    else:
+        headers = cache_hit_headers(key, entry, level, compute)
+    # 降级期间不做推测预取
+    if targets and succeeded and level == DegradationLevel.NORMAL:
+        schedule_prefetch(targets, input_data)
+    return build_response(
+        entry,
+        if_none_match=http_request.headers.get("if-none-match", ""),
+        accept_encoding=http_request.headers.get("accept-encoding", ""),
+        headers=headers
+    )
+
+
 @app.get("/")
 async def root():
     """根路径"""
@@ -124,122 +536,357 @@ async def status():
     }
 
 
+@app.get("/livez")
+async def livez():
+    """存活检查：进程和事件循环能够响应即返回200，不做任何I/O"""
+    return Response(content=b'{"status":"alive"}', media_type="application/json")
+
+
+@app.get("/readyz")
+async def readyz():
+    """就绪检查：预热完成且缓存的上游探测结果为可达时返回200，否则返回503"""
+    ready, checks = get_health_state().readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not_ready", "checks": checks}
+    )
+
+
+if MONITORING_ENABLED:
+    from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+    
+    @app.get("/metrics")
+    async def metrics():
+        """Prometheus监控指标（含按模型拆分的LLM调用次数、延迟和token用量）"""
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+@app.get("/tenant/usage")
+async def tenant_usage(request: Request):
+    """当前租户的用量、配额，以及本进程LLM调度器状态"""
+    tenant_id = getattr(request.state, "tenant", "default")
+    return {
+        "status": "success",
+        "data": {
+            **get_tenant_registry().get_usage(tenant_id),
+            "dispatcher": get_llm_dispatcher().stats()
+        }
+    }
+
+
+def require_admin(request: Request):
+    """校验管理密钥（X-Admin-Key 请求头），未配置管理密钥时禁用管理接口"""
+    provided = request.headers.get("x-admin-key", "")
+    if not ADMIN_API_KEY or not hmac.compare_digest(provided.encode("utf-8"), ADMIN_API_KEY.encode("utf-8")):
+        raise HTTPException(status_code=403, detail="无权访问管理接口")
+
+
+class DegradationRequest(BaseModel):
+    """降级等级设置请求"""
+    level: Optional[int] = Field(default=None, ge=0, le=4, description="降级等级，null表示自动调整")
+
+
+@app.get("/admin/degradation", dependencies=[Depends(require_admin)])
+async def get_degradation():
+    """当前降级状态"""
+    return {"status": "success", "data": get_overload_controller().stats()}
+
+
+@app.put("/admin/degradation", dependencies=[Depends(require_admin)])
+async def set_degradation(request: DegradationRequest):
+    """手动设置降级等级（0-4），level为null时恢复自动调整"""
+    controller = get_overload_controller()
+    controller.set_override(request.level)
+    return {"status": "success", "data": controller.stats()}
+
+
+@app.get("/admin/prefetch", dependencies=[Depends(require_admin)])
+async def prefetch_stats():
+    """推测预取状态：本worker学到的端点跳转概率和最近一天的预取命中率"""
+    if not PREFETCH_ENABLED:
+        return {"status": "success", "data": {"enabled": False}}
+    return {"status": "success", "data": {"enabled": True, **await run_in_threadpool(get_prefetcher().stats)}}
+
+
+@app.get("/admin/plans", dependencies=[Depends(require_admin)])
+async def search_plans(
+    q: str = "",
+    kind: Optional[str] = None,
+    destination: Optional[str] = None,
+    limit: int = Query(default=20, ge=1, le=200),
+    offset: int = Query(default=0, ge=0)
+):
+    """查询已保存的生成内容（q为全文检索关键词，kind如 agent:itinerary、workflow:travel_plan:standard）"""
+    plans = await run_in_threadpool(get_plan_store().search, q, kind, destination, limit, offset)
+    return {"status": "success", "data": plans}
+
+
+@app.get("/admin/plans/stats", dependencies=[Depends(require_admin)])
+async def plan_store_stats():
+    """生成内容存储统计"""
+    return {"status": "success", "data": await run_in_threadpool(get_plan_store().stats)}
+
+
+@app.get("/admin/plans/{plan_id}", dependencies=[Depends(require_admin)])
+async def get_plan(plan_id: int):
+    """获取已保存的生成内容详情"""
+    plan = await run_in_threadpool(get_plan_store().get, plan_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"条目不存在: {plan_id}")
+    return {"status": "success", "data": plan}
+
+
+@app.delete("/admin/plans/{plan_id}", dependencies=[Depends(require_admin)])
+async def delete_plan(plan_id: int):
+    """删除已保存的生成内容，之后相同需求会重新生成"""
+    if not await run_in_threadpool(get_plan_store().delete, plan_id):
+        raise HTTPException(status_code=404, detail=f"条目不存在: {plan_id}")
+    return {"status": "success", "message": f"已删除条目: {plan_id}"}
+
+
 @app.post("/travel-plan")
-async def generate_travel_plan(request: TravelRequest):
-    """生成旅行计划"""
+async def generate_travel_plan(request: TravelRequest, http_request: Request, mode: str = "standard"):
+    """生成旅行计划（mode=fast时单次模型调用生成，延迟更低）"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行旅行计划工作流
-        result = agent_manager.execute_workflow("travel_plan", input_data)
+        return await cached_response(
+            http_request, f"workflow:travel_plan:{mode}", input_data,
+            lambda: agent_manager.execute_workflow("travel_plan", input_data, mode=mode)
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"生成旅行计划失败: {str(e)}")
+
+
+@app.post("/travel-plan/stream")
+async def stream_travel_plan(request: TravelRequest):
+    """
+    以SSE推送旅行计划的生成进度
+    
+    每个工作流节点开始和完成时推送一个事件，完成事件携带该节点的结果（如行程先于比价返回），
+    最后推送与 /travel-plan 相同的完整结果；与 /travel-plan（standard模式）共用响应缓存，
+    X-Cache 响应头和软过期条目的后台刷新也与 /travel-plan 一致。
+    """
+    input_data = request.model_dump()
+    cache = get_response_cache()
+    key = cache.make_key("workflow:travel_plan:standard", input_data)
+    level = get_degradation_level()
+    entry = cache.get(key, allow_stale=level >= DegradationLevel.STALE_CACHE) if CACHE_ENABLED else None
+    
+    def store(result: Dict[str, Any]):
+        if CACHE_ENABLED and result.get("status") == "success":
+            cache.put(key, encode_response(result), ttl=DEGRADED_CACHE_TTL if level else None)
+    
+    # 禁止代理缓冲和缓存，事件即时到达客户端
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if entry is not None:
+        headers.update(cache_hit_headers(
+            key, entry, level,
+            lambda: agent_manager.execute_workflow("travel_plan", input_data, mode="standard")
+        ))
+    elif CACHE_ENABLED:
+        headers["X-Cache"] = "refreshed"
+    
+    return StreamingResponse(
+        travel_plan_events(agent_manager, input_data, cached=entry.body if entry else None, on_result=store),
+        media_type="text/event-stream",
+        headers=headers
+    )
+
+
+@app.post("/travel-plan/{run_id}/resume")
+async def resume_travel_plan(run_id: str):
+    """断点续跑旅行计划，只重新生成失败或缺失的部分"""
+    try:
+        result = await run_in_threadpool(agent_manager.resume_workflow, "travel_plan", run_id)
         
         return result
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"生成旅行计划失败: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"续跑旅行计划失败: {str(e)}")
+
+
+@app.post("/sessions")
+async def create_session(request: SessionRequest):
+    """创建对话式规划会话，之后每轮只需发送新消息"""
+    session = await run_in_threadpool(get_session_store().create, get_current_tenant(), request.model_dump())
+    return {
+        "status": "success",
+        "message": "会话创建成功",
+        "data": {"session_id": session["session_id"], "context": session["context"]}
+    }
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    """获取会话的旅行需求、滚动摘要和最近几轮原文"""
+    session = await run_in_threadpool(get_session_store().get, session_id, get_current_tenant())
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"会话不存在或已过期: {session_id}")
+    session.pop("tenant")
+    return {"status": "success", "data": session}
+
+
+@app.post("/sessions/{session_id}/messages")
+async def send_session_message(session_id: str, request: SessionMessage):
+    """
+    在会话中发送一条消息
+    
+    提示词只包含会话的旅行需求、滚动摘要和最近几轮原文；原文过长时回复返回后在后台合并进摘要。
+    同一会话的上一条消息尚未处理完时返回409。
+    """
+    tenant = get_current_tenant()
+    session = await run_in_threadpool(get_session_store().get, session_id, tenant)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"会话不存在或已过期: {session_id}")
+    try:
+        result = await run_in_threadpool(agent_manager.converse, session, request.message)
+    except LLMOverloadedError as e:
+        return overloaded_response(e)
+    except SessionConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except SessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"会话对话失败: {str(e)}")
+    if result.get("status") != "success":
+        raise HTTPException(status_code=500, detail=f"会话对话失败: {result.get('message', '')}")
+    
+    if result["data"].pop("needs_summary", False):
+        schedule_summary(session_id, tenant)
+    return result
+
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """删除会话"""
+    if not await run_in_threadpool(get_session_store().delete, session_id, get_current_tenant()):
+        raise HTTPException(status_code=404, detail=f"会话不存在或已过期: {session_id}")
+    return {"status": "success", "message": f"已删除会话: {session_id}"}
 
 
 @app.post("/food-recommendation")
-async def recommend_food(request: TravelRequest):
+async def recommend_food(request: TravelRequest, http_request: Request):
     """推荐美食"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行美食推荐
-        result = agent_manager.execute_agent("food_recommendation", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:food_recommendation", input_data,
+            lambda: agent_manager.execute_agent("food_recommendation", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"推荐美食失败: {str(e)}")
 
 
 @app.post("/itinerary")
-async def generate_itinerary(request: TravelRequest):
+async def generate_itinerary(request: TravelRequest, http_request: Request):
     """生成行程安排"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行行程规划
-        result = agent_manager.execute_agent("itinerary", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:itinerary", input_data,
+            lambda: agent_manager.execute_agent("itinerary", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成行程安排失败: {str(e)}")
 
 
 @app.post("/travelogue")
-async def generate_travelogue(request: TravelRequest):
+async def generate_travelogue(request: TravelRequest, http_request: Request):
     """生成游记"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行游记生成
-        result = agent_manager.execute_agent("travelogue", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:travelogue", input_data,
+            lambda: agent_manager.execute_agent("travelogue", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"生成游记失败: {str(e)}")
 
 
 @app.post("/price-comparison")
-async def compare_prices(request: TravelRequest):
+async def compare_prices(request: TravelRequest, http_request: Request):
     """多平台价格比价"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行价格比价
-        result = agent_manager.execute_agent("price_comparison", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:price_comparison", input_data,
+            lambda: agent_manager.execute_agent("price_comparison", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"价格比价失败: {str(e)}")
 
 
 @app.post("/xiaohongshu-analysis")
-async def analyze_xiaohongshu(request: TravelRequest):
+async def analyze_xiaohongshu(request: TravelRequest, http_request: Request):
     """分析小红书笔记"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行小红书笔记分析
-        result = agent_manager.execute_agent("xiaohongshu", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:xiaohongshu", input_data,
+            lambda: agent_manager.execute_agent("xiaohongshu", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"小红书笔记分析失败: {str(e)}")
 
 
+@app.post("/xiaohongshu-analysis/bulk")
+async def analyze_xiaohongshu_bulk(duplicates: str = Query(default="cache", pattern="^(cache|skip)$")):
+    """
+    批量分析小红书笔记（NDJSON输入输出）
+    
+    请求体每行一条笔记（note_content必填，可带id、note_images、note_tags），响应按完成顺序每行输出一条结果，
+    最后一行为汇总。与已分析笔记近似重复的不再调用模型：duplicates=cache时返回已有分析结果，skip时只标记跳过。
+    """
+    return NoteBulkResponse(agent_manager, duplicates=duplicates)
+
+
 @app.post("/video-analysis")
-async def analyze_video(request: TravelRequest):
+async def analyze_video(request: TravelRequest, http_request: Request):
     """分析视频内容"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行视频分析
-        result = agent_manager.execute_agent("video", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:video", input_data,
+            lambda: agent_manager.execute_agent("video", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"视频分析失败: {str(e)}")
 
 
 @app.post("/topic-recommendation")
-async def recommend_topic(request: TravelRequest):
+async def recommend_topic(request: TravelRequest, http_request: Request):
     """生成专题推荐"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行专题推荐
-        result = agent_manager.execute_agent("topic_recommendation", input_data)
-        
-        return result
+        return await cached_response(
+            http_request, "agent:topic_recommendation", input_data,
+            lambda: agent_manager.execute_agent("topic_recommendation", input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"专题推荐生成失败: {str(e)}")
 
@@ -261,15 +908,16 @@ async def get_agents():
 
 
 @app.post("/execute-agent/{agent_name}")
-async def execute_agent(agent_name: str, request: TravelRequest):
+async def execute_agent(agent_name: str, request: TravelRequest, http_request: Request):
     """执行指定Agent"""
     try:
         # 转换请求模型为字典
         input_data = request.model_dump()
         
         # 使用AgentManager执行指定Agent
-        result = agent_manager.execute_agent(agent_name, input_data)
-        
-        return result
+        return await cached_response(
+            http_request, f"agent:{agent_name}", input_data,
+            lambda: agent_manager.execute_agent(agent_name, input_data)
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"执行Agent失败: {str(e)}")
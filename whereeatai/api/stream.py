@@ -0,0 +1,117 @@
+"""旅行计划进度事件流（SSE）
+
+工作流每个节点开始和完成时推送一个事件，完成事件携带该节点的结果（如行程），客户端可以先展示
+已完成的部分，不必等待最慢的Agent；最后推送与 /travel-plan 相同的完整结果。
+
+事件格式（text/event-stream）：
+    event: node_started    data: {"node": ..., "run_id": ...}
+    event: node_completed  data: {"node": ..., "run_id": ..., "status": ..., "elapsed": ..., "result": {...}}
+    event: result          data: 完整的旅行计划
+    event: error           data: {"status": "error", "message": ..., "retry_after": ..., "run_id": ...}
+"""
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+import asyncio
+import logging
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from whereeatai.graphs.travel_workflow import progress_events
+from whereeatai.models.dispatcher import LLMOverloadedError
+
+logger = logging.getLogger(__name__)
+
+# 没有事件时发送心跳注释的间隔(秒)，避免代理因空闲断开连接
+HEARTBEAT_INTERVAL = 15
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    """
+    编码一个SSE事件
+    
+    Args:
+        event: 事件类型
+        data: 事件数据（编码为单行JSON），已编码的JSON字节原样发送
+    
+    Returns:
+        bytes: 事件字节
+    """
+    payload = data if isinstance(data, bytes) else orjson.dumps(data, default=str)
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + payload + b"\n\n"
+
+
+async def travel_plan_events(
+    agent_manager,
+    input_data: Dict[str, Any],
+    cached: Optional[bytes] = None,
+    on_result: Optional[Callable[[Dict[str, Any]], None]] = None,
+    heartbeat: float = HEARTBEAT_INTERVAL
+) -> AsyncIterator[bytes]:
+    """
+    执行旅行计划工作流并逐个推送节点事件
+    
+    Args:
+        agent_manager: Agent管理器实例
+        input_data: 请求输入
+        cached: 已缓存的完整结果（JSON字节），有缓存时直接推送结果事件
+        on_result: 工作流完成后对完整结果的回调（如写入响应缓存）
+        heartbeat: 心跳间隔(秒)
+    
+    Yields:
+        bytes: SSE事件
+    """
+    if cached is not None:
+        yield sse_event("result", cached)
+        return
+    
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    
+    def sink(event: Dict[str, Any]):
+        # 节点在工作线程中执行，事件交给事件循环线程入队
+        loop.call_soon_threadsafe(events.put_nowait, event)
+    
+    def run() -> Dict[str, Any]:
+        with progress_events(sink):
+            return agent_manager.execute_workflow("travel_plan", input_data)
+    
+    # 客户端断开后工作流仍在线程中执行完毕，结果照常进入生成内容存储
+    task = asyncio.ensure_future(run_in_threadpool(run))
+    getter = None
+    try:
+        while not task.done():
+            getter = asyncio.ensure_future(events.get())
+            done, _ = await asyncio.wait({getter, task}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                event = getter.result()
+                yield sse_event(event.pop("event"), event)
+                continue
+            getter.cancel()
+            if not done:
+                yield b": ping\n\n"
+    finally:
+        # 客户端断开时取消等待中的取事件任务
+        if getter is not None:
+            getter.cancel()
+    # 工作流结束前入队的事件
+    while not events.empty():
+        event = events.get_nowait()
+        yield sse_event(event.pop("event"), event)
+    
+    try:
+        result = task.result()
+    except LLMOverloadedError as e:
+        yield sse_event("error", {
+            "status": "error",
+            "message": str(e),
+            "retry_after": e.retry_after,
+            "run_id": e.run_id
+        })
+        return
+    except Exception as e:
+        logger.error(f"旅行计划事件流执行失败: {str(e)}")
+        yield sse_event("error", {"status": "error", "message": f"生成旅行计划失败: {str(e)}"})
+        return
+    if on_result is not None:
+        on_result(result)
+    yield sse_event("result", result)
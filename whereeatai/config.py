@@ -10,17 +10,40 @@ load_dotenv()
 API_KEY = os.getenv("API_KEY", "")
 BASE_URL = os.getenv("BASE_URL", "https://api.siliconflow.cn/v1")
 MODEL_NAME = os.getenv("MODEL_NAME", "Qwen/Qwen2.5-7B-Instruct")
+MODEL_TEMPERATURE = float(os.getenv("MODEL_TEMPERATURE", "0.7"))
+MODEL_MAX_TOKENS = int(os.getenv("MODEL_MAX_TOKENS", "4096"))
+MODEL_FALLBACK_NAME = os.getenv("MODEL_FALLBACK_NAME", "")  # 默认备用模型，过载时自动切换
+
+# 模型路由配置：JSON字符串或JSON文件路径，按Agent和端点覆盖模型参数
+# 例如 {"agents": {"price_comparison": {"model": "...", "max_tokens": 1024}}, "endpoints": {"/travel-plan": {...}}}
+MODEL_ROUTES = os.getenv("MODEL_ROUTES", "")
 
 # API服务配置
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
 API_WORKERS = int(os.getenv("API_WORKERS", "4"))
+# 执行同步Agent调用的线程池大小（排队等待LLM槽位的请求也占用线程）
+API_THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "200"))
+# 生产启动器：主进程预加载应用后fork worker（写时复制共享内存）
+API_PRELOAD = os.getenv("API_PRELOAD", "true").lower() == "true"
+API_WORKER_TIMEOUT = int(os.getenv("API_WORKER_TIMEOUT", "180"))  # worker无响应多久后被重启(秒)
+API_GRACEFUL_TIMEOUT = int(os.getenv("API_GRACEFUL_TIMEOUT", "30"))  # 重启/停止时等待请求完成的时间(秒)
+# worker启动时预热（模型客户端和上游连接），完成前不接收请求
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+# 上游可达性探测间隔和超时(秒)，/readyz 只读取缓存的探测结果
+READINESS_PROBE_INTERVAL = float(os.getenv("READINESS_PROBE_INTERVAL", "30"))
+READINESS_PROBE_TIMEOUT = float(os.getenv("READINESS_PROBE_TIMEOUT", "5"))
 
 # 日志配置
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_DIR = os.getenv("LOG_DIR", "logs")
 LOG_FILE = os.getenv("LOG_FILE", "whereeatai.log")
 LOG_JSON = os.getenv("LOG_JSON", "false").lower() == "true"
+# 异步日志队列容量（0表示同步写日志），队列满时的策略: drop(丢弃) / block(阻塞等待)
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_QUEUE_POLICY = os.getenv("LOG_QUEUE_POLICY", "drop")
+# 按日志器对INFO及以下日志采样（JSON: {日志器名: 保留比例}，子日志器继承）
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", '{"whereeatai.protocols.a2a_protocol": 0.01}')
 
 # 限流配置
 RATE_LIMIT_CALLS = int(os.getenv("RATE_LIMIT_CALLS", "100"))
@@ -30,9 +53,103 @@ RATE_LIMIT_PERIOD = int(os.getenv("RATE_LIMIT_PERIOD", "60"))
 MAX_TIMEOUT = int(os.getenv("MAX_TIMEOUT", "120"))  # 最大超时时间(秒)
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "false").lower() == "true"
 CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))  # 缓存过期时间(秒)
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1024"))  # 响应缓存最大条数
+CACHE_COMPRESS_MIN_BYTES = int(os.getenv("CACHE_COMPRESS_MIN_BYTES", "1024"))  # 达到该大小的响应预先gzip压缩
+CACHE_HARD_TTL = int(os.getenv("CACHE_HARD_TTL", "14400"))  # 从生成起可先返回旧结果再后台刷新的时间(秒)，超过后同步生成
+CACHE_STALE_TTL = int(os.getenv("CACHE_STALE_TTL", "86400"))  # 过期后仍可在降级时返回的时间(秒)
+CACHE_REFRESH_LEASE = int(os.getenv("CACHE_REFRESH_LEASE", "180"))  # 后台刷新租约有效期(秒)，应大于一次生成的耗时
+CACHE_LEASE_DB_PATH = os.getenv("CACHE_LEASE_DB_PATH", "data/cache_leases.db")  # 刷新租约数据库，各worker共享
+
+# 过载降级配置：按LLM排队深度和p95延迟逐级降级
+DEGRADATION_ENABLED = os.getenv("DEGRADATION_ENABLED", "true").lower() == "true"
+DEGRADATION_LATENCY_TARGET = float(os.getenv("DEGRADATION_LATENCY_TARGET", "20"))  # LLM调用p95延迟目标(秒)
+DEGRADATION_QUEUE_TARGET = float(os.getenv("DEGRADATION_QUEUE_TARGET", "0.5"))  # 排队深度目标（占LLM_QUEUE_SIZE的比例）
+DEGRADATION_INTERVAL = float(os.getenv("DEGRADATION_INTERVAL", "10"))  # 两次调整降级等级的最小间隔(秒)
+DEGRADED_MAX_TOKENS_RATIO = float(os.getenv("DEGRADED_MAX_TOKENS_RATIO", "0.5"))  # 降级时max_tokens缩小比例
+DEGRADED_MODEL_NAME = os.getenv("DEGRADED_MODEL_NAME", MODEL_FALLBACK_NAME)  # 降级时使用的小模型，为空时不切换
+DEGRADED_CACHE_TTL = int(os.getenv("DEGRADED_CACHE_TTL", "60"))  # 降级结果的缓存时间(秒)
+
+# 工作流检查点配置
+CHECKPOINT_ENABLED = os.getenv("CHECKPOINT_ENABLED", "true").lower() == "true"
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "data/checkpoints.db")
+CHECKPOINT_TTL = int(os.getenv("CHECKPOINT_TTL", "86400"))  # 检查点保留时间(秒)
+
+# 生成内容存储配置：保存成功的Agent/工作流输出，相同需求直接复用
+PLAN_STORE_ENABLED = os.getenv("PLAN_STORE_ENABLED", "true").lower() == "true"
+PLAN_STORE_DB_PATH = os.getenv("PLAN_STORE_DB_PATH", "data/plans.db")
+PLAN_STORE_MAX_AGE = int(os.getenv("PLAN_STORE_MAX_AGE", "604800"))  # 可直接复用的最大年龄(秒)
+PLAN_STORE_RETENTION = int(os.getenv("PLAN_STORE_RETENTION", "2592000"))  # 条目保留时间(秒)
+# 不存储/复用的Agent（逗号分隔），价格等时效性强的数据不复用
+PLAN_STORE_EXCLUDE = [name.strip() for name in os.getenv("PLAN_STORE_EXCLUDE", "price_comparison").split(",") if name.strip()]
+
+# 预计算任务配置：低峰期为热门目的地提前生成内容
+PRECOMPUTE_PEAK_HOURS = os.getenv("PRECOMPUTE_PEAK_HOURS", "11-21")  # 高峰时段（本地小时，如 "11-14,17-21"）
+PRECOMPUTE_CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", "2"))  # 同时执行的预计算项数
+PRECOMPUTE_TARGETS = os.getenv("PRECOMPUTE_TARGETS", "workflow:travel_plan:standard")  # 目的地列表默认生成的内容（逗号分隔）
+PRECOMPUTE_STATE_PATH = os.getenv("PRECOMPUTE_STATE_PATH", "data/precompute_state.json")  # 进度文件，用于断点续跑
+
+# 小红书笔记批量分析配置：SimHash指纹分段LSH查找近似重复笔记
+NOTE_DEDUP_DB_PATH = os.getenv("NOTE_DEDUP_DB_PATH", "data/notes.db")
+NOTE_DEDUP_BANDS = int(os.getenv("NOTE_DEDUP_BANDS", "6"))  # 64位指纹的分段数
+NOTE_DEDUP_MAX_DISTANCE = int(os.getenv("NOTE_DEDUP_MAX_DISTANCE", "5"))  # 视为近似重复的最大汉明距离，不应超过分段数-1
+NOTE_DEDUP_TTL = int(os.getenv("NOTE_DEDUP_TTL", "2592000"))  # 已分析笔记的保留时间(秒)
+NOTE_BULK_CONCURRENCY = int(os.getenv("NOTE_BULK_CONCURRENCY", "4"))  # 每个批量请求同时分析的笔记数
+NOTE_BULK_MAX_LINE_BYTES = int(os.getenv("NOTE_BULK_MAX_LINE_BYTES", "1048576"))  # 单行最大字节数
+
+# 视频帧预处理配置：近似重复的帧只保留一帧，再在token预算内选取时间分散、内容不同的帧写入提示词
+VIDEO_FRAME_TOKEN_BUDGET = int(os.getenv("VIDEO_FRAME_TOKEN_BUDGET", "1500"))  # 视频帧部分的token预算，0表示不限制
+VIDEO_FRAME_IMAGE_DISTANCE = int(os.getenv("VIDEO_FRAME_IMAGE_DISTANCE", "10"))  # 画面差异哈希(64位)视为相同的最大汉明距离
+VIDEO_FRAME_TEXT_DISTANCE = int(os.getenv("VIDEO_FRAME_TEXT_DISTANCE", "3"))  # 帧描述SimHash视为相同的最大汉明距离
+
+# 长文本分块分析配置：超长笔记/视频文稿按段落和句子切块并发分析，再合并为一份分析结果
+CHUNKED_ANALYSIS_THRESHOLD = int(os.getenv("CHUNKED_ANALYSIS_THRESHOLD", "6000"))  # 超过该字符数时分块分析，0表示不分块
+CHUNKED_ANALYSIS_CHUNK_CHARS = int(os.getenv("CHUNKED_ANALYSIS_CHUNK_CHARS", "3000"))  # 每块最大字符数
+CHUNKED_ANALYSIS_CONCURRENCY = int(os.getenv("CHUNKED_ANALYSIS_CONCURRENCY", "4"))  # 单次分析同时分析的块数
+
+# 分段生成配置：多日行程/游记先生成逐日大纲，再并发生成每天的内容并按顺序拼接
+SECTIONED_GENERATION_MIN_DAYS = int(os.getenv("SECTIONED_GENERATION_MIN_DAYS", "4"))  # 行程天数不少于该值时分段生成，0表示不分段
+SECTIONED_GENERATION_CONCURRENCY = int(os.getenv("SECTIONED_GENERATION_CONCURRENCY", "8"))  # 单次生成同时生成的段数
+
+# 推测预取配置：按近期流量学习端点跳转概率，请求后提前生成很可能接着请求的内容
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() == "true"
+PREFETCH_DB_PATH = os.getenv("PREFETCH_DB_PATH", "data/prefetch.db")  # 会话和预取记录，各worker共享
+PREFETCH_WINDOW = int(os.getenv("PREFETCH_WINDOW", "600"))  # 两次请求算作跳转、预取算作命中的时间窗口(秒)
+PREFETCH_MIN_PROBABILITY = float(os.getenv("PREFETCH_MIN_PROBABILITY", "0.5"))  # 发起预取的最小跳转概率
+PREFETCH_MIN_SAMPLES = int(os.getenv("PREFETCH_MIN_SAMPLES", "20"))  # 端点至少有多少次跳转样本才预测
+PREFETCH_MAX_FANOUT = int(os.getenv("PREFETCH_MAX_FANOUT", "2"))  # 一次请求后最多预取的端点数
+PREFETCH_BUDGET_PER_MINUTE = int(os.getenv("PREFETCH_BUDGET_PER_MINUTE", "20"))  # 每个worker每分钟最多预取次数
+PREFETCH_HISTORY = int(os.getenv("PREFETCH_HISTORY", "2000"))  # 学习跳转概率时保留的最近跳转次数
+
+# 对话式规划会话配置：每个会话保存此前对话的滚动摘要和最近几轮原文，每轮提示词大小基本恒定
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.db")  # 会话存储，各worker共享
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))  # 会话数上限，超出后淘汰最久未活动的会话
+SESSION_TTL = int(os.getenv("SESSION_TTL", "86400"))  # 会话无活动多久后过期(秒)
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "12"))  # 原文保留的消息数超过该值时把较早的消息合并进摘要
+SESSION_RECENT_TURNS = int(os.getenv("SESSION_RECENT_TURNS", "6"))  # 合并摘要后保留原文的最近消息数
+SESSION_HISTORY_CHARS = int(os.getenv("SESSION_HISTORY_CHARS", "4000"))  # 提示词中对话原文的最大字符数（超过时也合并摘要）
+SESSION_SUMMARY_CHARS = int(os.getenv("SESSION_SUMMARY_CHARS", "800"))  # 滚动摘要的最大字符数
 
 # 安全配置
 API_KEY_HEADER = os.getenv("API_KEY_HEADER", "X-API-Key")
+# 管理接口密钥（通过 X-Admin-Key 请求头传递），为空时禁用管理接口
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+# 租户配置（JSON字符串或JSON文件路径），为空时不做API密钥认证
+TENANTS = os.getenv("TENANTS", "")
+TENANT_DB_PATH = os.getenv("TENANT_DB_PATH", "data/tenants.db")
+# 每个worker进程的上游LLM并发（AIMD在最小/最大值之间自适应），按租户权重公平调度，最大值0表示不限制
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+LLM_MIN_CONCURRENCY = int(os.getenv("LLM_MIN_CONCURRENCY", "1"))
+LLM_INITIAL_CONCURRENCY = int(os.getenv("LLM_INITIAL_CONCURRENCY", "8"))
+# LLM等待队列长度上限和最长排队时间(秒)，超出时快速返回503
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+# 低优先级调用每排队该秒数提升一级，避免持续高优先级流量下饿死
+LLM_PRIORITY_AGING = float(os.getenv("LLM_PRIORITY_AGING", "10"))
+# 各端点的默认优先级（JSON），未列出的端点为medium；客户端可通过 X-Priority 请求头降低优先级
+ENDPOINT_PRIORITIES = os.getenv(
+    "ENDPOINT_PRIORITIES",
+    '{"/food-recommendation": "high", "/itinerary": "high", "/travel-plan": "high", "/travel-plan/stream": "high", "/xiaohongshu-analysis/bulk": "low"}'
+)
 ALLOWED_HOSTS = os.getenv("ALLOWED_HOSTS", "*").split(",")
 
 # 项目信息
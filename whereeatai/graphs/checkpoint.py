@@ -0,0 +1,212 @@
+"""工作流检查点存储，用于持久化节点结果并支持失败节点的断点续跑"""
+from typing import Dict, Any, Optional
+from contextlib import closing
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+from whereeatai.config import CHECKPOINT_DB_PATH, CHECKPOINT_TTL
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class WorkflowCheckpointStore(SQLiteStore):
+    """基于SQLite的工作流检查点存储，节点结果压缩后按run_id保存"""
+    
+    isolation_level = ""
+    purge_label = "过期检查点"
+    
+    def __init__(
+        self,
+        db_path: str = CHECKPOINT_DB_PATH,
+        ttl: int = CHECKPOINT_TTL,
+        purge_interval: int = 300
+    ):
+        """
+        初始化检查点存储
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            ttl: 检查点保留时间(秒)，超时后被清理
+            purge_interval: 两次过期清理之间的最小间隔(秒)
+        """
+        self.ttl = ttl
+        super().__init__(db_path, purge_interval)
+        logger.info(f"工作流检查点存储初始化完成: {self.db_path}")
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS workflow_runs (
+                run_id TEXT PRIMARY KEY,
+                workflow TEXT NOT NULL,
+                input_blob BLOB NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS node_checkpoints (
+                run_id TEXT NOT NULL,
+                node TEXT NOT NULL,
+                status TEXT NOT NULL,
+                blob BLOB NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_id, node)
+            )
+            """
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_workflow_runs_updated ON workflow_runs(updated_at)"
+        )
+    
+    @staticmethod
+    def new_run_id() -> str:
+        """生成新的运行ID"""
+        return uuid.uuid4().hex
+    
+    def create_run(self, run_id: str, workflow: str, input_data: Dict[str, Any]):
+        """
+        记录一次工作流运行
+        
+        Args:
+            run_id: 运行ID
+            workflow: 工作流名称
+            input_data: 工作流输入数据
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO workflow_runs "
+                "(run_id, workflow, input_blob, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, workflow, self._encode(input_data), "running", now, now)
+            )
+        self.maybe_purge()
+    
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        获取运行记录
+        
+        Args:
+            run_id: 运行ID
+        
+        Returns:
+            运行记录，不存在或已过期时返回None
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT workflow, input_blob, status, created_at, updated_at "
+                "FROM workflow_runs WHERE run_id = ?",
+                (run_id,)
+            ).fetchone()
+        if not row or time.time() - row[4] > self.ttl:
+            return None
+        return {
+            "run_id": run_id,
+            "workflow": row[0],
+            "input_data": self._decode(row[1]),
+            "status": row[2],
+            "created_at": row[3],
+            "updated_at": row[4]
+        }
+    
+    def finish_run(self, run_id: str, status: str):
+        """
+        更新运行的最终状态
+        
+        Args:
+            run_id: 运行ID
+            status: 最终状态(success/partial_success/error/shed)
+        """
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE workflow_runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                (status, time.time(), run_id)
+            )
+    
+    def save_node(self, run_id: str, node: str, update: Dict[str, Any], status: str):
+        """
+        保存节点输出
+        
+        Args:
+            run_id: 运行ID
+            node: 节点名称
+            update: 节点返回的状态更新
+            status: 节点状态(success/error)
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO node_checkpoints "
+                "(run_id, node, status, blob, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, node, status, self._encode(update), now)
+            )
+            conn.execute(
+                "UPDATE workflow_runs SET updated_at = ? WHERE run_id = ?",
+                (now, run_id)
+            )
+    
+    def load_completed_nodes(self, run_id: str) -> Dict[str, Dict[str, Any]]:
+        """
+        加载已成功完成的节点输出
+        
+        Args:
+            run_id: 运行ID
+        
+        Returns:
+            节点名称到状态更新的映射
+        """
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT node, blob FROM node_checkpoints WHERE run_id = ? AND status = 'success'",
+                (run_id,)
+            ).fetchall()
+        return {node: self._decode(blob) for node, blob in rows}
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理过期的运行记录及其检查点
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            清理的运行数量
+        """
+        cutoff = (now or time.time()) - self.ttl
+        with closing(self._connect()) as conn, conn:
+            expired = [
+                row[0] for row in conn.execute(
+                    "SELECT run_id FROM workflow_runs WHERE updated_at < ?", (cutoff,)
+                )
+            ]
+            conn.executemany(
+                "DELETE FROM node_checkpoints WHERE run_id = ?", [(r,) for r in expired]
+            )
+            conn.execute("DELETE FROM workflow_runs WHERE updated_at < ?", (cutoff,))
+        if expired:
+            logger.info(f"清理过期检查点: {len(expired)}个运行")
+        return len(expired)
+
+
+# 全局检查点存储实例（延迟创建）
+_checkpoint_store: Optional[WorkflowCheckpointStore] = None
+_checkpoint_store_lock = threading.Lock()
+
+
+def get_checkpoint_store() -> WorkflowCheckpointStore:
+    """获取全局检查点存储实例"""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        with _checkpoint_store_lock:
+            if _checkpoint_store is None:
+                _checkpoint_store = WorkflowCheckpointStore()
+    return _checkpoint_store
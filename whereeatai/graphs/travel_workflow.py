@@ -1,12 +1,52 @@
 """旅行工作流图，用于多Agent协作"""
-from typing import Dict, Any, List, TypedDict, Annotated
+from typing import Dict, Any, Iterator, List, TypedDict, Annotated, Callable, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langchain_core.messages import BaseMessage
+import operator
+import time
 import logging
 
+from whereeatai.config import CHECKPOINT_ENABLED
+from whereeatai.graphs.checkpoint import WorkflowCheckpointStore, get_checkpoint_store
+from whereeatai.models.dispatcher import LLMOverloadedError
+from whereeatai.models.overload import DegradationLevel, get_degradation_level
+
 logger = logging.getLogger(__name__)
 
+# 当前上下文的工作流进度回调（流式接口设置；LangGraph并行节点会复制上下文，回调可能在多个线程中调用）
+_progress_sink: ContextVar[Optional[Callable[[Dict[str, Any]], None]]] = ContextVar(
+    "workflow_progress_sink", default=None
+)
+
+
+@contextmanager
+def progress_events(sink: Callable[[Dict[str, Any]], None]) -> Iterator[None]:
+    """
+    在上下文内接收工作流节点的开始和完成事件
+    
+    Args:
+        sink: 事件回调，参数为事件字典（event为node_started或node_completed）
+    """
+    token = _progress_sink.set(sink)
+    try:
+        yield
+    finally:
+        _progress_sink.reset(token)
+
+
+def _emit(event: Dict[str, Any]):
+    """向当前上下文的进度回调发送事件，回调出错不影响工作流"""
+    sink = _progress_sink.get()
+    if sink is None:
+        return
+    try:
+        sink(event)
+    except Exception as e:
+        logger.warning(f"发送工作流进度事件失败: {str(e)}")
+
 
 # 定义工作流状态
 class TravelWorkflowState(TypedDict):
@@ -21,20 +61,66 @@ class TravelWorkflowState(TypedDict):
     video_result: Dict[str, Any]
     topic_result: Dict[str, Any]
     final_plan: Dict[str, Any]
-    errors: List[str]
+    errors: Annotated[List[str], operator.add]
+    run_id: str
+    resume_from: Dict[str, Dict[str, Any]]
+    checkpointing: bool
+
+
+def build_initial_state(
+    input_data: Dict[str, Any],
+    run_id: str = "",
+    resume_from: Optional[Dict[str, Dict[str, Any]]] = None,
+    checkpointing: bool = True
+) -> TravelWorkflowState:
+    """
+    构建工作流初始状态
+
+    Args:
+        input_data: 输入数据
+        run_id: 运行ID
+        resume_from: 断点续跑时已完成节点的输出
+        checkpointing: 是否保存节点检查点（运行记录创建失败时关闭）
+
+    Returns:
+        初始状态
+    """
+    return {
+        "messages": [],
+        "input_data": input_data,
+        "travelogue_result": {},
+        "itinerary_result": {},
+        "food_result": {},
+        "price_result": {},
+        "xiaohongshu_result": {},
+        "video_result": {},
+        "topic_result": {},
+        "final_plan": {},
+        "errors": [],
+        "run_id": run_id,
+        "resume_from": resume_from or {},
+        "checkpointing": checkpointing
+    }
 
 
 class TravelWorkflow:
     """旅行工作流，用于协调多个Agent完成旅行相关任务"""
     
-    def __init__(self, agent_manager):
+    # 需要持久化检查点的节点（调用LLM的节点）
+    CHECKPOINT_NODES = ("generate_travelogue", "plan_itinerary", "recommend_food", "compare_prices")
+    
+    def __init__(self, agent_manager, checkpoint_store: Optional[WorkflowCheckpointStore] = None):
         """
         初始化旅行工作流
         
         Args:
             agent_manager: Agent管理器实例
+            checkpoint_store: 检查点存储（可选，默认按配置使用全局实例）
         """
         self.agent_manager = agent_manager
+        if checkpoint_store is None and CHECKPOINT_ENABLED:
+            checkpoint_store = get_checkpoint_store()
+        self.checkpoint_store = checkpoint_store
         self.graph = self._build_graph()
     
     def _build_graph(self) -> StateGraph:
@@ -48,12 +134,16 @@ class TravelWorkflow:
         workflow = StateGraph(TravelWorkflowState)
         
         # 添加节点
-        workflow.add_node("analyze_input", self._analyze_input)
-        workflow.add_node("generate_travelogue", self._generate_travelogue)
-        workflow.add_node("plan_itinerary", self._plan_itinerary)
-        workflow.add_node("recommend_food", self._recommend_food)
-        workflow.add_node("compare_prices", self._compare_prices)
-        workflow.add_node("generate_final_plan", self._generate_final_plan)
+        nodes = {
+            "analyze_input": self._analyze_input,
+            "generate_travelogue": self._checkpointed("generate_travelogue", self._generate_travelogue),
+            "plan_itinerary": self._checkpointed("plan_itinerary", self._plan_itinerary),
+            "recommend_food": self._checkpointed("recommend_food", self._recommend_food),
+            "compare_prices": self._checkpointed("compare_prices", self._compare_prices),
+            "generate_final_plan": self._generate_final_plan
+        }
+        for node_name, node_fn in nodes.items():
+            workflow.add_node(node_name, self._observed(node_name, node_fn))
         
         # 添加边 - 定义工作流执行顺序
         workflow.add_edge(START, "analyze_input")
@@ -67,7 +157,95 @@ class TravelWorkflow:
         
         return workflow.compile()
     
-    def _analyze_input(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    @staticmethod
+    def _observed(node_name: str, node_fn: Callable[[TravelWorkflowState], Dict[str, Any]]):
+        """
+        为节点增加进度事件：开始时发送node_started，完成时发送带节点结果的node_completed
+        
+        Args:
+            node_name: 节点名称
+            node_fn: 节点函数
+        
+        Returns:
+            包装后的节点函数
+        """
+        def wrapper(state: TravelWorkflowState) -> Dict[str, Any]:
+            if _progress_sink.get() is None:
+                return node_fn(state)
+            
+            run_id = state.get("run_id", "")
+            _emit({"event": "node_started", "node": node_name, "run_id": run_id})
+            start = time.perf_counter()
+            update = node_fn(state)
+            if update.get("errors"):
+                status = "error"
+            elif any(isinstance(v, dict) and v.get("status") == "skipped" for v in update.values()):
+                status = "skipped"
+            else:
+                status = "success"
+            _emit({
+                "event": "node_completed",
+                "node": node_name,
+                "run_id": run_id,
+                "status": status,
+                "elapsed": round(time.perf_counter() - start, 3),
+                "result": {key: value for key, value in update.items() if key != "messages"}
+            })
+            return update
+        
+        return wrapper
+    
+    def _checkpointed(self, node_name: str, node_fn: Callable[[TravelWorkflowState], Dict[str, Any]]):
+        """
+        为节点增加检查点：续跑时跳过已成功的节点，执行后保存节点输出
+        
+        Args:
+            node_name: 节点名称
+            node_fn: 节点函数
+            
+        Returns:
+            包装后的节点函数
+        """
+        def wrapper(state: TravelWorkflowState) -> Dict[str, Any]:
+            completed = state.get("resume_from", {}).get(node_name)
+            if completed is not None:
+                logger.info(f"节点已完成，跳过执行: {node_name}")
+                return completed
+            
+            update = node_fn(state)
+            
+            run_id = state.get("run_id")
+            # 降级时跳过的节点不保存检查点，续跑时重新执行
+            skipped = any(isinstance(v, dict) and v.get("status") == "skipped" for v in update.values())
+            if self.checkpoint_store and run_id and state.get("checkpointing", True) and not skipped:
+                status = "error" if update.get("errors") else "success"
+                try:
+                    self.checkpoint_store.save_node(run_id, node_name, update, status)
+                except Exception as e:
+                    logger.error(f"保存检查点失败: {node_name}, 错误: {str(e)}")
+            return update
+        
+        return wrapper
+    
+    @staticmethod
+    def _agent_update(result_key: str, result: Dict[str, Any], error_prefix: str) -> Dict[str, Any]:
+        """
+        将Agent执行结果转换为状态更新，执行失败时记录错误
+        
+        Args:
+            result_key: 结果在状态中的键
+            result: Agent执行结果
+            error_prefix: 错误信息前缀
+            
+        Returns:
+            状态更新
+        """
+        update = {result_key: result}
+        if result.get("status") != "success":
+            update["errors"] = [f"{error_prefix}: {result.get('message', '')}"]
+        return update
+    
+    def _analyze_input(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """
         分析输入数据，验证必要字段
         
@@ -75,7 +253,7 @@ class TravelWorkflow:
             state: 当前工作流状态
             
         Returns:
-            更新后的状态
+            状态更新
         """
         try:
             logger.info("开始分析用户输入")
@@ -88,17 +266,15 @@ class TravelWorkflow:
             if missing_fields:
                 error_msg = f"缺少必要字段: {', '.join(missing_fields)}"
                 logger.error(error_msg)
-                state["errors"] = state.get("errors", []) + [error_msg]
-            else:
-                logger.info(f"输入验证通过: {input_data.get('destination')}")
+                return {"errors": [error_msg]}
             
-            return state
+            logger.info(f"输入验证通过: {input_data.get('destination')}")
+            return {}
         except Exception as e:
             logger.error(f"分析输入失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [str(e)]
-            return state
+            return {"errors": [str(e)]}
     
-    def _generate_travelogue(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _generate_travelogue(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """
         生成游记
         
@@ -106,21 +282,23 @@ class TravelWorkflow:
             state: 当前工作流状态
             
         Returns:
-            更新后的状态
+            状态更新
         """
         try:
             logger.info("开始生成游记")
             result = self.agent_manager.execute_agent("travelogue", state["input_data"])
-            state["travelogue_result"] = result
             logger.info("游记生成完成")
-            return state
+            return self._agent_update("travelogue_result", result, "游记生成失败")
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"游记生成失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [f"游记生成失败: {str(e)}"]
-            state["travelogue_result"] = {"status": "error", "message": str(e)}
-            return state
+            return {
+                "travelogue_result": {"status": "error", "message": str(e)},
+                "errors": [f"游记生成失败: {str(e)}"]
+            }
     
-    def _plan_itinerary(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _plan_itinerary(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """
         规划行程
         
@@ -128,21 +306,23 @@ class TravelWorkflow:
             state: 当前工作流状态
             
         Returns:
-            更新后的状态
+            状态更新
         """
         try:
             logger.info("开始规划行程")
             result = self.agent_manager.execute_agent("itinerary", state["input_data"])
-            state["itinerary_result"] = result
             logger.info("行程规划完成")
-            return state
+            return self._agent_update("itinerary_result", result, "行程规划失败")
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"行程规划失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [f"行程规划失败: {str(e)}"]
-            state["itinerary_result"] = {"status": "error", "message": str(e)}
-            return state
+            return {
+                "itinerary_result": {"status": "error", "message": str(e)},
+                "errors": [f"行程规划失败: {str(e)}"]
+            }
     
-    def _recommend_food(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _recommend_food(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """
         推荐美食
         
@@ -150,7 +330,7 @@ class TravelWorkflow:
             state: 当前工作流状态
             
         Returns:
-            更新后的状态
+            状态更新
         """
         try:
             logger.info("开始推荐美食")
@@ -165,16 +345,18 @@ class TravelWorkflow:
                 logger.info("基于行程规划推荐美食")
             
             result = self.agent_manager.execute_agent("food_recommendation", food_input)
-            state["food_result"] = result
             logger.info("美食推荐完成")
-            return state
+            return self._agent_update("food_result", result, "美食推荐失败")
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"美食推荐失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [f"美食推荐失败: {str(e)}"]
-            state["food_result"] = {"status": "error", "message": str(e)}
-            return state
+            return {
+                "food_result": {"status": "error", "message": str(e)},
+                "errors": [f"美食推荐失败: {str(e)}"]
+            }
     
-    def _compare_prices(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _compare_prices(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """
         比较价格
         
@@ -182,8 +364,13 @@ class TravelWorkflow:
             state: 当前工作流状态
             
         Returns:
-            更新后的状态
+            状态更新
         """
+        if get_degradation_level() >= DegradationLevel.SKIP_OPTIONAL:
+            # 过载降级：价格比价为可选内容，直接跳过
+            logger.info("过载降级，跳过价格比价")
+            return {"price_result": {"status": "skipped", "message": "服务繁忙，已跳过价格比价", "data": {}}}
+        
         try:
             logger.info("开始价格比价")
             
@@ -195,16 +382,18 @@ class TravelWorkflow:
             }
             
             result = self.agent_manager.execute_agent("price_comparison", price_input)
-            state["price_result"] = result
             logger.info("价格比价完成")
-            return state
+            return self._agent_update("price_result", result, "价格比价失败")
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"价格比价失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [f"价格比价失败: {str(e)}"]
-            state["price_result"] = {"status": "error", "message": str(e)}
-            return state
+            return {
+                "price_result": {"status": "error", "message": str(e)},
+                "errors": [f"价格比价失败: {str(e)}"]
+            }
     
-    def _generate_final_plan(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _generate_final_plan(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """
         生成最终旅行计划
         
@@ -212,7 +401,7 @@ class TravelWorkflow:
             state: 当前工作流状态
             
         Returns:
-            更新后的状态
+            状态更新
         """
         try:
             logger.info("开始生成最终旅行计划")
@@ -229,70 +418,226 @@ class TravelWorkflow:
                 "errors": state.get("errors", [])
             }
             
-            state["final_plan"] = final_plan
             logger.info("最终旅行计划生成完成")
-            return state
+            return {"final_plan": final_plan}
         except Exception as e:
             logger.error(f"生成最终计划失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [f"生成最终计划失败: {str(e)}"]
-            state["final_plan"] = {"status": "error", "message": str(e)}
-            return state
+            return {
+                "final_plan": {"status": "error", "message": str(e)},
+                "errors": [f"生成最终计划失败: {str(e)}"]
+            }
     
-    def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    def run(self, input_data: Dict[str, Any], run_id: Optional[str] = None, mode: str = "standard") -> Dict[str, Any]:
         """
         运行旅行工作流
         
         Args:
             input_data: 输入数据
+            run_id: 运行ID（可选，默认自动生成）
+            mode: 运行模式，standard为多Agent协作，fast为单次模型调用
             
         Returns:
             工作流执行结果
         """
+        if mode == "fast":
+            return self._run_fast(input_data)
+        if mode != "standard":
+            return {
+                "status": "error",
+                "message": f"不支持的运行模式: {mode}",
+                "data": {}
+            }
+        
+        run_id = run_id or WorkflowCheckpointStore.new_run_id()
         try:
-            logger.info(f"启动旅行工作流: {input_data.get('destination', '')}")
-            
-            # 初始化状态
-            initial_state: TravelWorkflowState = {
-                "messages": [],
-                "input_data": input_data,
-                "travelogue_result": {},
-                "itinerary_result": {},
-                "food_result": {},
-                "price_result": {},
-                "xiaohongshu_result": {},
-                "video_result": {},
-                "topic_result": {},
-                "final_plan": {},
-                "errors": []
+            logger.info(f"启动旅行工作流: {input_data.get('destination', '')}, 运行ID: {run_id}")
+            
+            # 检查点尽力而为：运行记录创建失败（如数据库被锁或损坏）时不保存检查点，照常生成计划
+            checkpointing = False
+            if self.checkpoint_store:
+                try:
+                    self.checkpoint_store.create_run(run_id, "travel_plan", input_data)
+                    checkpointing = True
+                except Exception as e:
+                    logger.warning(f"创建运行记录失败，本次运行不保存检查点: {run_id}, 错误: {str(e)}")
+            
+            return self._execute(build_initial_state(input_data, run_id, checkpointing=checkpointing), run_id)
+        except LLMOverloadedError as e:
+            # 已完成节点的检查点保留，客户端可稍后通过run_id续跑
+            self._mark_shed(run_id, e)
+            raise
+        except Exception as e:
+            logger.error(f"工作流执行失败: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"工作流执行失败: {str(e)}",
+                "run_id": run_id,
+                "data": {}
             }
+    
+    def _run_fast(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        快速模式：融合四个Agent的提示词，单次模型调用后拆分为相同结构的最终计划
+        
+        Args:
+            input_data: 输入数据
             
-            # 执行工作流
-            result = self.graph.invoke(initial_state)
+        Returns:
+            工作流执行结果
+        """
+        try:
+            logger.info(f"启动快速旅行工作流: {input_data.get('destination', '')}")
+            result = self.agent_manager.execute_agent("fast_travel_plan", input_data)
+            if result.get("status") == "error":
+                return {
+                    "status": "error",
+                    "message": result.get("message", "快速旅行计划生成失败"),
+                    "mode": "fast",
+                    "data": {}
+                }
             
-            # 返回最终计划
-            final_plan = result.get("final_plan", {})
+            sections = result.get("data", {})
+            errors = [f"缺少分段: {name}" for name in sections.get("missing_sections", [])]
+            final_plan = {
+                "destination": input_data.get("destination", ""),
+                "duration": input_data.get("duration", ""),
+                "interests": input_data.get("interests", []),
+                "travelogue": sections.get("travelogue", {}),
+                "itinerary": sections.get("itinerary", {}),
+                "food_recommendations": sections.get("food_recommendations", {}),
+                "price_comparison": sections.get("price_comparison", {}),
+                "errors": errors
+            }
             
-            if result.get("errors"):
-                logger.warning(f"工作流执行中出现错误: {result['errors']}")
+            if errors:
+                logger.warning(f"快速工作流输出不完整: {errors}")
                 return {
                     "status": "partial_success",
                     "message": "部分功能执行失败",
+                    "mode": "fast",
                     "data": final_plan,
-                    "errors": result["errors"]
+                    "errors": errors
                 }
             
             return {
                 "status": "success",
                 "message": "旅行计划生成成功",
+                "mode": "fast",
                 "data": final_plan
             }
+        except LLMOverloadedError:
+            raise
         except Exception as e:
-            logger.error(f"工作流执行失败: {str(e)}")
+            logger.error(f"快速工作流执行失败: {str(e)}")
             return {
                 "status": "error",
                 "message": f"工作流执行失败: {str(e)}",
+                "mode": "fast",
+                "data": {}
+            }
+    
+    def resume(self, run_id: str) -> Dict[str, Any]:
+        """
+        断点续跑：只重新执行失败或缺失的节点
+        
+        Args:
+            run_id: 运行ID
+            
+        Returns:
+            工作流执行结果
+        """
+        if not self.checkpoint_store:
+            return {
+                "status": "error",
+                "message": "工作流检查点未启用",
+                "run_id": run_id,
                 "data": {}
             }
+        
+        try:
+            run = self.checkpoint_store.get_run(run_id)
+            if not run:
+                logger.warning(f"运行记录不存在或已过期: {run_id}")
+                return {
+                    "status": "error",
+                    "message": f"运行记录不存在或已过期: {run_id}",
+                    "run_id": run_id,
+                    "data": {}
+                }
+            
+            completed = self.checkpoint_store.load_completed_nodes(run_id)
+            pending = [n for n in self.CHECKPOINT_NODES if n not in completed]
+            logger.info(f"续跑旅行工作流: {run_id}, 待执行节点: {pending}")
+            
+            initial_state = build_initial_state(run["input_data"], run_id, completed)
+            return self._execute(initial_state, run_id)
+        except LLMOverloadedError as e:
+            self._mark_shed(run_id, e)
+            raise
+        except Exception as e:
+            logger.error(f"工作流续跑失败: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"工作流续跑失败: {str(e)}",
+                "run_id": run_id,
+                "data": {}
+            }
+    
+    def _mark_shed(self, run_id: str, error: LLMOverloadedError):
+        """
+        记录运行因上游过载被拒绝，并把run_id附在异常上供API层返回
+        
+        Args:
+            run_id: 运行ID
+            error: 过载异常
+        """
+        error.run_id = run_id
+        if self.checkpoint_store:
+            try:
+                self.checkpoint_store.finish_run(run_id, "shed")
+            except Exception as e:
+                logger.error(f"更新运行状态失败: {run_id}, 错误: {str(e)}")
+    
+    def _execute(self, initial_state: TravelWorkflowState, run_id: str) -> Dict[str, Any]:
+        """
+        执行工作流图并整理返回结果
+        
+        Args:
+            initial_state: 初始状态
+            run_id: 运行ID
+            
+        Returns:
+            工作流执行结果
+        """
+        # 执行工作流
+        result = self.graph.invoke(initial_state)
+        
+        # 返回最终计划
+        final_plan = result.get("final_plan", {})
+        
+        if result.get("errors"):
+            logger.warning(f"工作流执行中出现错误: {result['errors']}")
+            response = {
+                "status": "partial_success",
+                "message": "部分功能执行失败",
+                "run_id": run_id,
+                "data": final_plan,
+                "errors": result["errors"]
+            }
+        else:
+            response = {
+                "status": "success",
+                "message": "旅行计划生成成功",
+                "run_id": run_id,
+                "data": final_plan
+            }
+        
+        if self.checkpoint_store and initial_state.get("checkpointing", True):
+            try:
+                self.checkpoint_store.finish_run(run_id, response["status"])
+            except Exception as e:
+                logger.error(f"更新运行状态失败: {run_id}, 错误: {str(e)}")
+        return response
 
 
 class ContentAnalysisWorkflow:
@@ -332,35 +677,37 @@ class ContentAnalysisWorkflow:
         
         return workflow.compile()
     
-    def _analyze_xiaohongshu(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _analyze_xiaohongshu(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """分析小红书内容"""
         try:
             if "note_content" in state["input_data"]:
                 logger.info("开始分析小红书笔记")
                 result = self.agent_manager.execute_agent("xiaohongshu", state["input_data"])
-                state["xiaohongshu_result"] = result
                 logger.info("小红书笔记分析完成")
-            return state
+                return {"xiaohongshu_result": result}
+            return {}
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"小红书分析失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [str(e)]
-            return state
+            return {"errors": [str(e)]}
     
-    def _analyze_video(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _analyze_video(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """分析视频内容"""
         try:
             if "video_url" in state["input_data"]:
                 logger.info("开始分析视频内容")
                 result = self.agent_manager.execute_agent("video", state["input_data"])
-                state["video_result"] = result
                 logger.info("视频内容分析完成")
-            return state
+                return {"video_result": result}
+            return {}
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"视频分析失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [str(e)]
-            return state
+            return {"errors": [str(e)]}
     
-    def _extract_recommendations(self, state: TravelWorkflowState) -> TravelWorkflowState:
+    def _extract_recommendations(self, state: TravelWorkflowState) -> Dict[str, Any]:
         """提取推荐信息"""
         try:
             logger.info("开始提取推荐信息")
@@ -370,40 +717,26 @@ class ContentAnalysisWorkflow:
                 "video_insights": state.get("video_result", {}).get("data", {})
             }
             
-            state["final_plan"] = recommendations
             logger.info("推荐信息提取完成")
-            return state
+            return {"final_plan": recommendations}
         except Exception as e:
             logger.error(f"提取推荐信息失败: {str(e)}")
-            state["errors"] = state.get("errors", []) + [str(e)]
-            return state
+            return {"errors": [str(e)]}
     
     def run(self, input_data: Dict[str, Any]) -> Dict[str, Any]:
         """运行内容分析工作流"""
         try:
             logger.info("启动内容分析工作流")
             
-            initial_state: TravelWorkflowState = {
-                "messages": [],
-                "input_data": input_data,
-                "travelogue_result": {},
-                "itinerary_result": {},
-                "food_result": {},
-                "price_result": {},
-                "xiaohongshu_result": {},
-                "video_result": {},
-                "topic_result": {},
-                "final_plan": {},
-                "errors": []
-            }
-            
-            result = self.graph.invoke(initial_state)
+            result = self.graph.invoke(build_initial_state(input_data))
             
             return {
                 "status": "success",
                 "message": "内容分析完成",
                 "data": result.get("final_plan", {})
             }
+        except LLMOverloadedError:
+            raise
         except Exception as e:
             logger.error(f"内容分析工作流失败: {str(e)}")
             return {
@@ -1,57 +1,93 @@
-"""请求中间件"""
+"""请求中间件
+
+均为纯ASGI中间件，不使用 BaseHTTPMiddleware：
+不为每个请求额外创建任务和内存流，也不影响流式响应和后台任务。
+"""
+import json
 import time
 import uuid
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from collections import deque
+from typing import Deque, Dict, Optional, Union
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 import logging
 
+from whereeatai.config import ENDPOINT_PRIORITIES
+from whereeatai.models.dispatcher import PRIORITY_RANKS
+from whereeatai.models.overload import OverloadController, get_overload_controller
+from whereeatai.utils.context import (
+    current_endpoint,
+    current_request_id,
+    current_tenant,
+    current_degradation,
+    scheduling
+)
+from whereeatai.utils.metrics import DEGRADED_RESPONSES
+from whereeatai.utils.tenants import TenantRegistry, get_tenant_registry
+
 logger = logging.getLogger(__name__)
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
+class RequestLoggingMiddleware:
     """请求日志中间件"""
     
-    async def dispatch(self, request: Request, call_next):
-        # 生成请求ID
+    def __init__(self, app: ASGIApp):
+        """
+        初始化请求日志中间件
+        
+        Args:
+            app: ASGI应用
+        """
+        self.app = app
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        # 生成请求ID，同时写入 request.state 和上下文变量（日志过滤器从上下文读取）
         request_id = str(uuid.uuid4())
-        request.state.request_id = request_id
+        scope.setdefault("state", {})["request_id"] = request_id
+        path = scope["path"]
+        request_id_token = current_request_id.set(request_id)
+        # 记录当前端点，供模型路由按端点选择模型
+        endpoint_token = current_endpoint.set(path)
+        
+        start_time = time.perf_counter()
+        status_code = 500
+        logger.info(f"请求开始 - ID: {request_id}, 方法: {scope['method']}, 路径: {path}")
         
-        # 记录请求开始
-        start_time = time.time()
-        logger.info(
-            f"请求开始 - ID: {request_id}, 方法: {request.method}, 路径: {request.url.path}"
-        )
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                # 添加自定义响应头（处理时间为到响应头发出时的耗时）
+                headers = MutableHeaders(scope=message)
+                headers.append("X-Request-ID", request_id)
+                headers.append("X-Process-Time", str(time.perf_counter() - start_time))
+            await send(message)
         
-        # 处理请求
         try:
-            response = await call_next(request)
-            
-            # 计算处理时间
-            process_time = time.time() - start_time
-            
-            # 添加自定义响应头
-            response.headers["X-Request-ID"] = request_id
-            response.headers["X-Process-Time"] = str(process_time)
-            
-            # 记录请求完成
+            await self.app(scope, receive, send_wrapper)
             logger.info(
-                f"请求完成 - ID: {request_id}, 状态码: {response.status_code}, "
-                f"耗时: {process_time:.3f}秒"
+                f"请求完成 - ID: {request_id}, 状态码: {status_code}, "
+                f"耗时: {time.perf_counter() - start_time:.3f}秒"
             )
-            
-            return response
         except Exception as e:
-            # 记录错误
             logger.error(
                 f"请求失败 - ID: {request_id}, 错误: {str(e)}",
                 exc_info=True
             )
             raise
+        finally:
+            current_endpoint.reset(endpoint_token)
+            current_request_id.reset(request_id_token)
 
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    """简单的限流中间件"""
+class RateLimitMiddleware:
+    """简单的限流中间件（按客户端IP的滑动窗口）"""
     
     def __init__(self, app: ASGIApp, calls: int = 100, period: int = 60):
         """
@@ -62,37 +98,238 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
             calls: 时间窗口内允许的请求数
             period: 时间窗口(秒)
         """
-        super().__init__(app)
+        self.app = app
         self.calls = calls
         self.period = period
-        self.requests = {}  # {ip: [(timestamp, ...)]}
+        self.requests: Dict[str, Deque[float]] = {}  # {ip: deque([timestamp, ...])}
     
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
         # 获取客户端IP
-        client_ip = request.client.host
-        current_time = time.time()
+        client = scope.get("client")
+        client_ip = client[0] if client else "unknown"
+        current_time = time.monotonic()
         
-        # 清理过期记录
-        if client_ip in self.requests:
-            self.requests[client_ip] = [
-                t for t in self.requests[client_ip]
-                if current_time - t < self.period
-            ]
+        # 清理过期记录（时间戳按顺序追加，只需从队头弹出）
+        timestamps = self.requests.get(client_ip)
+        if timestamps is None:
+            timestamps = self.requests[client_ip] = deque()
+        while timestamps and current_time - timestamps[0] >= self.period:
+            timestamps.popleft()
         
         # 检查是否超过限制
-        if client_ip in self.requests and len(self.requests[client_ip]) >= self.calls:
+        if len(timestamps) >= self.calls:
             logger.warning(f"限流触发 - IP: {client_ip}")
-            return Response(
+            response = Response(
                 content="Too many requests",
                 status_code=429,
                 headers={"Retry-After": str(self.period)}
             )
+            await response(scope, receive, send)
+            return
+        
+        # 记录请求并继续处理
+        timestamps.append(current_time)
+        await self.app(scope, receive, send)
+
+
+# 无需API密钥的路径
+PUBLIC_PATHS = frozenset({
+    "/", "/status", "/livez", "/readyz", "/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"
+})
+# 管理接口路径前缀（使用管理密钥认证，不走租户认证）
+ADMIN_PATH_PREFIX = "/admin/"
+
+
+class TenantAuthMiddleware:
+    """
+    租户认证中间件
+    
+    按API密钥识别租户（密钥无效返回401），检查请求/token配额（超出返回429），
+    并将租户写入上下文供LLM公平调度和token计量使用。未配置租户时直接放行。
+    """
+    
+    def __init__(self, app: ASGIApp, header_name: str = "X-API-Key", registry: TenantRegistry = None):
+        """
+        初始化租户认证中间件
+        
+        Args:
+            app: ASGI应用
+            header_name: 携带API密钥的请求头
+            registry: 租户注册表，默认使用全局实例
+        """
+        self.app = app
+        self.header_name = header_name.lower().encode("latin-1")
+        self.registry = registry or get_tenant_registry()
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or not self.registry.enabled
+            or scope["method"] == "OPTIONS"
+            or scope["path"] in PUBLIC_PATHS
+            or scope["path"].startswith(ADMIN_PATH_PREFIX)
+        ):
+            await self.app(scope, receive, send)
+            return
+        
+        api_key = None
+        for name, value in scope["headers"]:
+            if name == self.header_name:
+                api_key = value.decode("latin-1")
+                break
+        
+        tenant = self.registry.authenticate(api_key)
+        if tenant is None:
+            logger.warning(f"API密钥无效 - 路径: {scope['path']}")
+            response = JSONResponse(
+                status_code=401,
+                content={"status": "error", "message": "无效的API密钥"}
+            )
+            await response(scope, receive, send)
+            return
         
-        # 记录请求
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
-        self.requests[client_ip].append(current_time)
+        # 配额检查要做SQLite事务（可能等锁），放到线程池中执行，避免阻塞事件循环
+        admitted, reason, retry_after = await run_in_threadpool(self.registry.admit, tenant)
+        if not admitted:
+            logger.warning(f"租户配额超限 - 租户: {tenant.tenant_id}, 原因: {reason}")
+            response = JSONResponse(
+                status_code=429,
+                content={"status": "error", "message": reason},
+                headers={"Retry-After": str(retry_after)}
+            )
+            await response(scope, receive, send)
+            return
         
-        # 继续处理
-        response = await call_next(request)
-        return response
+        scope.setdefault("state", {})["tenant"] = tenant.tenant_id
+        token = current_tenant.set(tenant.tenant_id)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_tenant.reset(token)
+
+
+class PriorityMiddleware:
+    """
+    请求优先级中间件
+    
+    按端点确定默认优先级（交互式端点为high，其余为medium），客户端可通过 X-Priority 请求头
+    降低（不能提高）优先级，通过 X-Request-Timeout 请求头(秒)给出截止时间。
+    优先级和截止时间写入上下文，由LLM调度器据此排序放行。
+    """
+    
+    PRIORITY_HEADER = b"x-priority"
+    TIMEOUT_HEADER = b"x-request-timeout"
+    
+    def __init__(
+        self,
+        app: ASGIApp,
+        endpoint_priorities: Union[str, Dict[str, str]] = ENDPOINT_PRIORITIES,
+        default_priority: str = "medium"
+    ):
+        """
+        初始化请求优先级中间件
+        
+        Args:
+            app: ASGI应用
+            endpoint_priorities: 端点默认优先级（JSON字符串或字典）
+            default_priority: 未配置端点的优先级
+        """
+        self.app = app
+        if isinstance(endpoint_priorities, str):
+            try:
+                endpoint_priorities = json.loads(endpoint_priorities) if endpoint_priorities else {}
+            except json.JSONDecodeError:
+                logger.warning(f"端点优先级配置解析失败，已忽略: {endpoint_priorities}")
+                endpoint_priorities = {}
+        self.endpoint_priorities = {
+            path: priority for path, priority in endpoint_priorities.items() if priority in PRIORITY_RANKS
+        }
+        self.default_priority = default_priority
+    
+    def resolve(self, path: str, requested: Optional[str], timeout: Optional[str]):
+        """
+        确定请求的优先级和剩余时间
+        
+        Args:
+            path: 请求路径
+            requested: X-Priority 请求头
+            timeout: X-Request-Timeout 请求头
+        
+        Returns:
+            Tuple[str, Optional[float]]: (优先级, 剩余时间秒数)
+        """
+        priority = self.endpoint_priorities.get(path, self.default_priority)
+        if requested:
+            requested = requested.strip().lower()
+            if PRIORITY_RANKS.get(requested, -1) > PRIORITY_RANKS[priority]:
+                priority = requested
+        seconds = None
+        if timeout:
+            try:
+                seconds = max(0.0, float(timeout))
+            except ValueError:
+                seconds = None
+        return priority, seconds
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        requested = timeout = None
+        for name, value in scope["headers"]:
+            if name == self.PRIORITY_HEADER:
+                requested = value.decode("latin-1")
+            elif name == self.TIMEOUT_HEADER:
+                timeout = value.decode("latin-1")
+        
+        priority, seconds = self.resolve(scope["path"], requested, timeout)
+        scope.setdefault("state", {})["priority"] = priority
+        with scheduling(priority, seconds):
+            await self.app(scope, receive, send)
+
+
+class DegradationMiddleware:
+    """
+    过载降级中间件
+    
+    请求开始时读取一次降级等级写入上下文（同一请求内模型参数、工作流节点和缓存策略一致），
+    并在响应头 X-Degradation-Level 中标明该等级。
+    """
+    
+    def __init__(self, app: ASGIApp, controller: OverloadController = None):
+        """
+        初始化过载降级中间件
+        
+        Args:
+            app: ASGI应用
+            controller: 过载控制器，默认使用全局实例
+        """
+        self.app = app
+        self.controller = controller or get_overload_controller()
+    
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
+        
+        level = int(self.controller.level)
+        scope.setdefault("state", {})["degradation_level"] = level
+        header_value = str(level)
+        
+        async def send_wrapper(message: Message):
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Degradation-Level", header_value)
+                if level:
+                    DEGRADED_RESPONSES.labels(level=header_value).inc()
+            await send(message)
+        
+        token = current_degradation.set(level)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_degradation.reset(token)
@@ -0,0 +1,363 @@
+"""LLM调用调度器：自适应限制上游并发，按优先级和截止时间放行、在租户之间按权重公平分配调用槽位，过载时快速拒绝"""
+from typing import Any, Dict, List, Optional, Tuple, Iterator
+from contextlib import contextmanager
+import itertools
+import math
+import threading
+import time
+import logging
+
+from whereeatai.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MIN_CONCURRENCY,
+    LLM_INITIAL_CONCURRENCY,
+    LLM_QUEUE_SIZE,
+    LLM_QUEUE_TIMEOUT,
+    LLM_PRIORITY_AGING
+)
+from whereeatai.protocols.a2a_protocol import Priority
+from whereeatai.utils.metrics import (
+    LLM_CONCURRENCY_LIMIT,
+    LLM_IN_FLIGHT,
+    LLM_QUEUE_DEPTH,
+    LLM_QUEUE_DELAY,
+    LLM_SHED
+)
+
+logger = logging.getLogger(__name__)
+
+# 优先级等级，数值越小越先放行
+PRIORITY_RANKS = {Priority.HIGH.value: 0, Priority.MEDIUM.value: 1, Priority.LOW.value: 2}
+
+
+class LLMOverloadedError(Exception):
+    """上游LLM过载，请求被快速拒绝（API层返回503）"""
+    
+    def __init__(self, message: str, retry_after: int = 1):
+        """
+        Args:
+            message: 拒绝原因
+            retry_after: 建议客户端重试的等待秒数
+        """
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.run_id: Optional[str] = None
+
+
+class AIMDLimit:
+    """
+    AIMD并发上限
+    
+    - 调用成功且单token延迟未明显升高：上限每轮(约一个延迟周期)加1
+    - 上游过载(429/5xx/超时)或单token延迟超过基线的latency_tolerance倍：上限乘以backoff
+    - 两次收缩之间至少间隔一个平均延迟，避免同一波拥塞被重复惩罚
+    """
+    
+    def __init__(
+        self,
+        initial: int,
+        min_limit: int,
+        max_limit: int,
+        backoff: float = 0.7,
+        latency_tolerance: float = 2.0
+    ):
+        """
+        Args:
+            initial: 初始上限
+            min_limit: 最小上限
+            max_limit: 最大上限
+            backoff: 收缩系数
+            latency_tolerance: 单token延迟相对基线的容忍倍数
+        """
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.avg_latency = 0.0
+        self.baseline: Optional[float] = None
+        self._last_decrease = 0.0
+    
+    def _decrease(self, now: float):
+        if now - self._last_decrease < max(self.avg_latency, 1.0):
+            return
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+    
+    def on_success(self, latency: float, output_tokens: int):
+        """记录一次成功调用"""
+        self.avg_latency = latency if not self.avg_latency else 0.8 * self.avg_latency + 0.2 * latency
+        unit = latency / max(1, output_tokens)
+        if self.baseline is None or unit < self.baseline:
+            self.baseline = unit
+        else:
+            # 基线缓慢上漂，长期负载变化后能重新收敛
+            self.baseline = 0.995 * self.baseline + 0.005 * unit
+        if unit > self.baseline * self.latency_tolerance:
+            self._decrease(time.monotonic())
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+    
+    def on_overload(self):
+        """记录一次上游过载"""
+        self._decrease(time.monotonic())
+
+
+class _Waiter:
+    """排队中的调用"""
+    
+    __slots__ = ("priority", "rank", "deadline", "start", "finish", "enqueued", "seq", "event", "granted", "evicted")
+    
+    def __init__(self, priority: str, deadline: Optional[float], start: float, finish: float, enqueued: float, seq: int):
+        self.priority = priority
+        self.rank = PRIORITY_RANKS.get(priority, PRIORITY_RANKS[Priority.MEDIUM.value])
+        self.deadline = deadline
+        self.start = start
+        self.finish = finish
+        self.enqueued = enqueued
+        self.seq = seq
+        self.event = threading.Event()
+        self.granted = False
+        self.evicted = False
+
+
+class LLMDispatcher:
+    """
+    自适应并发 + 优先级/截止时间 + 加权公平队列（WFQ）调度器
+    
+    槽位空闲时按以下顺序放行等待者：
+    1. 优先级（high > medium > low），低优先级每排队priority_aging秒提升一级，避免饿死
+    2. 截止时间早者优先（EDF），没有截止时间的排在同级有截止时间的之后
+    3. WFQ标记：start = max(虚拟时间, 租户上次完成标记)、finish = start + cost / weight，finish小者优先，
+       大租户持续排队时小租户的新调用不受其积压影响
+    
+    并发上限由AIMD按上游反馈调整；等待队列有界，队列已满时优先挤出排在最后的更低优先级调用，
+    预计等待超过截止时间/最长排队时间或等待超时时抛出LLMOverloadedError，而不是让请求在worker内排队数分钟。
+    等待队列很短（LLM_QUEUE_SIZE），放行时线性扫描即可按实时的老化等级选择。
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        min_concurrency: int = LLM_MIN_CONCURRENCY,
+        initial_concurrency: int = LLM_INITIAL_CONCURRENCY,
+        max_queue: int = LLM_QUEUE_SIZE,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        priority_aging: float = LLM_PRIORITY_AGING
+    ):
+        """
+        初始化调度器
+        
+        Args:
+            max_concurrency: 上游LLM最大并发调用数，0表示不限制
+            min_concurrency: 自适应并发的下限
+            initial_concurrency: 初始并发上限
+            max_queue: 等待队列长度上限
+            queue_timeout: 最长排队时间(秒)，0表示不限
+            priority_aging: 低优先级每排队该秒数提升一级，0表示不提升
+        """
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.priority_aging = priority_aging
+        self.limiter = AIMDLimit(initial_concurrency, min_concurrency, max_concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._queue: List[_Waiter] = []
+        self._virtual_time = 0.0
+        self._last_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+        self.shed_count = 0
+        LLM_CONCURRENCY_LIMIT.set(self.limiter.limit)
+    
+    @property
+    def limit(self) -> int:
+        """当前并发上限"""
+        return int(self.limiter.limit)
+    
+    @contextmanager
+    def slot(
+        self,
+        tenant: str,
+        weight: float = 1.0,
+        cost: float = 1.0,
+        priority: str = Priority.MEDIUM.value,
+        deadline: Optional[float] = None
+    ) -> Iterator[None]:
+        """
+        占用一个LLM调用槽位
+        
+        Args:
+            tenant: 租户ID
+            weight: 租户权重
+            cost: 本次调用的代价
+            priority: 优先级
+            deadline: 截止时间（time.monotonic()时刻）
+        
+        Raises:
+            LLMOverloadedError: 过载被拒绝
+        """
+        if not self.max_concurrency:
+            yield
+            return
+        self.acquire(tenant, weight, cost, priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def _sort_key(self, waiter: _Waiter, now: float) -> Tuple[int, float, float, int]:
+        """放行顺序：老化后的优先级、截止时间、WFQ finish标记"""
+        rank = waiter.rank
+        if self.priority_aging and rank:
+            rank = max(0, rank - int((now - waiter.enqueued) / self.priority_aging))
+        deadline = waiter.deadline if waiter.deadline is not None else math.inf
+        return rank, deadline, waiter.finish, waiter.seq
+    
+    def _expected_wait(self, rank: int) -> float:
+        """按排在前面的等待者（同级及更高优先级）数量和平均延迟估算等待时间(秒)"""
+        ahead = sum(1 for w in self._queue if w.rank <= rank) + 1
+        return ahead / max(1, self.limit) * self.limiter.avg_latency
+    
+    def _shed(self, reason: str, wait: float) -> LLMOverloadedError:
+        """记录并构造拒绝异常（调用方持有锁）"""
+        self.shed_count += 1
+        LLM_SHED.labels(reason=reason).inc()
+        retry_after = int(min(60, max(1, math.ceil(wait))))
+        logger.warning(f"LLM调用被拒绝 - 原因: {reason}, 排队: {len(self._queue)}, 并发上限: {self.limit}")
+        return LLMOverloadedError(f"上游模型繁忙（{reason}），请稍后重试", retry_after)
+    
+    def _evict_for(self, rank: int, now: float) -> bool:
+        """队列已满时挤出放行顺序最靠后、且优先级低于rank的等待者（调用方持有锁）"""
+        if not self._queue:
+            return False
+        victim = max(self._queue, key=lambda w: self._sort_key(w, now))
+        if self._sort_key(victim, now)[0] <= rank:
+            return False
+        self._queue.remove(victim)
+        victim.evicted = True
+        victim.event.set()
+        return True
+    
+    def acquire(
+        self,
+        tenant: str,
+        weight: float = 1.0,
+        cost: float = 1.0,
+        priority: str = Priority.MEDIUM.value,
+        deadline: Optional[float] = None
+    ):
+        """
+        按优先级、截止时间和公平顺序等待并占用槽位
+        
+        Raises:
+            LLMOverloadedError: 队列已满、预计等待超过期限、已过截止时间或等待超时
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = max(self._virtual_time, self._last_finish.get(tenant, 0.0))
+            finish = start + cost / weight
+            waiter = _Waiter(priority, deadline, start, finish, now, next(self._seq))
+            if self._in_flight < self.limit and not self._queue:
+                self._last_finish[tenant] = finish
+                self._virtual_time = start
+                self._in_flight += 1
+                LLM_IN_FLIGHT.set(self._in_flight)
+                LLM_QUEUE_DELAY.labels(priority=waiter.priority).observe(0.0)
+                return
+            
+            # 截止时间比最长排队时间更紧时以截止时间为准
+            timeout = self.queue_timeout
+            deadline_bound = deadline is not None and (not timeout or deadline - now < timeout)
+            if deadline_bound:
+                timeout = deadline - now
+                if timeout <= 0:
+                    raise self._shed("deadline", self.limiter.avg_latency)
+            
+            expected_wait = self._expected_wait(waiter.rank)
+            if len(self._queue) >= self.max_queue and not self._evict_for(waiter.rank, now):
+                raise self._shed("queue_full", expected_wait)
+            if timeout and expected_wait > timeout:
+                raise self._shed("deadline" if deadline_bound else "expected_wait", expected_wait)
+            
+            self._last_finish[tenant] = finish
+            self._queue.append(waiter)
+            LLM_QUEUE_DEPTH.set(len(self._queue))
+        
+        waiter.event.wait(timeout or None)
+        with self._lock:
+            if waiter.granted:
+                return
+            if waiter.evicted:
+                raise self._shed("evicted", self._expected_wait(waiter.rank))
+            self._queue.remove(waiter)
+            LLM_QUEUE_DEPTH.set(len(self._queue))
+            raise self._shed("deadline" if deadline_bound else "timeout", self._expected_wait(waiter.rank))
+    
+    def release(self):
+        """释放槽位，按并发上限放行等待者"""
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+    
+    def _dispatch(self):
+        """在并发上限内按放行顺序放行等待者（调用方持有锁）"""
+        now = time.monotonic()
+        while self._queue and self._in_flight < self.limit:
+            waiter = min(self._queue, key=lambda w: self._sort_key(w, now))
+            self._queue.remove(waiter)
+            self._in_flight += 1
+            self._virtual_time = max(self._virtual_time, waiter.start)
+            waiter.granted = True
+            waiter.event.set()
+            LLM_QUEUE_DELAY.labels(priority=waiter.priority).observe(now - waiter.enqueued)
+        LLM_IN_FLIGHT.set(self._in_flight)
+        LLM_QUEUE_DEPTH.set(len(self._queue))
+    
+    def on_success(self, latency: float, output_tokens: int):
+        """
+        反馈一次成功调用，用于调整并发上限
+        
+        Args:
+            latency: 调用耗时(秒)
+            output_tokens: 输出token数
+        """
+        if not self.max_concurrency:
+            return
+        with self._lock:
+            self.limiter.on_success(latency, output_tokens)
+            LLM_CONCURRENCY_LIMIT.set(self.limiter.limit)
+            self._dispatch()
+    
+    def on_overload(self):
+        """反馈一次上游过载（429/5xx/超时），收缩并发上限"""
+        if not self.max_concurrency:
+            return
+        with self._lock:
+            self.limiter.on_overload()
+            LLM_CONCURRENCY_LIMIT.set(self.limiter.limit)
+    
+    def stats(self) -> Dict[str, Any]:
+        """调度器状态"""
+        with self._lock:
+            queued_by_priority = {priority: 0 for priority in PRIORITY_RANKS}
+            for waiter in self._queue:
+                queued_by_priority[waiter.priority] = queued_by_priority.get(waiter.priority, 0) + 1
+            return {
+                "max_concurrency": self.max_concurrency,
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "queued": len(self._queue),
+                "queued_by_priority": queued_by_priority,
+                "avg_latency": round(self.limiter.avg_latency, 3),
+                "shed": self.shed_count
+            }
+
+
+# 全局LLM调度器实例
+llm_dispatcher = LLMDispatcher()
+
+
+def get_llm_dispatcher() -> LLMDispatcher:
+    """获取全局LLM调度器实例"""
+    return llm_dispatcher
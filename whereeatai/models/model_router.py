@@ -0,0 +1,112 @@
+"""模型路由，按Agent和端点选择模型及生成参数"""
+from typing import Dict, Any, Optional
+from pathlib import Path
+from pydantic import BaseModel, Field
+import json
+import logging
+
+from whereeatai.config import (
+    MODEL_NAME,
+    MODEL_TEMPERATURE,
+    MODEL_MAX_TOKENS,
+    MODEL_FALLBACK_NAME,
+    MODEL_ROUTES
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRoute(BaseModel):
+    """单条模型路由"""
+    model: str = Field(default=MODEL_NAME, description="模型名称")
+    temperature: float = Field(default=MODEL_TEMPERATURE, ge=0.0, le=2.0)
+    max_tokens: int = Field(default=MODEL_MAX_TOKENS, ge=1)
+    fallback_model: Optional[str] = Field(default=MODEL_FALLBACK_NAME or None, description="过载时的备用模型")
+
+
+class ModelRouter:
+    """
+    模型路由器
+    
+    路由配置格式:
+        {
+            "default": {"model": "...", "temperature": 0.7, "max_tokens": 4096, "fallback_model": "..."},
+            "agents": {"price_comparison": {"model": "..."}},
+            "endpoints": {"/travel-plan": {"max_tokens": 2048}}
+        }
+    
+    解析顺序为 默认配置 <- Agent路由 <- 端点路由，后者覆盖前者中出现的字段。
+    """
+    
+    def __init__(self, routes: Optional[Dict[str, Any]] = None):
+        """
+        初始化模型路由器
+        
+        Args:
+            routes: 路由配置，为空时只使用默认模型
+        """
+        routes = routes or {}
+        self.default = routes.get("default", {})
+        self.agent_routes: Dict[str, Dict[str, Any]] = routes.get("agents", {})
+        self.endpoint_routes: Dict[str, Dict[str, Any]] = routes.get("endpoints", {})
+        self._resolved: Dict[tuple, ModelRoute] = {}
+        
+        # 提前校验所有路由，配置错误在启动时暴露
+        for name, route in self.agent_routes.items():
+            ModelRoute(**{**self.default, **route})
+        for name, route in self.endpoint_routes.items():
+            ModelRoute(**{**self.default, **route})
+        logger.info(
+            f"模型路由加载完成 - Agent路由: {list(self.agent_routes)}, 端点路由: {list(self.endpoint_routes)}"
+        )
+    
+    @classmethod
+    def from_config(cls, value: str = MODEL_ROUTES) -> "ModelRouter":
+        """
+        从配置值创建路由器
+        
+        Args:
+            value: JSON字符串或JSON文件路径
+        
+        Returns:
+            ModelRouter: 路由器实例
+        """
+        value = (value or "").strip()
+        if not value:
+            return cls()
+        if not value.startswith("{"):
+            value = Path(value).read_text(encoding="utf-8")
+        return cls(json.loads(value))
+    
+    def resolve(self, agent: Optional[str] = None, endpoint: Optional[str] = None) -> ModelRoute:
+        """
+        解析Agent在指定端点下使用的模型路由
+        
+        Args:
+            agent: Agent路由名称
+            endpoint: 请求端点路径
+        
+        Returns:
+            ModelRoute: 合并后的模型路由
+        """
+        # 未配置路由的名称统一归为空键，避免解析缓存随请求路径无限增长
+        agent = agent if agent in self.agent_routes else ""
+        endpoint = endpoint if endpoint in self.endpoint_routes else ""
+        key = (agent, endpoint)
+        route = self._resolved.get(key)
+        if route is None:
+            merged = dict(self.default)
+            merged.update(self.agent_routes.get(agent, {}))
+            merged.update(self.endpoint_routes.get(endpoint, {}))
+            route = ModelRoute(**merged)
+            self._resolved[key] = route
+        return route
+
+
+# 全局模型路由器实例
+model_router = ModelRouter.from_config()
+
+
+def get_model_router() -> ModelRouter:
+    """获取全局模型路由器实例"""
+    return model_router
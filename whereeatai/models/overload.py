@@ -0,0 +1,203 @@
+"""过载降级：上游变慢时逐级降低回答成本，宁可返回更便宜的结果也不超时"""
+from typing import Any, Deque, Dict, Optional, Tuple
+from collections import deque
+from enum import IntEnum
+import math
+import threading
+import time
+import logging
+
+from whereeatai.config import (
+    DEGRADATION_ENABLED,
+    DEGRADATION_LATENCY_TARGET,
+    DEGRADATION_QUEUE_TARGET,
+    DEGRADATION_INTERVAL,
+    DEGRADED_MAX_TOKENS_RATIO,
+    DEGRADED_MODEL_NAME
+)
+from whereeatai.models.dispatcher import LLMDispatcher, get_llm_dispatcher
+from whereeatai.models.model_router import ModelRoute
+from whereeatai.utils.context import current_degradation
+from whereeatai.utils.metrics import DEGRADATION_LEVEL
+
+logger = logging.getLogger(__name__)
+
+
+class DegradationLevel(IntEnum):
+    """降级等级（逐级累加）"""
+    NORMAL = 0          # 正常
+    SHORT_OUTPUT = 1    # 缩小max_tokens
+    SMALL_MODEL = 2     # 切换到小模型
+    SKIP_OPTIONAL = 3   # 跳过工作流中的可选节点（如价格比价）
+    STALE_CACHE = 4     # 返回已过期的缓存结果
+
+
+class OverloadController:
+    """
+    过载控制器
+    
+    根据LLM调度器的排队深度、拒绝次数和近期调用的p95延迟计算压力：
+    - 压力 > 1：每个评估周期升一级
+    - 压力 < recover_ratio：每个评估周期降一级（留出回差，避免在阈值附近来回切换）
+    
+    管理员可手动指定等级，指定期间不自动调整。
+    """
+    
+    def __init__(
+        self,
+        dispatcher: Optional[LLMDispatcher] = None,
+        latency_target: float = DEGRADATION_LATENCY_TARGET,
+        queue_target: float = DEGRADATION_QUEUE_TARGET,
+        interval: float = DEGRADATION_INTERVAL,
+        window: float = 60.0,
+        recover_ratio: float = 0.7,
+        enabled: bool = DEGRADATION_ENABLED
+    ):
+        """
+        初始化过载控制器
+        
+        Args:
+            dispatcher: LLM调度器，默认使用全局实例
+            latency_target: p95延迟目标(秒)
+            queue_target: 排队深度目标（占调度器队列长度的比例）
+            interval: 两次调整等级的最小间隔(秒)
+            window: 延迟统计窗口(秒)
+            recover_ratio: 压力低于该值时降级
+            enabled: 是否自动调整等级
+        """
+        self.dispatcher = dispatcher or get_llm_dispatcher()
+        self.latency_target = latency_target
+        self.queue_target = queue_target
+        self.interval = interval
+        self.window = window
+        self.recover_ratio = recover_ratio
+        self.enabled = enabled
+        self._latencies: Deque[Tuple[float, float]] = deque(maxlen=1024)
+        self._lock = threading.Lock()
+        self._level = DegradationLevel.NORMAL
+        self._override: Optional[DegradationLevel] = None
+        self._last_eval = time.monotonic()
+        self._last_shed = self.dispatcher.shed_count
+        self._pressure = 0.0
+        self._routes: Dict[Tuple[Any, ...], ModelRoute] = {}
+        DEGRADATION_LEVEL.set(0)
+    
+    def observe_latency(self, latency: float):
+        """
+        记录一次成功LLM调用的延迟
+        
+        Args:
+            latency: 调用耗时(秒)
+        """
+        self._latencies.append((time.monotonic(), latency))
+    
+    def _p95(self, now: float) -> float:
+        """统计窗口内的p95延迟"""
+        samples = sorted(latency for ts, latency in list(self._latencies) if now - ts <= self.window)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, math.ceil(len(samples) * 0.95) - 1)]
+    
+    def _evaluate(self, now: float):
+        """计算压力并调整等级（调用方持有锁）"""
+        self._last_eval = now
+        stats = self.dispatcher.stats()
+        shed = stats["shed"] - self._last_shed
+        self._last_shed = stats["shed"]
+        queue_capacity = max(1.0, self.dispatcher.max_queue * self.queue_target)
+        p95 = self._p95(now)
+        self._pressure = max(
+            p95 / self.latency_target if self.latency_target else 0.0,
+            stats["queued"] / queue_capacity,
+            # 评估周期内出现拒绝说明已经排不下
+            1.5 if shed else 0.0
+        )
+        if self._override is not None or not self.enabled:
+            return
+        level = self._level
+        if self._pressure > 1.0 and level < DegradationLevel.STALE_CACHE:
+            level = DegradationLevel(level + 1)
+        elif self._pressure < self.recover_ratio and level > DegradationLevel.NORMAL:
+            level = DegradationLevel(level - 1)
+        if level != self._level:
+            logger.warning(
+                f"降级等级调整: {self._level.value} -> {level.value}, 压力: {self._pressure:.2f}, "
+                f"p95延迟: {p95:.2f}秒, 排队: {stats['queued']}, 拒绝: {shed}"
+            )
+            self._level = level
+            DEGRADATION_LEVEL.set(level.value)
+    
+    @property
+    def level(self) -> DegradationLevel:
+        """当前降级等级（按评估周期惰性更新）"""
+        now = time.monotonic()
+        if now - self._last_eval >= self.interval:
+            with self._lock:
+                if now - self._last_eval >= self.interval:
+                    self._evaluate(now)
+        return self._override if self._override is not None else self._level
+    
+    def set_override(self, level: Optional[int]):
+        """
+        手动指定降级等级
+        
+        Args:
+            level: 降级等级，None表示恢复自动调整
+        """
+        with self._lock:
+            self._override = DegradationLevel(level) if level is not None else None
+            effective = self._override if self._override is not None else self._level
+            DEGRADATION_LEVEL.set(effective.value)
+        logger.warning(f"降级等级手动设置: {'自动' if level is None else level}")
+    
+    def degrade_route(self, route: ModelRoute, level: int) -> ModelRoute:
+        """
+        按降级等级调整模型路由
+        
+        Args:
+            route: 原始模型路由
+            level: 降级等级
+        
+        Returns:
+            ModelRoute: 调整后的模型路由
+        """
+        if level < DegradationLevel.SHORT_OUTPUT:
+            return route
+        key = (route.model, route.temperature, route.max_tokens, route.fallback_model, min(level, DegradationLevel.SMALL_MODEL))
+        degraded = self._routes.get(key)
+        if degraded is None:
+            # 下限256只用于避免输出过短，不能超过原路由的max_tokens
+            max_tokens = min(route.max_tokens, max(256, int(route.max_tokens * DEGRADED_MAX_TOKENS_RATIO)))
+            update: Dict[str, Any] = {"max_tokens": max_tokens}
+            if level >= DegradationLevel.SMALL_MODEL and DEGRADED_MODEL_NAME:
+                update["model"] = DEGRADED_MODEL_NAME
+            degraded = route.model_copy(update=update)
+            self._routes[key] = degraded
+        return degraded
+    
+    def stats(self) -> Dict[str, Any]:
+        """降级状态"""
+        level = self.level
+        return {
+            "level": level.value,
+            "name": level.name.lower(),
+            "override": self._override.value if self._override is not None else None,
+            "auto": self.enabled,
+            "pressure": round(self._pressure, 3),
+            "p95_latency": round(self._p95(time.monotonic()), 3)
+        }
+
+
+# 全局过载控制器实例
+overload_controller = OverloadController()
+
+
+def get_overload_controller() -> OverloadController:
+    """获取全局过载控制器实例"""
+    return overload_controller
+
+
+def get_degradation_level() -> DegradationLevel:
+    """获取当前请求的降级等级（请求之外取控制器的实时等级）"""
+    level = current_degradation.get()
+    return DegradationLevel(level) if level is not None else overload_controller.level
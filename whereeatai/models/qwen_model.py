@@ -1,21 +1,230 @@
 """千问模型集成，用于连接硅基流动的千问模型"""
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Iterator, Tuple, List
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+import time
+import logging
+import httpx
+import openai
 from langchain_openai import ChatOpenAI
-from whereeatai.config import API_KEY, BASE_URL, MODEL_NAME
+from whereeatai.config import API_KEY, BASE_URL, LLM_MAX_CONCURRENCY
+from whereeatai.models.model_router import ModelRoute, get_model_router
+from whereeatai.models.dispatcher import LLMOverloadedError, get_llm_dispatcher
+from whereeatai.models.overload import get_overload_controller, get_degradation_level
+from whereeatai.utils.context import (
+    get_current_endpoint,
+    get_current_tenant,
+    get_current_priority,
+    get_current_deadline
+)
+from whereeatai.utils.tenants import get_tenant_registry
+from whereeatai.utils.metrics import LLM_REQUESTS, LLM_LATENCY, LLM_TOKENS, LLM_FALLBACKS
 
+logger = logging.getLogger(__name__)
 
-class QwenModel:
-    """千问模型封装，用于连接硅基流动的千问模型"""
+# 视为上游过载、可切换备用模型的异常
+OVERLOAD_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError
+)
+
+
+class UsageTracker:
+    """LLM用量统计器，汇总一个上下文内所有模型调用的token用量"""
     
     def __init__(self):
-        """初始化千问模型"""
-        self.model = ChatOpenAI(
-            api_key=API_KEY,
-            base_url=BASE_URL,
-            model=MODEL_NAME,
-            temperature=0.7,
-            max_tokens=4096
+        """初始化用量统计器"""
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._lock = threading.Lock()
+    
+    def add(self, usage: Dict[str, int]):
+        """
+        累加一次模型调用的用量
+        
+        Args:
+            usage: 包含input_tokens和output_tokens的用量字典
+        """
+        with self._lock:
+            self.calls += 1
+            self.input_tokens += usage.get("input_tokens", 0)
+            self.output_tokens += usage.get("output_tokens", 0)
+    
+    @property
+    def total_tokens(self) -> int:
+        """总token数"""
+        return self.input_tokens + self.output_tokens
+    
+    def to_dict(self) -> Dict[str, int]:
+        """转换为字典"""
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "total_tokens": self.total_tokens
+        }
+
+
+# 当前上下文的用量统计器（LangGraph并行节点会复制上下文，统计器对象在各线程间共享）
+_usage_tracker: ContextVar[Optional[UsageTracker]] = ContextVar("llm_usage_tracker", default=None)
+
+
+@contextmanager
+def track_usage() -> Iterator[UsageTracker]:
+    """
+    统计上下文内所有模型调用的token用量
+    
+    Yields:
+        UsageTracker: 用量统计器
+    """
+    tracker = UsageTracker()
+    token = _usage_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _usage_tracker.reset(token)
+
+
+# 按(模型, temperature, max_tokens, 重试次数)共享的客户端，所有客户端共用同一个HTTP连接池
+_clients: Dict[Tuple[str, float, int, int], ChatOpenAI] = {}
+_clients_lock = threading.Lock()
+_http_client: Optional[httpx.Client] = None
+# HTTP客户端单独加锁：get_chat_client持有_clients_lock时会创建HTTP客户端，共用一把锁会死锁
+_http_client_lock = threading.Lock()
+
+
+def get_http_client() -> httpx.Client:
+    """
+    获取进程内共享的上游HTTP客户端（连接池）
+    
+    Returns:
+        httpx.Client: HTTP客户端
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                keepalive = max(20, LLM_MAX_CONCURRENCY)
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=keepalive * 2, max_keepalive_connections=keepalive)
+                )
+    return _http_client
+
+
+def _reset_clients_after_fork():
+    """fork出的子进程不能复用父进程的连接，丢弃客户端后在子进程中重新创建"""
+    global _http_client, _clients_lock, _http_client_lock
+    _clients.clear()
+    _http_client = None
+    _clients_lock = threading.Lock()
+    _http_client_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
+
+
+def warm_up_connection(timeout: float = 5.0) -> bool:
+    """
+    与上游建立一条连接（DNS、TCP、TLS握手），第一个请求不再承担握手耗时
+    
+    Args:
+        timeout: 超时时间(秒)
+    
+    Returns:
+        bool: 上游是否可达
+    """
+    try:
+        response = get_http_client().get(
+            f"{BASE_URL.rstrip('/')}/models",
+            headers={"Authorization": f"Bearer {API_KEY}"} if API_KEY else None,
+            timeout=timeout
         )
+        return response.status_code < 500
+    except httpx.HTTPError as e:
+        logger.warning(f"预热上游连接失败: {str(e)}")
+        return False
+
+
+def get_chat_client(model: str, temperature: float, max_tokens: int, max_retries: int = 2) -> ChatOpenAI:
+    """
+    获取共享的模型客户端
+    
+    Args:
+        model: 模型名称
+        temperature: 采样温度
+        max_tokens: 最大生成token数
+        max_retries: 客户端内部重试次数
+    
+    Returns:
+        ChatOpenAI: 模型客户端
+    """
+    key = (model, temperature, max_tokens, max_retries)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = ChatOpenAI(
+                    api_key=API_KEY,
+                    base_url=BASE_URL,
+                    model=model,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                    max_retries=max_retries,
+                    http_client=get_http_client()
+                )
+                _clients[key] = client
+    return client
+
+
+class QwenModel:
+    """千问模型封装，用于连接硅基流动的千问模型"""
+    
+    def __init__(self, route: Optional[str] = None):
+        """
+        初始化千问模型
+        
+        Args:
+            route: 模型路由名称（通常为Agent名称），用于选择模型及生成参数
+        """
+        self.route = route
+        self.router = get_model_router()
+    
+    def resolve_route(self) -> ModelRoute:
+        """
+        解析当前请求上下文下的模型路由
+        
+        Returns:
+            ModelRoute: 模型路由（过载降级时缩小max_tokens或切换小模型）
+        """
+        route = self.router.resolve(self.route, get_current_endpoint())
+        return get_overload_controller().degrade_route(route, get_degradation_level())
+    
+    def warm_up(self, endpoints: Optional[List[str]] = None) -> int:
+        """
+        预先创建本路由（及各端点路由）会用到的模型客户端
+        
+        Args:
+            endpoints: 需要预热的端点路径
+        
+        Returns:
+            int: 预热的客户端数
+        """
+        count = 0
+        for endpoint in [""] + list(endpoints or []):
+            route = self.router.resolve(self.route, endpoint)
+            fallback_model = route.fallback_model if route.fallback_model != route.model else None
+            get_chat_client(route.model, route.temperature, route.max_tokens, 0 if fallback_model else 2)
+            count += 1
+            if fallback_model:
+                get_chat_client(fallback_model, route.temperature, route.max_tokens, 2)
+                count += 1
+        return count
     
     def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
         """
@@ -28,15 +237,134 @@ class QwenModel:
         Returns:
             str: 模型生成的响应
         """
-        from langchain_core.messages import HumanMessage, SystemMessage
+        content, _ = self.generate_with_usage(prompt, system_prompt)
+        return content
+    
+    def generate_with_usage(self, prompt: str, system_prompt: Optional[str] = None) -> Tuple[str, Dict[str, int]]:
+        """
+        生成模型响应并返回token用量，主模型过载时自动切换到备用模型
+        
+        Args:
+            prompt: 用户提示词
+            system_prompt: 系统提示词
+        
+        Returns:
+            Tuple[str, Dict[str, int]]: 模型生成的响应和token用量
+        """
+        return self.generate_from_messages([{"role": "user", "content": prompt}], system_prompt)
+    
+    def generate_from_messages(
+        self,
+        history: List[Dict[str, str]],
+        system_prompt: Optional[str] = None
+    ) -> Tuple[str, Dict[str, int]]:
+        """
+        基于多轮对话生成模型响应并返回token用量，主模型过载时自动切换到备用模型
+        
+        Args:
+            history: 对话消息列表，每条为 {"role": "user"或"assistant", "content": 内容}，最后一条通常为用户消息
+            system_prompt: 系统提示词
+        
+        Returns:
+            Tuple[str, Dict[str, int]]: 模型生成的响应和token用量
+        """
+        from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
         
         messages = []
         if system_prompt:
             messages.append(SystemMessage(content=system_prompt))
-        messages.append(HumanMessage(content=prompt))
+        for message in history:
+            message_class = AIMessage if message.get("role") == "assistant" else HumanMessage
+            messages.append(message_class(content=message.get("content", "")))
+        
+        route = self.resolve_route()
+        fallback_model = route.fallback_model if route.fallback_model != route.model else None
+        try:
+            # 配置了备用模型时主模型不做客户端重试，过载立即切换
+            response, usage = self._invoke(route.model, route, messages, max_retries=0 if fallback_model else 2)
+        except OVERLOAD_ERRORS as e:
+            if not fallback_model:
+                raise
+            logger.warning(f"模型过载，切换备用模型: {route.model} -> {fallback_model}, 错误: {str(e)}")
+            LLM_FALLBACKS.labels(model=route.model, fallback_model=fallback_model).inc()
+            response, usage = self._invoke(fallback_model, route, messages, max_retries=2)
+        
+        tracker = _usage_tracker.get()
+        if tracker is not None:
+            tracker.add(usage)
+        # 按实际用量扣减租户token配额
+        get_tenant_registry().charge_tokens(get_current_tenant(), usage["total_tokens"])
+        
+        return response.content, usage
+    
+    def _invoke(self, model: str, route: ModelRoute, messages: List[Any], max_retries: int):
+        """
+        调用指定模型并记录按模型拆分的监控指标
+        
+        Args:
+            model: 模型名称
+            route: 模型路由（提供temperature和max_tokens）
+            messages: 消息列表
+            max_retries: 客户端内部重试次数
+        
+        Returns:
+            模型响应消息和token用量
+        """
+        route_name = self.route or "default"
+        client = get_chat_client(model, route.temperature, route.max_tokens, max_retries)
+        tenant = get_current_tenant()
+        weight = get_tenant_registry().get(tenant).weight
+        dispatcher = get_llm_dispatcher()
+        try:
+            # 按优先级、截止时间和租户权重占用上游并发槽位（过载时抛出LLMOverloadedError），延迟只统计实际调用耗时
+            with dispatcher.slot(tenant, weight, priority=get_current_priority(), deadline=get_current_deadline()):
+                start = time.perf_counter()
+                response = client.invoke(messages)
+                latency = time.perf_counter() - start
+        except LLMOverloadedError:
+            LLM_REQUESTS.labels(model=model, route=route_name, status="shed").inc()
+            raise
+        except OVERLOAD_ERRORS:
+            dispatcher.on_overload()
+            LLM_REQUESTS.labels(model=model, route=route_name, status="overloaded").inc()
+            raise
+        except Exception:
+            LLM_REQUESTS.labels(model=model, route=route_name, status="error").inc()
+            raise
         
-        response = self.model.invoke(messages)
-        return response.content
+        usage = self._extract_usage(response)
+        dispatcher.on_success(latency, usage["output_tokens"])
+        get_overload_controller().observe_latency(latency)
+        LLM_LATENCY.labels(model=model, route=route_name).observe(latency)
+        LLM_REQUESTS.labels(model=model, route=route_name, status="success").inc()
+        LLM_TOKENS.labels(model=model, route=route_name, type="input").inc(usage["input_tokens"])
+        LLM_TOKENS.labels(model=model, route=route_name, type="output").inc(usage["output_tokens"])
+        return response, usage
+    
+    @staticmethod
+    def _extract_usage(response) -> Dict[str, int]:
+        """
+        从模型响应中提取token用量
+        
+        Args:
+            response: 模型响应消息
+        
+        Returns:
+            Dict[str, int]: token用量
+        """
+        usage_metadata = getattr(response, "usage_metadata", None) or {}
+        if usage_metadata:
+            input_tokens = usage_metadata.get("input_tokens", 0)
+            output_tokens = usage_metadata.get("output_tokens", 0)
+        else:
+            token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+            input_tokens = token_usage.get("prompt_tokens", 0)
+            output_tokens = token_usage.get("completion_tokens", 0)
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens
+        }
     
     def generate_with_template(self, template: str, variables: Dict[str, Any], system_prompt: Optional[str] = None) -> str:
         """
@@ -0,0 +1,354 @@
+"""预计算任务：低峰期为热门目的地提前生成内容
+
+高峰期的请求集中在少数目的地上，每天第一个请求要等完整的LLM生成。预计算任务在低峰期以低优先级、
+有限并发重新生成这些内容并写入生成内容存储（各worker共享，命中后再进入各自的响应缓存），
+条目在下一个高峰时段结束时过期，次日由下一次预计算刷新。
+
+用法:
+    python -m whereeatai.precompute --input destinations.json
+    python -m whereeatai.precompute --from-store 50 --since-hours 72
+    python -m whereeatai.precompute --status
+
+输入文件为JSON数组或每行一个JSON对象，每项可以是：
+    {"kind": "agent:itinerary", "input": {...}}       指定生成内容
+    {"destination": "成都", "duration": "3天", ...}   请求输入，按 --targets 生成
+
+每完成一项进度写入状态文件；任务中断、进入高峰时段或上游过载时暂停，再次运行同一任务时跳过已完成的项。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from hashlib import blake2b
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import time
+import logging
+
+from whereeatai.config import (
+    LOG_LEVEL,
+    LOG_DIR,
+    LOG_FILE,
+    PRECOMPUTE_PEAK_HOURS,
+    PRECOMPUTE_CONCURRENCY,
+    PRECOMPUTE_TARGETS,
+    PRECOMPUTE_STATE_PATH
+)
+from whereeatai.models.dispatcher import LLMOverloadedError
+from whereeatai.utils.context import scheduling
+from whereeatai.utils.plan_store import PlanStore, get_plan_store, normalize_input, refreshing
+
+logger = logging.getLogger(__name__)
+
+
+def parse_peak_hours(spec: str) -> List[Tuple[int, int]]:
+    """
+    解析高峰时段
+    
+    Args:
+        spec: 形如 "11-14,17-21" 的时段列表（结束小时不含，"22-2" 表示跨零点）
+    
+    Returns:
+        List[Tuple[int, int]]: (开始小时, 结束小时)
+    """
+    windows = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, end = (int(value) for value in part.split("-", 1))
+        if not (0 <= start <= 23 and 0 <= end <= 24):
+            raise ValueError(f"无效的高峰时段: {part}")
+        windows.append((start, end))
+    return windows
+
+
+def in_peak(now: datetime, windows: List[Tuple[int, int]]) -> bool:
+    """当前时间是否处于高峰时段"""
+    for start, end in windows:
+        if start < end and start <= now.hour < end:
+            return True
+        if start >= end and (now.hour >= start or now.hour < end):
+            return True
+    return False
+
+
+def next_peak_end(now: datetime, windows: List[Tuple[int, int]]) -> datetime:
+    """
+    下一个高峰时段的结束时间（当前处于高峰时段时为本时段结束时间）
+    
+    Args:
+        now: 当前时间
+        windows: 高峰时段
+    
+    Returns:
+        datetime: 结束时间；未配置高峰时段时为一天后
+    """
+    if not windows:
+        return now + timedelta(days=1)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    ends = []
+    for days in (-1, 0, 1):
+        day = midnight + timedelta(days=days)
+        for start, end in windows:
+            end_at = day + timedelta(hours=end + (24 if start >= end else 0))
+            if end_at > now:
+                ends.append(end_at)
+    return min(ends)
+
+
+def load_items(path: str, targets: List[str]) -> List[Dict[str, Any]]:
+    """
+    读取预计算列表
+    
+    Args:
+        path: JSON数组或JSON Lines文件
+        targets: 只给出请求输入的项要生成的内容
+    
+    Returns:
+        List[Dict]: 预计算项 {"kind", "input"}
+    """
+    text = Path(path).read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+    items = []
+    for entry in entries:
+        if "kind" in entry and "input" in entry:
+            items.append({"kind": entry["kind"], "input": entry["input"]})
+        else:
+            items.extend({"kind": kind, "input": entry} for kind in targets)
+    return items
+
+
+def popular_items(limit: int, since_hours: float, store: Optional[PlanStore] = None) -> List[Dict[str, Any]]:
+    """
+    从生成内容存储中选出最近复用最多的请求
+    
+    存储保存了每个成功请求的规范输入和命中次数，比请求日志更适合作为热门需求的来源。
+    
+    Args:
+        limit: 条数
+        since_hours: 统计最近多少小时
+        store: 生成内容存储
+    
+    Returns:
+        List[Dict]: 预计算项 {"kind", "input"}
+    """
+    store = store or get_plan_store()
+    since = time.time() - since_hours * 3600
+    return [{"kind": kind, "input": input_data} for kind, input_data in store.popular_inputs(since, limit)]
+
+
+def item_id(item: Dict[str, Any]) -> str:
+    """预计算项ID（与生成内容存储的查找键一致，规范化后相同的需求只执行一次）"""
+    return PlanStore.make_key(item["kind"], normalize_input(item["input"]))
+
+
+class PrecomputeJob:
+    """
+    预计算任务
+    
+    以低优先级、有限并发执行各项，进度写入状态文件；同一列表再次运行时从上次中断处继续。
+    """
+    
+    def __init__(
+        self,
+        agent_manager,
+        items: List[Dict[str, Any]],
+        state_path: str = PRECOMPUTE_STATE_PATH,
+        concurrency: int = PRECOMPUTE_CONCURRENCY,
+        peak_hours: str = PRECOMPUTE_PEAK_HOURS,
+        ignore_peak: bool = False
+    ):
+        """
+        初始化预计算任务
+        
+        Args:
+            agent_manager: Agent管理器实例
+            items: 预计算项 {"kind", "input"}，重复的需求只保留一个
+            state_path: 状态文件路径
+            concurrency: 同时执行的项数
+            peak_hours: 高峰时段
+            ignore_peak: 高峰时段内是否继续执行
+        """
+        self.agent_manager = agent_manager
+        self.items: Dict[str, Dict[str, Any]] = {}
+        for item in items:
+            self.items.setdefault(item_id(item), item)
+        self.job_id = blake2b("\n".join(sorted(self.items)).encode("utf-8"), digest_size=8).hexdigest()
+        self.state_path = Path(state_path)
+        self.concurrency = max(1, concurrency)
+        self.windows = parse_peak_hours(peak_hours)
+        self.ignore_peak = ignore_peak
+        self.state = self._load_state()
+    
+    def _load_state(self) -> Dict[str, Any]:
+        """读取状态文件，不是同一任务时重新开始"""
+        if self.state_path.exists():
+            try:
+                state = json.loads(self.state_path.read_text(encoding="utf-8"))
+                if state.get("job_id") == self.job_id:
+                    logger.info(f"继续预计算任务 {self.job_id}: 已完成 {len(state['done'])}/{len(self.items)}")
+                    return state
+            except (ValueError, KeyError) as e:
+                logger.warning(f"状态文件无效，重新开始: {str(e)}")
+        return {
+            "job_id": self.job_id,
+            "total": len(self.items),
+            "done": [],
+            "failed": {},
+            "status": "pending",
+            "started_at": time.time(),
+            "updated_at": time.time(),
+            "expires_at": None
+        }
+    
+    def _save_state(self):
+        """原子写入状态文件"""
+        self.state["updated_at"] = time.time()
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.state_path)
+    
+    def _execute(self, item: Dict[str, Any], expires_at: float) -> Dict[str, Any]:
+        """以低优先级重新生成一项（不读取已保存的内容），结果按expires_at过期"""
+        with scheduling(priority="low"), refreshing(expires_at):
+            return self.agent_manager.execute_target(item["kind"], item["input"])
+    
+    def _should_pause(self) -> Optional[str]:
+        """是否应暂停（进入高峰时段）"""
+        if not self.ignore_peak and in_peak(datetime.now(), self.windows):
+            return "进入高峰时段"
+        return None
+    
+    def run(self) -> Dict[str, Any]:
+        """
+        执行任务
+        
+        Returns:
+            Dict: 最终状态（status为completed或paused）
+        """
+        done = set(self.state["done"])
+        pending = [(key, item) for key, item in self.items.items() if key not in done]
+        expires_at = next_peak_end(datetime.now(), self.windows).timestamp()
+        self.state.update(status="running", expires_at=expires_at)
+        self.state["failed"] = {}
+        self._save_state()
+        logger.info(
+            f"预计算任务 {self.job_id} 开始: 待执行 {len(pending)}/{len(self.items)}, "
+            f"并发 {self.concurrency}, 条目过期时间 {datetime.fromtimestamp(expires_at):%Y-%m-%d %H:%M}"
+        )
+        
+        start = time.perf_counter()
+        completed = 0
+        pause_reason = None
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="precompute") as executor:
+            running = {}
+            while pending or running:
+                while pending and len(running) < self.concurrency and pause_reason is None:
+                    pause_reason = self._should_pause()
+                    if pause_reason is None:
+                        key, item = pending.pop(0)
+                        running[executor.submit(self._execute, item, expires_at)] = (key, item, time.perf_counter())
+                if not running:
+                    break
+                
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    key, item, item_start = running.pop(future)
+                    elapsed = time.perf_counter() - item_start
+                    destination = item["input"].get("destination") or item["input"].get("location", "")
+                    try:
+                        result = future.result()
+                        error = None if result.get("status") == "success" else result.get("message", "生成失败")
+                    except LLMOverloadedError as e:
+                        error = f"上游过载: {str(e)}"
+                        pause_reason = "上游过载"
+                    except Exception as e:
+                        error = str(e)
+                    if error is None:
+                        self.state["done"].append(key)
+                    else:
+                        self.state["failed"][key] = error
+                    completed += 1
+                    self._save_state()
+                    
+                    rate = completed / (time.perf_counter() - start)
+                    remaining = len(pending) + len(running)
+                    logger.info(
+                        f"[{len(self.state['done'])}/{len(self.items)}] {item['kind']} {destination}: "
+                        f"{'成功' if error is None else '失败 - ' + error} ({elapsed:.1f}s), "
+                        f"剩余 {remaining}, 预计还需 {remaining / rate:.0f}s"
+                    )
+        
+        self.state["status"] = "paused" if pause_reason else "completed"
+        self._save_state()
+        logger.info(
+            f"预计算任务 {self.job_id} {'暂停（' + pause_reason + '）' if pause_reason else '完成'}: "
+            f"成功 {len(self.state['done'])}/{len(self.items)}, 失败 {len(self.state['failed'])}, "
+            f"耗时 {time.perf_counter() - start:.1f}s"
+        )
+        return self.state
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="低峰期预先生成热门目的地的内容")
+    parser.add_argument("--input", help="预计算列表文件（JSON数组或JSON Lines）")
+    parser.add_argument("--from-store", type=int, default=0, metavar="N", help="从生成内容存储中选取最近复用最多的N个请求")
+    parser.add_argument("--since-hours", type=float, default=168, help="--from-store 统计的时间范围(小时)")
+    parser.add_argument("--targets", default=PRECOMPUTE_TARGETS, help="只给出请求输入的项要生成的内容（逗号分隔）")
+    parser.add_argument("--concurrency", type=int, default=PRECOMPUTE_CONCURRENCY, help="同时执行的项数")
+    parser.add_argument("--state", default=PRECOMPUTE_STATE_PATH, help="状态文件路径")
+    parser.add_argument("--ignore-peak", action="store_true", help="高峰时段内也执行")
+    parser.add_argument("--status", action="store_true", help="只显示上次任务的进度")
+    args = parser.parse_args(argv)
+    
+    if args.status:
+        state_path = Path(args.state)
+        if not state_path.exists():
+            print("没有预计算任务记录")
+            return 1
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+        print(json.dumps({
+            "job_id": state["job_id"],
+            "status": state["status"],
+            "done": len(state["done"]),
+            "failed": len(state["failed"]),
+            "total": state["total"],
+            "updated_at": datetime.fromtimestamp(state["updated_at"]).isoformat(timespec="seconds")
+        }, ensure_ascii=False, indent=2))
+        return 0
+    
+    from whereeatai.utils.logger import setup_logging
+    
+    setup_logging(log_level=LOG_LEVEL, log_file=LOG_FILE, log_dir=LOG_DIR, queue_size=0)
+    
+    targets = [target.strip() for target in args.targets.split(",") if target.strip()]
+    items = load_items(args.input, targets) if args.input else []
+    if args.from_store:
+        items.extend(popular_items(args.from_store, args.since_hours))
+    if not items:
+        parser.error("需要 --input 或 --from-store")
+    
+    # 延迟导入：只查看进度时不需要创建Agent
+    from whereeatai.agents.agent_manager import AgentManager
+    
+    job = PrecomputeJob(
+        AgentManager(),
+        items,
+        state_path=args.state,
+        concurrency=args.concurrency,
+        ignore_peak=args.ignore_peak
+    )
+    state = job.run()
+    return 0 if state["status"] == "completed" and not state["failed"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main())
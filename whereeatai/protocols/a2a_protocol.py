@@ -1,13 +1,20 @@
 """A2A (Agent-to-Agent) 协议实现"""
-from typing import Dict, Any, Optional, List, Literal
+from typing import Dict, Any, Optional, List, Literal, Union, Deque, TYPE_CHECKING
 from pydantic import BaseModel, Field
 from datetime import datetime
+from collections import deque
 from enum import Enum
 import uuid
 import logging
 
+if TYPE_CHECKING:
+    from whereeatai.protocols.fast_message import FastMessage
+
 logger = logging.getLogger(__name__)
 
+# 消息历史保留的最大条数
+MESSAGE_HISTORY_LIMIT = 10000
+
 
 class MessageType(str, Enum):
     """消息类型枚举"""
@@ -67,11 +74,6 @@ class A2AMessage(BaseModel):
     payload: A2AMessagePayload
     metadata: A2AMessageMetadata = Field(default_factory=A2AMessageMetadata)
     
-    class Config:
-        json_encoders = {
-            datetime: lambda v: v.isoformat()
-        }
-
 
 class AgentCapability(BaseModel):
     """Agent能力定义"""
@@ -97,10 +99,15 @@ class AgentRegistration(BaseModel):
 class A2AProtocol:
     """A2A协议处理器"""
     
-    def __init__(self):
-        """初始化A2A协议处理器"""
+    def __init__(self, history_limit: int = MESSAGE_HISTORY_LIMIT):
+        """
+        初始化A2A协议处理器
+        
+        Args:
+            history_limit: 消息历史保留的最大条数
+        """
         self.registered_agents: Dict[str, AgentRegistration] = {}
-        self.message_history: List[A2AMessage] = []
+        self.message_history: Deque[Union[A2AMessage, "FastMessage"]] = deque(maxlen=history_limit)
         logger.info("A2A协议处理器初始化完成")
     
     def register_agent(self, registration: AgentRegistration) -> bool:
@@ -237,12 +244,56 @@ class A2AProtocol:
         logger.debug(f"创建消息: {sender} -> {receiver}, 类型: {message_type}")
         return message
     
-    def send_message(self, message: A2AMessage) -> Dict[str, Any]:
+    def create_fast_message(
+        self,
+        sender: str,
+        receiver: str,
+        message_type: MessageType,
+        action: ActionType,
+        data: Dict[str, Any],
+        context: Optional[Dict[str, Any]] = None,
+        priority: Priority = Priority.MEDIUM,
+        timeout: int = 30
+    ) -> "FastMessage":
+        """
+        创建轻量A2A消息（进程内可信调用方使用，不做字段校验）
+        
+        Args:
+            sender: 发送者Agent ID
+            receiver: 接收者Agent ID
+            message_type: 消息类型
+            action: 操作类型
+            data: 消息数据
+            context: 上下文信息
+            priority: 优先级
+            timeout: 超时时间
+            
+        Returns:
+            FastMessage: 创建的消息
+        """
+        from whereeatai.protocols.fast_message import FastMessage
+        
+        message = FastMessage(
+            sender=sender,
+            receiver=receiver,
+            message_type=message_type,
+            action=action,
+            data=data,
+            context=context,
+            priority=priority,
+            timeout=timeout
+        )
+        self.message_history.append(message)
+        
+        logger.debug(f"创建消息: {sender} -> {receiver}, 类型: {message.message_type}")
+        return message
+    
+    def send_message(self, message: Union[A2AMessage, "FastMessage"]) -> Dict[str, Any]:
         """
         发送消息（模拟发送过程）
         
         Args:
-            message: A2A消息
+            message: A2A消息（A2AMessage或FastMessage）
             
         Returns:
             Dict: 发送结果
@@ -305,10 +356,11 @@ class A2AProtocol:
         Returns:
             List[A2AMessage]: 消息历史列表
         """
-        messages = self.message_history
+        messages = list(self.message_history)
         if agent_id:
             messages = [m for m in messages if m.sender == agent_id or m.receiver == agent_id]
-        return messages[-limit:]
+        # 轻量消息在对外输出时才转换为完整模型
+        return [m if isinstance(m, A2AMessage) else m.to_model() for m in messages[-limit:]]
 
 
 # 全局A2A协议实例
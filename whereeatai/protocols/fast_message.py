@@ -0,0 +1,260 @@
+"""轻量A2A消息，用于进程内高频的Agent间通信
+
+与 A2AMessage 字段一一对应，但不做逐字段校验：
+- 使用 __slots__ 的普通对象，构造开销远低于三层嵌套的pydantic模型
+- 消息ID为 进程前缀 + 自增计数，时间戳为整数纳秒，避免 uuid4 和 datetime.now
+- 二进制线格式为带版本号的msgpack数组
+
+只在信任边界（跨进程解码、对外输出历史记录）转换为 A2AMessage 做完整校验。
+"""
+from typing import Dict, Any, List, Optional
+from datetime import datetime
+import itertools
+import os
+import time
+import msgpack
+
+from whereeatai.protocols.a2a_protocol import (
+    A2AMessage,
+    A2AMessagePayload,
+    A2AMessageMetadata,
+    MessageType,
+    ActionType,
+    Priority
+)
+
+# 线格式版本，新增字段只能追加在数组末尾并提升版本号
+SCHEMA_VERSION = 1
+
+# 各版本的字段数，用于兼容解码旧版本消息
+_FIELD_COUNTS = {1: 14}
+
+
+def _new_id_prefix() -> str:
+    """生成进程级消息ID前缀（进程号 + 随机数，fork后重新生成）"""
+    return f"{os.getpid():x}{os.urandom(3).hex()}"
+
+
+_id_prefix = _new_id_prefix()
+_id_counter = itertools.count(1)
+
+
+def _reset_id_generator():
+    """fork后重置ID生成器，避免子进程与父进程产生相同的ID"""
+    global _id_prefix, _id_counter
+    _id_prefix = _new_id_prefix()
+    _id_counter = itertools.count(1)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_id_generator)
+
+
+def next_message_id() -> str:
+    """生成进程内单调递增的消息ID"""
+    return f"{_id_prefix}-{next(_id_counter):x}"
+
+
+def _value(item: Any) -> Any:
+    """枚举取值"""
+    return getattr(item, "value", item)
+
+
+class FastMessage:
+    """轻量A2A消息"""
+    
+    __slots__ = (
+        "message_id", "sender", "receiver", "timestamp_ns", "message_type", "action",
+        "data", "context", "priority", "timeout", "retry_count", "correlation_id", "tags"
+    )
+    
+    def __init__(
+        self,
+        sender: str,
+        receiver: str,
+        message_type: str,
+        action: str,
+        data: Optional[Dict[str, Any]] = None,
+        context: Optional[Dict[str, Any]] = None,
+        priority: str = "medium",
+        timeout: int = 30,
+        retry_count: int = 3,
+        correlation_id: Optional[str] = None,
+        tags: Optional[List[str]] = None,
+        message_id: Optional[str] = None,
+        timestamp_ns: Optional[int] = None
+    ):
+        """
+        创建消息（不做校验，调用方需保证字段合法）
+        
+        Args:
+            sender: 发送者Agent ID
+            receiver: 接收者Agent ID
+            message_type: 消息类型
+            action: 操作类型
+            data: 消息数据
+            context: 上下文信息
+            priority: 优先级
+            timeout: 超时时间(秒)
+            retry_count: 重试次数
+            correlation_id: 关联ID
+            tags: 消息标签
+            message_id: 消息ID（默认自动生成）
+            timestamp_ns: 创建时间(纳秒时间戳，默认当前时间)
+        """
+        self.message_id = message_id or next_message_id()
+        self.sender = sender
+        self.receiver = receiver
+        self.timestamp_ns = timestamp_ns or time.time_ns()
+        self.message_type = _value(message_type)
+        self.action = _value(action)
+        self.data = data if data is not None else {}
+        self.context = context if context is not None else {}
+        self.priority = _value(priority)
+        self.timeout = timeout
+        self.retry_count = retry_count
+        self.correlation_id = correlation_id
+        self.tags = tags if tags is not None else []
+    
+    @property
+    def timestamp(self) -> datetime:
+        """创建时间"""
+        return datetime.fromtimestamp(self.timestamp_ns / 1e9)
+    
+    def __repr__(self) -> str:
+        return (
+            f"FastMessage(id={self.message_id}, {self.sender} -> {self.receiver}, "
+            f"type={self.message_type}, action={self.action})"
+        )
+    
+    # ------------------------------------------------------------ 二进制编解码
+    
+    def encode(self) -> bytes:
+        """
+        编码为msgpack二进制
+        
+        Returns:
+            bytes: 首元素为线格式版本号的msgpack数组
+        """
+        return msgpack.packb(
+            [
+                SCHEMA_VERSION,
+                self.message_id,
+                self.sender,
+                self.receiver,
+                self.timestamp_ns,
+                self.message_type,
+                self.action,
+                self.data,
+                self.context,
+                self.priority,
+                self.timeout,
+                self.retry_count,
+                self.correlation_id,
+                self.tags
+            ],
+            use_bin_type=True
+        )
+    
+    @classmethod
+    def decode(cls, raw: bytes, validate: bool = True) -> "FastMessage":
+        """
+        从msgpack二进制解码
+        
+        Args:
+            raw: 二进制数据
+            validate: 是否按A2AMessage做完整校验（来自不可信来源时必须开启）
+        
+        Returns:
+            FastMessage: 解码后的消息
+        
+        Raises:
+            ValueError: 格式错误或版本不受支持
+        """
+        fields = msgpack.unpackb(raw, raw=False)
+        if not isinstance(fields, list) or not fields:
+            raise ValueError("无效的A2A消息格式")
+        version = fields[0]
+        expected = _FIELD_COUNTS.get(version)
+        if expected is None:
+            raise ValueError(f"不支持的A2A消息版本: {version}")
+        if len(fields) < expected:
+            raise ValueError(f"A2A消息字段缺失: 需要{expected}个，实际{len(fields)}个")
+        
+        message = cls(
+            message_id=fields[1],
+            sender=fields[2],
+            receiver=fields[3],
+            timestamp_ns=fields[4],
+            message_type=fields[5],
+            action=fields[6],
+            data=fields[7],
+            context=fields[8],
+            priority=fields[9],
+            timeout=fields[10],
+            retry_count=fields[11],
+            correlation_id=fields[12],
+            tags=fields[13]
+        )
+        if validate:
+            message.to_model()
+        return message
+    
+    # ------------------------------------------------------------ 与pydantic模型互转
+    
+    def to_model(self) -> A2AMessage:
+        """
+        转换为A2AMessage（完整校验）
+        
+        Returns:
+            A2AMessage: pydantic消息模型
+        
+        Raises:
+            pydantic.ValidationError: 字段不合法
+        """
+        return A2AMessage(
+            message_id=self.message_id,
+            sender=self.sender,
+            receiver=self.receiver,
+            timestamp=self.timestamp,
+            message_type=MessageType(self.message_type),
+            payload=A2AMessagePayload(
+                action=ActionType(self.action),
+                data=self.data,
+                context=self.context
+            ),
+            metadata=A2AMessageMetadata(
+                priority=Priority(self.priority),
+                timeout=self.timeout,
+                retry_count=self.retry_count,
+                correlation_id=self.correlation_id,
+                tags=self.tags
+            )
+        )
+    
+    @classmethod
+    def from_model(cls, message: A2AMessage) -> "FastMessage":
+        """
+        从A2AMessage创建
+        
+        Args:
+            message: pydantic消息模型
+        
+        Returns:
+            FastMessage: 轻量消息
+        """
+        return cls(
+            message_id=message.message_id,
+            sender=message.sender,
+            receiver=message.receiver,
+            timestamp_ns=int(message.timestamp.timestamp() * 1e9),
+            message_type=message.message_type,
+            action=message.payload.action,
+            data=message.payload.data,
+            context=message.payload.context,
+            priority=message.metadata.priority,
+            timeout=message.metadata.timeout,
+            retry_count=message.metadata.retry_count,
+            correlation_id=message.metadata.correlation_id,
+            tags=list(message.metadata.tags)
+        )
@@ -0,0 +1,103 @@
+"""生产环境启动器
+
+主进程预加载应用（导入全部模块、创建AgentManager并编译工作流图）后再fork出worker，
+只读的代码和对象由各worker以写时复制方式共享，而不是每个worker各自导入和构建一遍。
+预加载完成后执行 gc.freeze()，把已有对象移出GC追踪，worker中的垃圾回收不会写脏这些共享页面。
+
+每个worker在ASGI启动阶段完成预热后才开始接收请求（见 whereeatai.api.main）。
+"""
+from typing import Any, Dict, Optional
+import gc
+import logging
+
+from gunicorn.app.base import BaseApplication
+
+from whereeatai.config import (
+    API_HOST,
+    API_PORT,
+    API_WORKERS,
+    API_WORKER_TIMEOUT,
+    API_GRACEFUL_TIMEOUT,
+    LOG_LEVEL
+)
+
+logger = logging.getLogger(__name__)
+
+
+def post_fork(server, worker):
+    """worker fork后的钩子（连接池、日志线程等进程级状态由各模块的 register_at_fork 重置）"""
+    logger.info(f"Worker已启动: pid={worker.pid}")
+
+
+def worker_exit(server, worker):
+    """worker退出钩子"""
+    logger.info(f"Worker已退出: pid={worker.pid}")
+
+
+class PreloadedApplication(BaseApplication):
+    """在主进程中预加载ASGI应用的gunicorn应用"""
+    
+    def __init__(self, app_path: str = "whereeatai.api.main:app", options: Optional[Dict[str, Any]] = None):
+        """
+        初始化启动器
+        
+        Args:
+            app_path: 应用路径，格式为 模块:属性
+            options: gunicorn配置项
+        """
+        self.app_path = app_path
+        self.options = options or {}
+        super().__init__()
+    
+    def load_config(self):
+        """写入gunicorn配置"""
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+    
+    def load(self):
+        """导入应用（preload_app时在主进程中执行一次）"""
+        import importlib
+        
+        module_name, attr = self.app_path.split(":", 1)
+        app = getattr(importlib.import_module(module_name), attr)
+        gc.collect()
+        gc.freeze()
+        logger.info(f"应用预加载完成，已冻结 {gc.get_freeze_count()} 个对象")
+        return app
+
+
+def build_options(workers: int = API_WORKERS) -> Dict[str, Any]:
+    """
+    生成gunicorn配置
+    
+    Args:
+        workers: worker进程数
+    
+    Returns:
+        Dict[str, Any]: gunicorn配置项
+    """
+    return {
+        "bind": f"{API_HOST}:{API_PORT}",
+        "workers": workers,
+        "worker_class": "uvicorn.workers.UvicornWorker",
+        "preload_app": True,
+        "timeout": API_WORKER_TIMEOUT,
+        "graceful_timeout": API_GRACEFUL_TIMEOUT,
+        "keepalive": 5,
+        "loglevel": LOG_LEVEL.lower(),
+        # 请求日志由请求日志中间件记录
+        "accesslog": None,
+        "post_fork": post_fork,
+        "worker_exit": worker_exit
+    }
+
+
+def run_server(workers: int = API_WORKERS):
+    """
+    以预加载模式启动API服务
+    
+    Args:
+        workers: worker进程数
+    """
+    PreloadedApplication(options=build_options(workers)).run()
@@ -0,0 +1 @@
+"""本地桩模型模块，用于无网络的压测和延迟测试"""
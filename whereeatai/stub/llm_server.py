@@ -0,0 +1,288 @@
+"""OpenAI兼容的本地桩模型服务，用于无网络的压测和延迟测试
+
+启动:
+    python -m whereeatai.stub.llm_server --port 9000 --latency-ms 800 --tokens-per-second 40
+
+然后将 BASE_URL 指向 http://127.0.0.1:9000/v1 即可让WhereEatAI使用桩模型。
+"""
+from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import json
+import math
+import random
+import threading
+import time
+import uuid
+import logging
+
+from whereeatai.stub.responses import canned_tokens, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class StubConfig(BaseModel):
+    """桩模型行为配置"""
+    latency_dist: str = Field(default="fixed", description="首token延迟分布: fixed/uniform/normal/lognormal/exponential")
+    latency_ms: float = Field(default=0.0, ge=0.0, description="首token延迟均值(毫秒)")
+    latency_jitter_ms: float = Field(default=0.0, ge=0.0, description="延迟抖动：uniform为半宽，normal/lognormal为标准差")
+    tokens_per_second: float = Field(default=0.0, ge=0.0, description="输出速度，0表示瞬时输出")
+    length_scale: float = Field(default=1.0, gt=0.0, description="输出长度缩放系数")
+    error_rate: float = Field(default=0.0, ge=0.0, le=1.0, description="500错误注入比例")
+    rate_limit_rate: float = Field(default=0.0, ge=0.0, le=1.0, description="429错误注入比例")
+    max_concurrency: int = Field(default=0, ge=0, description="并发上限，超出返回429，0表示不限")
+    seed: int = Field(default=42, description="随机种子（用于延迟和错误注入）")
+
+
+class StubState:
+    """桩模型运行状态：随机数生成器、并发数和请求统计"""
+    
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.stats: Dict[str, int] = {
+            "requests": 0,
+            "completed": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "prompt_tokens": 0,
+            "completion_tokens": 0
+        }
+        self.agent_requests: Dict[str, int] = {}
+    
+    def reconfigure(self, config: StubConfig):
+        """更新配置并重置随机数生成器"""
+        with self.lock:
+            self.config = config
+            self.rng = random.Random(config.seed)
+    
+    def sample_latency(self) -> float:
+        """按配置的分布采样首token延迟(秒)"""
+        cfg = self.config
+        mean = cfg.latency_ms
+        jitter = cfg.latency_jitter_ms
+        with self.lock:
+            if cfg.latency_dist == "uniform":
+                value = self.rng.uniform(mean - jitter, mean + jitter)
+            elif cfg.latency_dist == "normal":
+                value = self.rng.gauss(mean, jitter)
+            elif cfg.latency_dist == "lognormal" and mean > 0:
+                # 按给定均值和标准差换算对数正态分布参数
+                sigma2 = math.log(1 + (jitter / mean) ** 2)
+                value = self.rng.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+            elif cfg.latency_dist == "exponential" and mean > 0:
+                value = self.rng.expovariate(1.0 / mean)
+            else:
+                value = mean
+        return max(0.0, value) / 1000.0
+    
+    def inject_fault(self) -> Optional[int]:
+        """按注入比例决定是否返回错误，返回状态码或None"""
+        cfg = self.config
+        with self.lock:
+            roll = self.rng.random()
+        if roll < cfg.rate_limit_rate:
+            return 429
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            return 500
+        return None
+
+
+def _error_response(status_code: int, message: str, error_type: str) -> JSONResponse:
+    """构造OpenAI格式的错误响应"""
+    headers = {"Retry-After": "1"} if status_code == 429 else None
+    return JSONResponse(
+        status_code=status_code,
+        content={"error": {"message": message, "type": error_type, "code": status_code}},
+        headers=headers
+    )
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    """拼接消息内容作为提示词"""
+    parts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = "".join(c.get("text", "") for c in content if isinstance(c, dict))
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+def create_app(config: Optional[StubConfig] = None) -> FastAPI:
+    """
+    创建桩模型服务应用
+    
+    Args:
+        config: 桩模型配置
+    
+    Returns:
+        FastAPI: 应用实例
+    """
+    state = StubState(config or StubConfig())
+    app = FastAPI(title="WhereEatAI Stub LLM", docs_url=None, redoc_url=None)
+    app.state.stub = state
+    
+    @app.get("/v1/models")
+    async def list_models():
+        """模型列表"""
+        return {"object": "list", "data": [{"id": "stub", "object": "model", "owned_by": "whereeatai"}]}
+    
+    @app.get("/stub/stats")
+    async def stats():
+        """请求统计"""
+        return {
+            "config": state.config.model_dump(),
+            "in_flight": state.in_flight,
+            "stats": state.stats,
+            "agents": state.agent_requests
+        }
+    
+    @app.put("/stub/config")
+    async def update_config(config: StubConfig):
+        """运行时更新桩模型配置"""
+        state.reconfigure(config)
+        return {"status": "success", "config": config.model_dump()}
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        """OpenAI兼容的对话补全接口，支持stream"""
+        body = await request.json()
+        model = body.get("model", "stub")
+        max_tokens = int(body.get("max_tokens") or body.get("max_completion_tokens") or 4096)
+        stream = bool(body.get("stream"))
+        prompt = _prompt_text(body.get("messages", []))
+        
+        with state.lock:
+            state.stats["requests"] += 1
+            saturated = state.config.max_concurrency and state.in_flight >= state.config.max_concurrency
+        
+        fault = 429 if saturated else state.inject_fault()
+        if fault == 429:
+            with state.lock:
+                state.stats["rate_limited"] += 1
+            return _error_response(429, "Rate limit exceeded (stub)", "rate_limit_error")
+        if fault == 500:
+            with state.lock:
+                state.stats["errors"] += 1
+            return _error_response(500, "Internal error (stub)", "server_error")
+        
+        agent, pieces = canned_tokens(prompt, max_tokens, state.config.length_scale)
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = len(pieces)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        first_token_delay = state.sample_latency()
+        tps = state.config.tokens_per_second
+        
+        with state.lock:
+            state.in_flight += 1
+            state.agent_requests[agent] = state.agent_requests.get(agent, 0) + 1
+        
+        def finish():
+            with state.lock:
+                state.in_flight -= 1
+                state.stats["completed"] += 1
+                state.stats["prompt_tokens"] += prompt_tokens
+                state.stats["completion_tokens"] += completion_tokens
+        
+        if not stream:
+            try:
+                delay = first_token_delay + (completion_tokens / tps if tps else 0.0)
+                if delay:
+                    await asyncio.sleep(delay)
+            finally:
+                finish()
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+        
+        async def event_stream():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, with_usage: bool = False) -> str:
+                data = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+                if with_usage:
+                    data["usage"] = usage
+                return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+            
+            try:
+                if first_token_delay:
+                    await asyncio.sleep(first_token_delay)
+                yield chunk({"role": "assistant", "content": ""})
+                # 每批输出若干token，避免逐token调度开销过大
+                batch = max(1, int(tps / 20)) if tps else len(pieces)
+                for i in range(0, len(pieces), batch):
+                    yield chunk({"content": "".join(pieces[i:i + batch])})
+                    if tps:
+                        await asyncio.sleep(min(batch, len(pieces) - i) / tps)
+                include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+                yield chunk({}, finish_reason="stop", with_usage=include_usage)
+                yield "data: [DONE]\n\n"
+            finally:
+                finish()
+        
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+    
+    return app
+
+
+def main():
+    """命令行启动桩模型服务"""
+    import uvicorn
+    
+    parser = argparse.ArgumentParser(description="WhereEatAI OpenAI兼容桩模型服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-dist", default="fixed",
+                        choices=["fixed", "uniform", "normal", "lognormal", "exponential"])
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--latency-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--length-scale", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    
+    config = StubConfig(
+        latency_dist=args.latency_dist,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        tokens_per_second=args.tokens_per_second,
+        length_scale=args.length_scale,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed
+    )
+    logger.info(f"启动桩模型服务: http://{args.host}:{args.port}/v1")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
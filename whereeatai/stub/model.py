@@ -0,0 +1,52 @@
+"""进程内桩模型，可替换QwenModel用于测量框架自身开销"""
+from typing import Dict, List, Optional, Tuple
+import time
+
+from whereeatai.stub.responses import canned_tokens, estimate_tokens
+
+
+class StubModel:
+    """与QwenModel接口一致的进程内桩模型，返回确定性的预置响应"""
+    
+    def __init__(self, route: Optional[str] = None, latency: float = 0.0, length_scale: float = 1.0,
+                 tokens_per_second: float = 0.0):
+        """
+        初始化桩模型
+        
+        Args:
+            route: 模型路由名称（仅用于保持接口一致）
+            latency: 每次调用的模拟延迟(秒)，0表示无延迟
+            length_scale: 输出长度缩放系数
+            tokens_per_second: 模拟的输出速度，0表示瞬时输出（模拟延迟随输出长度增长）
+        """
+        self.route = route
+        self.latency = latency
+        self.length_scale = length_scale
+        self.tokens_per_second = tokens_per_second
+    
+    def generate(self, prompt: str, system_prompt: Optional[str] = None) -> str:
+        """生成预置响应"""
+        content, _ = self.generate_with_usage(prompt, system_prompt)
+        return content
+    
+    def generate_with_usage(self, prompt: str, system_prompt: Optional[str] = None) -> Tuple[str, Dict[str, int]]:
+        """生成预置响应并返回估算的token用量"""
+        full_prompt = f"{system_prompt}\n{prompt}" if system_prompt else prompt
+        _, pieces = canned_tokens(full_prompt, length_scale=self.length_scale)
+        delay = self.latency + (len(pieces) / self.tokens_per_second if self.tokens_per_second else 0.0)
+        if delay:
+            time.sleep(delay)
+        input_tokens = estimate_tokens(full_prompt)
+        return "".join(pieces), {
+            "input_tokens": input_tokens,
+            "output_tokens": len(pieces),
+            "total_tokens": input_tokens + len(pieces)
+        }
+    
+    def generate_from_messages(
+        self,
+        history: List[Dict[str, str]],
+        system_prompt: Optional[str] = None
+    ) -> Tuple[str, Dict[str, int]]:
+        """基于多轮对话生成预置响应（各条消息按顺序拼接为一个提示词）"""
+        return self.generate_with_usage("\n".join(message.get("content", "") for message in history), system_prompt)
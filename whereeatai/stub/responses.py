@@ -0,0 +1,150 @@
+"""桩模型的确定性预置响应，按提示词识别Agent并生成固定长度的内容"""
+from typing import Dict, List, Tuple
+import hashlib
+import random
+import re
+
+# 提示词特征 -> Agent（按顺序匹配，先匹配更具体的特征）
+AGENT_SIGNATURES: List[Tuple[str, str]] = [
+    ("滚动摘要", "session_summary"),
+    ("旅行规划助手", "conversation"),
+    ("===游记===", "fast_travel_plan"),
+    ("全程通用", "closing_section"),
+    ("只写", "day_section"),
+    ("逐日大纲", "outline"),
+    ("小红书笔记内容", "xiaohongshu"),
+    ("分析以下视频内容", "video"),
+    ("价格比价", "price_comparison"),
+    ("专题推荐", "topic_recommendation"),
+    ("完整的旅行计划", "travel_plan"),
+    ("动态行程规划", "itinerary"),
+    ("游记", "travelogue"),
+    ("美食", "food_recommendation"),
+]
+
+# 各Agent响应的默认输出token数
+DEFAULT_OUTPUT_TOKENS: Dict[str, int] = {
+    "travelogue": 900,
+    "itinerary": 800,
+    "food_recommendation": 500,
+    "price_comparison": 400,
+    "xiaohongshu": 400,
+    "video": 400,
+    "topic_recommendation": 600,
+    "travel_plan": 1200,
+    "fast_travel_plan": 1600,
+    "outline": 8,
+    "day_section": 270,
+    "closing_section": 250,
+    "conversation": 250,
+    "session_summary": 150,
+    "generic": 300,
+}
+
+# 输出长度随行程天数增长的Agent（默认长度对应3天的行程，大纲为每天的长度）
+DAY_SCALED_AGENTS = {"itinerary", "travelogue", "travel_plan"}
+BASE_DAYS = 3
+
+# 各Agent的预置语句
+CANNED_SENTENCES: Dict[str, List[str]] = {
+    "travelogue": ["清晨漫步古城墙，", "午后走进博物馆，", "夜晚品尝街边小吃，", "沿途风景令人难忘。"],
+    "itinerary": ["第1天上午参观景点，", "中午品尝当地特色，", "下午安排自由活动，", "晚上入住市中心酒店。"],
+    "food_recommendation": ["推荐老字号餐厅，", "招牌菜值得一试，", "人均消费约80元，", "营业时间10:00-22:00。"],
+    "price_comparison": ["携程价格较低，", "美团有满减活动，", "飞猪含接送服务，", "建议对比后购买。"],
+    "xiaohongshu": ["笔记推荐了热门打卡点，", "价格信息较为准确，", "适合年轻游客，", "内容真实可信。"],
+    "video": ["视频展示了城市风光，", "推荐了多家餐厅，", "适合家庭出游，", "信息较为可靠。"],
+    "topic_recommendation": ["专题聚焦人文历史，", "推荐三处目的地，", "适合深度游爱好者，", "春秋两季最佳。"],
+    "travel_plan": ["行程概览清晰，", "每日安排合理，", "酒店位于交通枢纽，", "预算明细透明。"],
+    "outline": ["古城历史文化之旅", "博物馆与老街漫步", "郊外山水一日游", "特色美食探店"],
+    "day_section": ["上午参观景点，", "中午品尝当地特色，", "下午安排自由活动，", "晚上逛夜市。"],
+    "closing_section": ["住宿推荐市中心，", "地铁出行便利，", "预算留出弹性，", "注意天气变化。"],
+    "conversation": ["好的，已按您的要求调整，", "第二天改为博物馆参观，", "晚餐安排在老街，", "还需要调整其他安排吗？"],
+    "session_summary": ["用户计划前往西安，", "偏好历史文化和美食，", "已确定前两天行程，", "预算中等。"],
+    "generic": ["这是桩模型的响应，", "内容仅用于测试。"],
+}
+
+FAST_PLAN_SECTIONS = [
+    ("游记", "travelogue"),
+    ("行程规划", "itinerary"),
+    ("美食推荐", "food_recommendation"),
+    ("价格比价", "price_comparison"),
+]
+
+
+def detect_agent(prompt: str) -> str:
+    """
+    根据提示词识别调用方Agent
+    
+    Args:
+        prompt: 提示词
+    
+    Returns:
+        Agent名称，无法识别时返回generic
+    """
+    for signature, agent in AGENT_SIGNATURES:
+        if signature in prompt:
+            return agent
+    return "generic"
+
+
+def prompt_days(prompt: str) -> int:
+    """从提示词中识别行程天数（如 "7天"、"输出7行"），无法识别时返回0"""
+    match = re.search(r"输出(\d+)行", prompt) or re.search(r"(\d+)\s*天", prompt)
+    return int(match.group(1)) if match else 0
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数（中文约1.5字符/token）"""
+    return max(1, int(len(text) / 1.5))
+
+
+def _pieces(agent: str, count: int, rng: random.Random) -> List[str]:
+    """生成指定数量的token片段（每个片段计为一个token）"""
+    sentences = CANNED_SENTENCES.get(agent, CANNED_SENTENCES["generic"])
+    pieces: List[str] = []
+    while len(pieces) < count:
+        sentence = sentences[rng.randrange(len(sentences))]
+        pieces.extend(sentence[i:i + 2] for i in range(0, len(sentence), 2))
+    return pieces[:count]
+
+
+def canned_tokens(prompt: str, max_tokens: int = 4096, length_scale: float = 1.0) -> Tuple[str, List[str]]:
+    """
+    生成确定性的预置响应（相同提示词总是得到相同响应）
+    
+    Args:
+        prompt: 提示词
+        max_tokens: 最大输出token数
+        length_scale: 输出长度缩放系数
+    
+    Returns:
+        Agent名称和响应token片段列表
+    """
+    agent = detect_agent(prompt)
+    seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+    rng = random.Random(seed)
+    target = max(1, min(max_tokens, int(DEFAULT_OUTPUT_TOKENS.get(agent, 300) * length_scale)))
+    days = prompt_days(prompt)
+    
+    if agent == "outline":
+        # 分段生成的逐日大纲，每行一天
+        pieces = []
+        for day in range(1, max(1, days) + 1):
+            pieces.append(f"第{day}天：")
+            pieces.extend(_pieces(agent, target, rng))
+            pieces.append("\n")
+        return agent, pieces[:max_tokens]
+    if agent in DAY_SCALED_AGENTS and days:
+        target = max(1, min(max_tokens, target * days // BASE_DAYS))
+    
+    if agent != "fast_travel_plan":
+        return agent, _pieces(agent, target, rng)
+    
+    # 快速模式按分段标记输出四个部分
+    pieces: List[str] = []
+    per_section = max(1, target // len(FAST_PLAN_SECTIONS))
+    for marker, section_agent in FAST_PLAN_SECTIONS:
+        pieces.append(f"==={marker}===\n")
+        pieces.extend(_pieces(section_agent, per_section, rng))
+        pieces.append("\n\n")
+    return agent, pieces
@@ -0,0 +1,430 @@
+"""响应缓存：按请求缓存预编码的JSON响应体
+
+缓存命中时直接返回已编码（以及已压缩）的字节，不再构造Python对象和重新序列化；
+响应带强ETag，客户端携带匹配的 If-None-Match 时返回 304。
+
+条目超过ttl（软过期）后，在hard_ttl内仍立即返回，同时由一个后台任务重新生成；
+后台刷新通过SQLite租约在所有worker间去重。超过hard_ttl的请求同步重新生成。
+"""
+from typing import Any, Dict, Optional, Tuple
+from collections import OrderedDict
+from contextlib import closing
+from hashlib import blake2b
+import gzip
+import os
+import sqlite3
+import threading
+import time
+import orjson
+import logging
+
+from starlette.responses import Response
+
+from whereeatai.config import (
+    CACHE_TTL,
+    CACHE_HARD_TTL,
+    CACHE_STALE_TTL,
+    CACHE_REFRESH_LEASE,
+    CACHE_LEASE_DB_PATH,
+    CACHE_MAX_ENTRIES,
+    CACHE_COMPRESS_MIN_BYTES
+)
+from whereeatai.utils.metrics import RESPONSE_CACHE_REQUESTS
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """预编码的响应体"""
+    
+    __slots__ = ("body", "gzip_body", "etag", "created_at", "expires_at", "revalidate_until")
+    
+    def __init__(self, body: bytes, gzip_body: Optional[bytes], etag: str, created_at: float):
+        self.body = body
+        self.gzip_body = gzip_body
+        self.etag = etag
+        self.created_at = created_at
+        self.expires_at = created_at
+        self.revalidate_until = created_at
+    
+    @property
+    def fresh(self) -> bool:
+        """是否未过期"""
+        return time.time() < self.expires_at
+    
+    @property
+    def revalidatable(self) -> bool:
+        """是否可以先返回再后台刷新（未超过硬过期时间）"""
+        return time.time() < self.revalidate_until
+    
+    @property
+    def size(self) -> int:
+        """占用字节数"""
+        return len(self.body) + len(self.gzip_body or b"")
+
+
+def encode_response(content: Any, compress_min_bytes: int = CACHE_COMPRESS_MIN_BYTES) -> CachedResponse:
+    """
+    将响应内容编码为JSON字节，并为大响应预先压缩
+    
+    Args:
+        content: 响应内容
+        compress_min_bytes: 达到该大小才预先gzip压缩
+    
+    Returns:
+        CachedResponse: 预编码的响应体
+    """
+    body = orjson.dumps(content, default=str)
+    gzip_body = None
+    if len(body) >= compress_min_bytes:
+        compressed = gzip.compress(body, compresslevel=6, mtime=0)
+        # 压缩收益太小时不使用
+        if len(compressed) < len(body) * 0.9:
+            gzip_body = compressed
+    etag = f'"{blake2b(body, digest_size=16).hexdigest()}"'
+    return CachedResponse(body, gzip_body, etag, time.time())
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """按弱比较规则判断 If-None-Match 是否匹配"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    """按 Accept-Encoding 的q值判断客户端是否接受gzip（q=0表示拒绝）"""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    
+    if "gzip" in qualities:
+        return qualities["gzip"] > 0
+    return qualities.get("*", 0.0) > 0
+
+
+def build_response(
+    entry: CachedResponse,
+    if_none_match: str = "",
+    accept_encoding: str = "",
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    根据条件请求和压缩协商构造响应
+    
+    Args:
+        entry: 预编码的响应体
+        if_none_match: 请求头 If-None-Match
+        accept_encoding: 请求头 Accept-Encoding
+        headers: 额外响应头
+    
+    Returns:
+        Response: 304或200响应
+    """
+    response_headers = {"ETag": entry.etag, "Vary": "Accept-Encoding"}
+    if headers:
+        response_headers.update(headers)
+    
+    if _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=response_headers)
+    
+    body = entry.body
+    if entry.gzip_body is not None and _accepts_gzip(accept_encoding):
+        body = entry.gzip_body
+        response_headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=response_headers)
+
+
+class ResponseCache:
+    """
+    进程内LRU响应缓存
+    
+    软过期（ttl）后、硬过期（hard_ttl）前的条目照常返回，由调用方在后台刷新；
+    过期条目在stale_ttl内继续保留，过载降级时可作为旧结果返回。
+    """
+    
+    def __init__(
+        self,
+        ttl: int = CACHE_TTL,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        stale_ttl: int = CACHE_STALE_TTL,
+        hard_ttl: int = CACHE_HARD_TTL
+    ):
+        """
+        初始化响应缓存
+        
+        Args:
+            ttl: 缓存过期时间(秒)
+            max_entries: 最大缓存条数，超出后淘汰最久未使用的条目
+            stale_ttl: 过期后继续保留的时间(秒)
+            hard_ttl: 从生成起可以先返回再后台刷新的时间(秒)，不小于ttl
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stale_ttl = stale_ttl
+        self.hard_ttl = hard_ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.revalidate_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(name: str, input_data: Dict[str, Any]) -> str:
+        """
+        生成规范化的缓存键（输入按键排序后编码，字段顺序不影响命中）
+        
+        Args:
+            name: 缓存命名空间，如 agent:itinerary
+            input_data: 请求输入
+        
+        Returns:
+            str: 缓存键
+        """
+        digest = blake2b(orjson.dumps(input_data, option=orjson.OPT_SORT_KEYS, default=str), digest_size=16)
+        return f"{name}:{digest.hexdigest()}"
+    
+    def get(self, key: str, allow_stale: bool = False) -> Optional[CachedResponse]:
+        """
+        获取缓存
+        
+        软过期但未硬过期的条目也会返回，调用方通过 entry.fresh 判断是否需要后台刷新。
+        
+        Args:
+            key: 缓存键
+            allow_stale: 是否接受已硬过期（仍在stale_ttl内）的条目
+        
+        Returns:
+            CachedResponse: 缓存的响应体，未命中或不可用返回None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry.expires_at:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                RESPONSE_CACHE_REQUESTS.labels(result="hit").inc()
+                return entry
+            if entry is not None and now < entry.revalidate_until:
+                self._entries.move_to_end(key)
+                self.revalidate_hits += 1
+                RESPONSE_CACHE_REQUESTS.labels(result="revalidate").inc()
+                return entry
+            if entry is not None and now < max(entry.expires_at + self.stale_ttl, entry.revalidate_until):
+                if allow_stale:
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    RESPONSE_CACHE_REQUESTS.labels(result="stale").inc()
+                    return entry
+            elif entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            RESPONSE_CACHE_REQUESTS.labels(result="miss").inc()
+            return None
+    
+    def put(self, key: str, entry: CachedResponse, ttl: Optional[int] = None):
+        """
+        写入缓存
+        
+        Args:
+            key: 缓存键
+            entry: 预编码的响应体
+            ttl: 本条目的过期时间(秒)，默认使用缓存的ttl
+        """
+        entry.expires_at = entry.created_at + (self.ttl if ttl is None else ttl)
+        entry.revalidate_until = max(entry.expires_at, entry.created_at + self.hard_ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def contains(self, key: str) -> bool:
+        """是否有未过期的条目（不计入命中统计，也不改变淘汰顺序）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and time.time() < entry.expires_at
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(e.size for e in self._entries.values()),
+                "hits": self.hits,
+                "revalidate_hits": self.revalidate_hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses
+            }
+
+
+class RefreshLeases(SQLiteStore):
+    """
+    基于SQLite的后台刷新租约
+    
+    每个worker有自己的进程内缓存，同一条目会在各worker中先后软过期。租约保证同一时间只有一个worker
+    重新生成；持有者释放租约时把编码后的新结果发布到租约记录中，其他worker随后刷新时直接读取，
+    不再调用LLM。
+    """
+    
+    purge_label = "刷新租约"
+    
+    def __init__(self, db_path: str = CACHE_LEASE_DB_PATH, lease_ttl: int = CACHE_REFRESH_LEASE, purge_interval: int = 3600):
+        """
+        初始化租约存储
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            lease_ttl: 租约有效期(秒)，持有者异常退出后租约到期自动释放
+            purge_interval: 两次清理之间的最小间隔(秒)
+        """
+        self.lease_ttl = lease_ttl
+        super().__init__(db_path, purge_interval)
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表（兼容旧表结构，补充发布结果的字段）"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS refresh_leases (
+                key TEXT PRIMARY KEY,
+                holder TEXT,
+                lease_until REAL NOT NULL DEFAULT 0,
+                refreshed_at REAL,
+                body BLOB,
+                gzip_body BLOB,
+                etag TEXT
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(refresh_leases)")}
+        for column, column_type in (("body", "BLOB"), ("gzip_body", "BLOB"), ("etag", "TEXT")):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE refresh_leases ADD COLUMN {column} {column_type}")
+    
+    def acquire(self, key: str, created_at: float) -> Tuple[bool, Optional[CachedResponse]]:
+        """
+        获取刷新租约
+        
+        Args:
+            key: 缓存键
+            created_at: 本worker中该条目的生成时间
+        
+        Returns:
+            Tuple[bool, Optional[CachedResponse]]: (是否取得租约并需要重新生成, 其他worker发布的结果)。
+            (False, None)表示其他worker正在刷新；(False, 条目)表示其他worker在该条目生成之后已刷新过，
+            直接使用发布的结果；(True, None)表示需要重新生成，完成后调用release发布
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT lease_until, refreshed_at, body, gzip_body, etag FROM refresh_leases WHERE key = ?",
+                    (key,)
+                ).fetchone()
+                if row and row[0] > now:
+                    conn.execute("ROLLBACK")
+                    return False, None
+                if row and row[1] and row[1] > created_at and row[2] is not None:
+                    conn.execute("ROLLBACK")
+                    return False, CachedResponse(row[2], row[3], row[4], row[1])
+                conn.execute(
+                    "INSERT INTO refresh_leases (key, holder, lease_until) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET holder = excluded.holder, lease_until = excluded.lease_until",
+                    (key, str(os.getpid()), now + self.lease_ttl)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self.maybe_purge(now)
+        return True, None
+    
+    def release(self, key: str, entry: Optional[CachedResponse] = None):
+        """
+        释放刷新租约
+        
+        Args:
+            key: 缓存键
+            entry: 新生成的条目，发布给其他worker（生成失败时为None，保留之前发布的结果）
+        """
+        with closing(self._connect()) as conn:
+            if entry is None:
+                conn.execute(
+                    "UPDATE refresh_leases SET lease_until = 0 WHERE key = ? AND holder = ?",
+                    (key, str(os.getpid()))
+                )
+                return
+            # refreshed_at即发布条目的生成时间：生成时间不晚于它的条目才会读取发布的结果
+            conn.execute(
+                "UPDATE refresh_leases SET lease_until = 0, refreshed_at = ?, body = ?, gzip_body = ?, etag = ? "
+                "WHERE key = ? AND holder = ?",
+                (entry.created_at, entry.body, entry.gzip_body, entry.etag, key, str(os.getpid()))
+            )
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        删除未被持有且一天内没有刷新的记录
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的记录数
+        """
+        now = now or time.time()
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "DELETE FROM refresh_leases WHERE lease_until < ? AND COALESCE(refreshed_at, 0) < ?",
+                (now, now - 86400)
+            ).rowcount
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
+
+# 全局刷新租约实例（延迟创建）
+_refresh_leases: Optional[RefreshLeases] = None
+_refresh_leases_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存实例"""
+    return response_cache
+
+
+def get_refresh_leases() -> RefreshLeases:
+    """获取全局刷新租约实例"""
+    global _refresh_leases
+    if _refresh_leases is None:
+        with _refresh_leases_lock:
+            if _refresh_leases is None:
+                _refresh_leases = RefreshLeases()
+    return _refresh_leases
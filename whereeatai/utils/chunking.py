@@ -0,0 +1,145 @@
+"""长文本分块分析（map-reduce）
+
+超长的笔记或视频文稿整段放进一个提示词既慢又可能超出上下文窗口。分块分析先按段落、换行、句子、
+分句的顺序在语义边界处切分（各块长度尽量均衡），各块并发分析（map），再把各块的分析结果合并为
+一份完整分析（reduce）。各块并发执行，总耗时取决于单块的分析耗时而不是全文长度。
+"""
+from typing import Callable, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+import math
+import re
+import logging
+
+from whereeatai.config import (
+    CHUNKED_ANALYSIS_THRESHOLD,
+    CHUNKED_ANALYSIS_CHUNK_CHARS,
+    CHUNKED_ANALYSIS_CONCURRENCY
+)
+
+logger = logging.getLogger(__name__)
+
+# 语义边界，按优先级从高到低：段落、换行、句末标点、分句标点、空白（分隔符保留在前一段末尾）
+_BOUNDARIES = [
+    re.compile(r"(?<=\n\n)"),
+    re.compile(r"(?<=\n)"),
+    re.compile(r"(?<=[。！？!?…])"),
+    re.compile(r"(?<=[；;，,、：:])"),
+    re.compile(r"(?<=\s)")
+]
+
+
+def needs_chunking(text: str, threshold: int = CHUNKED_ANALYSIS_THRESHOLD) -> bool:
+    """文本是否超过分块分析的阈值"""
+    return threshold > 0 and len(text) > threshold
+
+
+def _split_pieces(text: str, max_chars: int, level: int = 0) -> List[str]:
+    """按语义边界把文本切成不超过max_chars的片段，找不到更细的边界时按长度硬切"""
+    if len(text) <= max_chars:
+        return [text]
+    if level >= len(_BOUNDARIES):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+    pieces = []
+    for piece in _BOUNDARIES[level].split(text):
+        if piece:
+            pieces.extend(_split_pieces(piece, max_chars, level + 1))
+    return pieces
+
+
+def split_text(text: str, max_chars: int = CHUNKED_ANALYSIS_CHUNK_CHARS) -> List[str]:
+    """
+    在语义边界处把长文本切分为长度均衡的块
+    
+    Args:
+        text: 文本
+        max_chars: 每块最大字符数
+    
+    Returns:
+        List[str]: 文本块
+    """
+    text = text.strip()
+    if len(text) <= max_chars:
+        return [text] if text else []
+    # 目标块长取全文平均，避免最后一块很短、其余块很长
+    target = math.ceil(len(text) / math.ceil(len(text) / max_chars))
+    chunks = []
+    current = ""
+    for piece in _split_pieces(text, max_chars):
+        if current and (len(current) + len(piece) > max_chars or len(current) >= target):
+            chunks.append(current.strip())
+            current = ""
+        current += piece
+    if current.strip():
+        chunks.append(current.strip())
+    return [chunk for chunk in chunks if chunk]
+
+
+def run_concurrently(generate: Callable[[str], str], prompts: List[str], concurrency: int) -> List[str]:
+    """
+    并发执行多个模型调用，结果顺序与提示词一致
+    
+    每个调用在复制的上下文中执行，保留当前请求的租户、优先级、截止时间和用量统计；
+    任一调用失败（包括上游过载）时取消未开始的调用并抛出异常。
+    """
+    if len(prompts) == 1:
+        return [generate(prompts[0])]
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(prompts))), thread_name_prefix="chunk") as executor:
+        futures = [executor.submit(contextvars.copy_context().run, generate, prompt) for prompt in prompts]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+
+def map_reduce(
+    generate: Callable[[str], str],
+    text: str,
+    map_prompt: Callable[[str, int, int], str],
+    reduce_prompt: Callable[[List[str], bool], str],
+    chunk_chars: int = CHUNKED_ANALYSIS_CHUNK_CHARS,
+    concurrency: int = CHUNKED_ANALYSIS_CONCURRENCY,
+    reduce_chars: Optional[int] = None
+) -> str:
+    """
+    分块分析长文本并合并结果
+    
+    各块的分析结果合计超过reduce_chars时先分组合并（各组并发），直到能放进一次最终合并。
+    
+    Args:
+        generate: 模型调用函数（提示词 -> 生成内容）
+        text: 长文本
+        map_prompt: 生成单块分析提示词的函数，参数为(文本块, 块序号(从1开始), 块总数)
+        reduce_prompt: 生成合并提示词的函数，参数为(各部分分析结果, 是否为最终合并)
+        chunk_chars: 每块最大字符数
+        concurrency: 同时分析的块数
+        reduce_chars: 一次合并的分析结果最大字符数，默认为分块阈值
+    
+    Returns:
+        str: 合并后的分析结果
+    """
+    chunks = split_text(text, chunk_chars)
+    reduce_chars = reduce_chars or max(CHUNKED_ANALYSIS_THRESHOLD, chunk_chars)
+    logger.info(f"分块分析: 全文{len(text)}字，切分为{len(chunks)}块，并发{concurrency}")
+    
+    partials = run_concurrently(
+        generate, [map_prompt(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, 1)], concurrency
+    )
+    while len(partials) > 1 and sum(len(partial) for partial in partials) > reduce_chars:
+        groups: List[List[str]] = [[]]
+        size = 0
+        for partial in partials:
+            if groups[-1] and size + len(partial) > reduce_chars:
+                groups.append([])
+                size = 0
+            groups[-1].append(partial)
+            size += len(partial)
+        if len(groups) == len(partials):
+            # 每组只有一个结果，继续分组无法缩短，直接做最终合并
+            break
+        merging = [group for group in groups if len(group) > 1]
+        merged = iter(run_concurrently(generate, [reduce_prompt(group, False) for group in merging], concurrency))
+        partials = [next(merged) if len(group) > 1 else group[0] for group in groups]
+    return generate(reduce_prompt(partials, True))
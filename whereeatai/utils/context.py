@@ -0,0 +1,72 @@
+"""请求上下文，基于contextvars在请求处理链路中传递请求级信息"""
+from typing import Iterator, Optional
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+# 当前请求的端点路径，用于按端点路由模型
+current_endpoint: ContextVar[str] = ContextVar("current_endpoint", default="")
+
+
+def get_current_endpoint() -> str:
+    """获取当前请求的端点路径"""
+    return current_endpoint.get()
+
+# 当前请求ID，由请求中间件设置，日志过滤器据此为每条日志附加请求ID
+current_request_id: ContextVar[str] = ContextVar("current_request_id", default="")
+
+
+def get_request_id() -> str:
+    """获取当前请求ID"""
+    return current_request_id.get()
+
+# 当前请求所属租户，由租户认证中间件设置，用于LLM公平调度和token配额计量
+current_tenant: ContextVar[str] = ContextVar("current_tenant", default="default")
+
+
+def get_current_tenant() -> str:
+    """获取当前请求所属租户"""
+    return current_tenant.get()
+
+# 当前请求的优先级（high/medium/low）和截止时间（time.monotonic()时刻），LLM调度器据此排序
+current_priority: ContextVar[str] = ContextVar("current_priority", default="medium")
+current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+def get_current_priority() -> str:
+    """获取当前请求的优先级"""
+    return current_priority.get()
+
+
+def get_current_deadline() -> Optional[float]:
+    """获取当前请求的截止时间（time.monotonic()时刻），未设置返回None"""
+    return current_deadline.get()
+
+# 当前请求采用的降级等级，由降级中间件在请求开始时设置，保证同一请求内各环节一致
+current_degradation: ContextVar[Optional[int]] = ContextVar("current_degradation", default=None)
+
+
+@contextmanager
+def scheduling(priority: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    在上下文内设置优先级和截止时间
+    
+    已有截止时间时取更早者，嵌套调用不会放宽上游给定的期限。
+    
+    Args:
+        priority: 优先级，None表示沿用当前值
+        timeout: 从现在起的剩余时间(秒)，None表示沿用当前截止时间
+    """
+    priority_token = current_priority.set(priority) if priority else None
+    deadline_token = None
+    if timeout is not None:
+        deadline = time.monotonic() + timeout
+        current = current_deadline.get()
+        deadline_token = current_deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        if deadline_token is not None:
+            current_deadline.reset(deadline_token)
+        if priority_token is not None:
+            current_priority.reset(priority_token)
@@ -0,0 +1,240 @@
+"""近似重复检测：文本SimHash指纹和分段LSH索引
+
+转发、小幅修改后的笔记与原笔记的SimHash只有少数位不同。64位指纹按bands段切分（各段宽度相差不超过1位），
+两个指纹的汉明距离不超过 bands-1 时至少有一段完全相同（抽屉原理），
+因此只需按段精确查找候选，再逐个计算汉明距离，无需与全部指纹比较。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+from collections import Counter
+from contextlib import closing
+from hashlib import blake2b
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+
+from whereeatai.config import (
+    NOTE_DEDUP_DB_PATH,
+    NOTE_DEDUP_BANDS,
+    NOTE_DEDUP_MAX_DISTANCE,
+    NOTE_DEDUP_TTL
+)
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+# 字符n-gram长度（中文没有空格分词，按字符切分）
+SHINGLE_SIZE = 3
+
+_NOISE = re.compile(r"[\W_]+", re.UNICODE)
+
+
+def _shingles(text: str) -> Counter:
+    """规范化文本（全半角统一、转小写、去掉空白标点和表情）后切分为字符n-gram"""
+    text = _NOISE.sub("", unicodedata.normalize("NFKC", text).lower())
+    if len(text) <= SHINGLE_SIZE:
+        return Counter([text]) if text else Counter()
+    return Counter(text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1))
+
+
+def simhash(text: str) -> int:
+    """
+    计算文本的64位SimHash指纹
+    
+    Args:
+        text: 文本
+    
+    Returns:
+        int: 无符号64位指纹
+    """
+    weights = [0] * FINGERPRINT_BITS
+    for shingle, count in _shingles(text).items():
+        value = int.from_bytes(blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            if value >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    """两个指纹的汉明距离"""
+    return bin(a ^ b).count("1")
+
+
+def band_values(fingerprint: int, bands: int) -> List[int]:
+    """把指纹切分为bands段，返回各段的值"""
+    values = []
+    offset = 0
+    for i in range(bands):
+        width = FINGERPRINT_BITS // bands + (1 if i < FINGERPRINT_BITS % bands else 0)
+        values.append(fingerprint >> offset & ((1 << width) - 1))
+        offset += width
+    return values
+
+
+def _to_signed(value: int) -> int:
+    """SQLite INTEGER为有符号64位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class FingerprintIndex(SQLiteStore):
+    """
+    基于SQLite的分段LSH指纹索引
+    
+    保存已分析内容的指纹和分析结果（zlib压缩），多个worker共享同一数据库文件。
+    """
+    
+    isolation_level = ""
+    purge_label = "过期内容指纹"
+    
+    def __init__(
+        self,
+        db_path: str = NOTE_DEDUP_DB_PATH,
+        bands: int = NOTE_DEDUP_BANDS,
+        max_distance: int = NOTE_DEDUP_MAX_DISTANCE,
+        ttl: int = NOTE_DEDUP_TTL,
+        purge_interval: int = 3600
+    ):
+        """
+        初始化指纹索引
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            bands: 指纹分段数；max_distance不超过bands-1时不会漏检，段数越多每段越短、候选越多
+            max_distance: 视为近似重复的最大汉明距离
+            ttl: 条目保留时间(秒)
+            purge_interval: 两次过期清理之间的最小间隔(秒)
+        """
+        if not 1 <= bands <= FINGERPRINT_BITS // 4:
+            raise ValueError(f"指纹分段数应在1到{FINGERPRINT_BITS // 4}之间: {bands}")
+        if max_distance >= bands:
+            logger.warning(f"最大汉明距离({max_distance})不小于分段数({bands})，部分近似重复可能漏检")
+        self.bands = bands
+        self.max_distance = max_distance
+        self.ttl = ttl
+        super().__init__(db_path, purge_interval)
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fingerprint INTEGER NOT NULL,
+                source_id TEXT,
+                result BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS fingerprint_bands (
+                band INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                entry_id INTEGER NOT NULL,
+                PRIMARY KEY (band, value, entry_id)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_fingerprints_created ON fingerprints(created_at)")
+    
+    def find(self, fingerprint: int) -> Optional[Tuple[Dict[str, Any], int, Optional[str]]]:
+        """
+        查找最相近的已分析内容
+        
+        Args:
+            fingerprint: 指纹
+        
+        Returns:
+            Tuple[Dict, int, Optional[str]]: (分析结果, 汉明距离, 原内容ID)，没有近似重复时返回None
+        """
+        bands = band_values(fingerprint, self.bands)
+        condition = " OR ".join(["(b.band = ? AND b.value = ?)"] * self.bands)
+        params: List[Any] = [value for band, band_value in enumerate(bands) for value in (band, band_value)]
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT f.id, f.fingerprint, f.source_id FROM fingerprint_bands b "
+                f"JOIN fingerprints f ON f.id = b.entry_id WHERE ({condition}) AND f.created_at >= ?",
+                params + [time.time() - self.ttl]
+            ).fetchall()
+            best = None
+            for entry_id, stored, source_id in rows:
+                distance = hamming_distance(fingerprint, stored & ((1 << 64) - 1))
+                if distance <= self.max_distance and (best is None or distance < best[1]):
+                    best = (entry_id, distance, source_id)
+            if best is None:
+                return None
+            blob = conn.execute("SELECT result FROM fingerprints WHERE id = ?", (best[0],)).fetchone()[0]
+        return self._decode(blob), best[1], best[2]
+    
+    def add(self, fingerprint: int, result: Dict[str, Any], source_id: Optional[str] = None) -> int:
+        """
+        保存已分析内容的指纹和结果
+        
+        Args:
+            fingerprint: 指纹
+            result: 分析结果
+            source_id: 内容ID（如笔记ID）
+        
+        Returns:
+            int: 条目ID
+        """
+        blob = self._encode(result)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            entry_id = conn.execute(
+                "INSERT INTO fingerprints (fingerprint, source_id, result, created_at) VALUES (?, ?, ?, ?)",
+                (_to_signed(fingerprint), source_id, blob, now)
+            ).lastrowid
+            conn.executemany(
+                "INSERT INTO fingerprint_bands (band, value, entry_id) VALUES (?, ?, ?)",
+                [(band, value, entry_id) for band, value in enumerate(band_values(fingerprint, self.bands))]
+            )
+        self.maybe_purge(now)
+        return entry_id
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理超过保留时间的条目
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的条目数
+        """
+        cutoff = (now or time.time()) - self.ttl
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "DELETE FROM fingerprint_bands WHERE entry_id IN (SELECT id FROM fingerprints WHERE created_at < ?)",
+                (cutoff,)
+            )
+            purged = conn.execute("DELETE FROM fingerprints WHERE created_at < ?", (cutoff,)).rowcount
+        if purged:
+            logger.info(f"清理过期内容指纹: {purged}条")
+        return purged
+
+
+# 全局笔记指纹索引实例（延迟创建）
+_note_index: Optional[FingerprintIndex] = None
+_note_index_lock = threading.Lock()
+
+
+def get_note_index() -> FingerprintIndex:
+    """获取全局笔记指纹索引实例"""
+    global _note_index
+    if _note_index is None:
+        with _note_index_lock:
+            if _note_index is None:
+                _note_index = FingerprintIndex()
+    return _note_index
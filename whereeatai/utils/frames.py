@@ -0,0 +1,281 @@
+"""视频帧预处理：去掉近似重复的帧，在token预算内选取时间分散、内容不同的帧
+
+客户端上传的视频帧常常是同一镜头连续截取的几十帧，原样写入提示词既浪费token又拖慢响应。
+每帧可以是文字描述（字符串），也可以是字典：
+
+- description / caption / text：帧的文字描述（如画面描述、字幕、OCR结果）
+- timestamp：帧在视频中的时间（秒数或 "mm:ss" / "hh:mm:ss"），缺省时按帧序号
+- pixels：灰度（二维）或RGB（三维）像素矩阵，安装numpy时计算64位差异哈希(dHash)
+- hash：客户端预先计算好的64位画面哈希（16位十六进制）
+- url / image_url：帧图片地址
+
+两帧可比较的画面哈希、描述SimHash都在阈值内时视为近似重复，只保留最早的一帧并记录相似帧数。
+"""
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖：未安装时不计算像素哈希，只按描述和客户端提供的哈希去重
+    np = None
+
+from whereeatai.config import VIDEO_FRAME_TOKEN_BUDGET, VIDEO_FRAME_IMAGE_DISTANCE, VIDEO_FRAME_TEXT_DISTANCE
+from whereeatai.utils.fingerprint import hamming_distance, simhash
+from whereeatai.utils.metrics import VIDEO_FRAMES, VIDEO_FRAME_TOKENS_SAVED
+
+logger = logging.getLogger(__name__)
+
+# 差异哈希的尺寸：缩放为 HASH_SIZE x (HASH_SIZE+1) 后比较相邻像素，得到64位
+HASH_SIZE = 8
+DESCRIPTION_FIELDS = ("description", "caption", "text")
+URL_FIELDS = ("url", "image_url")
+
+_CJK = re.compile(r"[　-鿿가-힯＀-￯]")
+_TIMESTAMP = re.compile(r"^(?:(\d+):)?(\d+):(\d+(?:\.\d+)?)$")
+_numpy_warned = False
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符按每字1个，其余按每4个字符1个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _parse_timestamp(value: Any) -> Optional[float]:
+    """解析帧时间（秒数或 mm:ss / hh:mm:ss），无法解析时返回None"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        match = _TIMESTAMP.match(value.strip())
+        if match:
+            hours, minutes, seconds = match.groups()
+            return int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds)
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+def _format_timestamp(seconds: float) -> str:
+    """格式化帧时间"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes:02d}:{seconds:02d}"
+
+
+def dhash(pixels: Any) -> Optional[int]:
+    """
+    计算帧画面的64位差异哈希（按块求均值缩小为8x9灰度图，比较每行相邻像素的明暗）
+    
+    Args:
+        pixels: 灰度（二维）或RGB/RGBA（三维）像素矩阵
+    
+    Returns:
+        Optional[int]: 哈希值，未安装numpy或像素矩阵无效时返回None
+    """
+    global _numpy_warned
+    if np is None:
+        if not _numpy_warned:
+            _numpy_warned = True
+            logger.warning("未安装numpy，视频帧像素不计算画面哈希，只按描述去重")
+        return None
+    try:
+        image = np.asarray(pixels, dtype=np.float32)
+    except (TypeError, ValueError):
+        return None
+    if image.ndim == 3 and image.shape[2] >= 3:
+        image = image[:, :, :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    if image.ndim != 2 or image.size == 0:
+        return None
+    # 小于目标尺寸时先放大，保证每块至少有一个像素
+    height, width = image.shape
+    image = np.repeat(image, -(-HASH_SIZE // height), axis=0)
+    image = np.repeat(image, -(-(HASH_SIZE + 1) // width), axis=1)
+    height, width = image.shape
+    rows = np.linspace(0, height, HASH_SIZE + 1).astype(int)[:-1]
+    cols = np.linspace(0, width, HASH_SIZE + 2).astype(int)[:-1]
+    counts = np.outer(np.diff(np.append(rows, height)), np.diff(np.append(cols, width)))
+    small = np.add.reduceat(np.add.reduceat(image, rows, axis=0), cols, axis=1) / counts
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int(sum(1 << i for i, bit in enumerate(bits) if bit))
+
+
+class Frame:
+    """一帧（或一组近似重复的帧）的预处理结果"""
+    
+    __slots__ = ("index", "timestamp", "description", "url", "image_hash", "text_hash", "repeats", "until")
+    
+    def __init__(self, index: int, raw: Any):
+        """
+        Args:
+            index: 帧序号
+            raw: 客户端传入的帧（字符串或字典）
+        """
+        self.index = index
+        self.timestamp: Optional[float] = None
+        self.description = ""
+        self.url = ""
+        self.image_hash: Optional[int] = None
+        if isinstance(raw, dict):
+            self.timestamp = _parse_timestamp(raw.get("timestamp"))
+            self.description = next(
+                (str(raw[field]).strip() for field in DESCRIPTION_FIELDS if raw.get(field)), ""
+            )
+            self.url = next((str(raw[field]) for field in URL_FIELDS if raw.get(field)), "")
+            if raw.get("hash"):
+                try:
+                    self.image_hash = int(str(raw["hash"]), 16) & ((1 << 64) - 1)
+                except ValueError:
+                    pass
+            if self.image_hash is None and raw.get("pixels") is not None:
+                self.image_hash = dhash(raw["pixels"])
+        elif raw is not None:
+            self.description = str(raw).strip()
+        self.text_hash = simhash(self.description) if self.description else None
+        self.repeats = 1
+        self.until = self.position
+    
+    @property
+    def position(self) -> float:
+        """用于排序和计算时间间隔的位置：有时间戳时为秒数，否则为帧序号"""
+        return self.timestamp if self.timestamp is not None else float(self.index)
+    
+    def distance(self, other: "Frame") -> Optional[float]:
+        """
+        与另一帧的内容差异（0~1，取可比较信号中的最大值）
+        
+        Returns:
+            Optional[float]: 差异，没有可比较的信号时返回None
+        """
+        distances = []
+        if self.image_hash is not None and other.image_hash is not None:
+            distances.append(hamming_distance(self.image_hash, other.image_hash) / 64)
+        if self.text_hash is not None and other.text_hash is not None:
+            distances.append(hamming_distance(self.text_hash, other.text_hash) / 64)
+        return max(distances) if distances else None
+    
+    def is_duplicate(self, other: "Frame", image_distance: int, text_distance: int) -> bool:
+        """
+        是否与另一帧近似重复：只有一帧有描述时不重复；两帧都有的画面哈希、描述SimHash须都在阈值内；
+        都没有时按图片地址是否相同判断
+        """
+        compared = False
+        if self.description or other.description:
+            if self.text_hash is None or other.text_hash is None:
+                return False
+            if hamming_distance(self.text_hash, other.text_hash) > text_distance:
+                return False
+            compared = True
+        if self.image_hash is not None and other.image_hash is not None:
+            if hamming_distance(self.image_hash, other.image_hash) > image_distance:
+                return False
+            compared = True
+        return compared or self.url == other.url
+    
+    def render(self) -> str:
+        """写入提示词的一行"""
+        parts = []
+        if self.timestamp is not None:
+            time_range = _format_timestamp(self.timestamp)
+            if self.until > self.timestamp:
+                time_range += f"-{_format_timestamp(self.until)}"
+            parts.append(f"[{time_range}]")
+        else:
+            parts.append(f"[#{self.index + 1}]")
+        parts.append(self.description or (f"图片：{self.url}" if self.url else "（无文字描述）"))
+        if self.repeats > 1:
+            parts.append(f"（含{self.repeats}个相似帧）")
+        return " ".join(parts)
+
+
+def _deduplicate(frames: List[Frame], image_distance: int, text_distance: int) -> List[Frame]:
+    """按时间顺序合并近似重复的帧，保留每组最早的一帧"""
+    kept: List[Frame] = []
+    for frame in sorted(frames, key=lambda f: (f.position, f.index)):
+        match = next((k for k in kept if k.is_duplicate(frame, image_distance, text_distance)), None)
+        if match is None:
+            kept.append(frame)
+        else:
+            match.repeats += 1
+            match.until = max(match.until, frame.position)
+    return kept
+
+
+def _select(frames: List[Frame], token_budget: int) -> List[Frame]:
+    """
+    在token预算内选取帧：先选覆盖相似帧最多的一帧，之后每次选与已选帧时间间隔和内容差异之和最大、
+    且放得进剩余预算的帧（最远点采样），保证所选帧在时间上分散、内容上不同
+    """
+    costs = {frame.index: estimate_tokens(frame.render()) + 1 for frame in frames}
+    if token_budget <= 0 or sum(costs.values()) <= token_budget:
+        return frames
+    start = min(frame.position for frame in frames)
+    span = max(frame.position for frame in frames) - start or 1.0
+    remaining = token_budget
+    selected: List[Frame] = []
+    candidates = sorted(frames, key=lambda f: (-f.repeats, f.position))
+    while candidates:
+        best, best_score = None, -1.0
+        for frame in candidates:
+            if costs[frame.index] > remaining:
+                continue
+            if not selected:
+                best = frame
+                break
+            gap = min(abs(frame.position - other.position) for other in selected) / span
+            differences = [d for d in (frame.distance(other) for other in selected) if d is not None]
+            score = gap + (min(differences) if differences else 1.0)
+            if score > best_score:
+                best, best_score = frame, score
+        if best is None:
+            break
+        selected.append(best)
+        candidates.remove(best)
+        remaining -= costs[best.index]
+    return sorted(selected, key=lambda f: (f.position, f.index))
+
+
+def prepare_frames(
+    video_frames: Any,
+    token_budget: int = VIDEO_FRAME_TOKEN_BUDGET,
+    image_distance: int = VIDEO_FRAME_IMAGE_DISTANCE,
+    text_distance: int = VIDEO_FRAME_TEXT_DISTANCE
+) -> Tuple[str, Dict[str, Any]]:
+    """
+    预处理视频帧：去重、按预算选取，并渲染为提示词文本
+    
+    Args:
+        video_frames: 客户端传入的视频帧列表
+        token_budget: 视频帧部分的token预算，0表示不限制
+        image_distance: 画面哈希视为相同的最大汉明距离
+        text_distance: 描述SimHash视为相同的最大汉明距离
+    
+    Returns:
+        Tuple[str, Dict]: (提示词中的视频帧文本, 帧统计：输入帧数、保留帧数、去掉的重复帧数和超预算帧数、节省的token数)
+    """
+    if not isinstance(video_frames, list):
+        video_frames = [video_frames] if video_frames else []
+    frames = [Frame(index, raw) for index, raw in enumerate(video_frames)]
+    unique = _deduplicate(frames, image_distance, text_distance)
+    selected = _select(unique, token_budget)
+    text = "\n".join(frame.render() for frame in selected)
+    
+    # 与直接写入原始帧列表相比节省的token数
+    tokens_before = estimate_tokens(str(video_frames)) if video_frames else 0
+    tokens_after = estimate_tokens(text)
+    stats = {
+        "input_frames": len(frames),
+        "kept_frames": len(selected),
+        "duplicates_dropped": len(frames) - len(unique),
+        "over_budget_dropped": len(unique) - len(selected),
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after)
+    }
+    VIDEO_FRAMES.labels(result="kept").inc(stats["kept_frames"])
+    VIDEO_FRAMES.labels(result="duplicate").inc(stats["duplicates_dropped"])
+    VIDEO_FRAMES.labels(result="over_budget").inc(stats["over_budget_dropped"])
+    VIDEO_FRAME_TOKENS_SAVED.inc(stats["tokens_saved"])
+    return text, stats
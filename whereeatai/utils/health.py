@@ -0,0 +1,135 @@
+"""健康检查：存活/就绪状态和缓存的上游可达性探测
+
+/livez 只说明进程和事件循环可以响应；/readyz 要求worker预热完成且最近一次上游探测成功。
+探测在后台按固定间隔执行，就绪检查只读取缓存结果，不会因为探测请求本身放大上游压力。
+"""
+from typing import Any, Dict, Optional, Tuple
+import asyncio
+import time
+import logging
+
+import httpx
+
+from whereeatai.config import (
+    API_KEY,
+    BASE_URL,
+    READINESS_PROBE_INTERVAL,
+    READINESS_PROBE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+
+class HealthState:
+    """当前worker的健康状态"""
+    
+    def __init__(self, probe_interval: float = READINESS_PROBE_INTERVAL, probe_timeout: float = READINESS_PROBE_TIMEOUT):
+        """
+        初始化健康状态
+        
+        Args:
+            probe_interval: 上游探测间隔(秒)
+            probe_timeout: 单次探测超时(秒)
+        """
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.started_at = time.monotonic()
+        self.warmed_up = False
+        self.warmup_seconds: Optional[float] = None
+        self.draining = False
+        self.upstream_ok: Optional[bool] = None
+        self.upstream_latency: Optional[float] = None
+        self.upstream_error = ""
+        self.upstream_checked_at = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+    
+    def mark_warmed_up(self, seconds: float):
+        """
+        标记预热完成
+        
+        Args:
+            seconds: 预热耗时(秒)
+        """
+        self.warmed_up = True
+        self.warmup_seconds = seconds
+    
+    async def probe_upstream(self) -> bool:
+        """
+        探测上游模型服务是否可达（GET /models，5xx、429和连接错误视为不可达）
+        
+        Returns:
+            bool: 是否可达
+        """
+        start = time.perf_counter()
+        try:
+            async with httpx.AsyncClient(timeout=self.probe_timeout) as client:
+                response = await client.get(
+                    f"{BASE_URL.rstrip('/')}/models",
+                    headers={"Authorization": f"Bearer {API_KEY}"} if API_KEY else None
+                )
+            ok = response.status_code < 500 and response.status_code != 429
+            error = "" if ok else f"HTTP {response.status_code}"
+        except httpx.HTTPError as e:
+            ok, error = False, f"{type(e).__name__}: {str(e)}"
+        
+        if ok != self.upstream_ok:
+            log = logger.info if ok else logger.warning
+            log(f"上游可达性变化: {'可达' if ok else '不可达'}{'' if ok else ', 错误: ' + error}")
+        self.upstream_ok = ok
+        self.upstream_error = error
+        self.upstream_latency = time.perf_counter() - start
+        self.upstream_checked_at = time.monotonic()
+        return ok
+    
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await self.probe_upstream()
+            except Exception as e:
+                logger.error(f"上游探测失败: {str(e)}")
+    
+    def start_probing(self):
+        """在当前事件循环中启动后台探测"""
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.get_running_loop().create_task(self._probe_loop())
+    
+    def stop_probing(self):
+        """停止后台探测，并标记为不再接收新请求"""
+        self.draining = True
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            self._probe_task = None
+    
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """
+        就绪状态（只读取缓存的探测结果）
+        
+        Returns:
+            Tuple[bool, Dict]: (是否就绪, 各项检查结果)
+        """
+        now = time.monotonic()
+        # 探测结果超过三个周期未更新视为过期，说明探测循环本身出了问题
+        probe_fresh = now - self.upstream_checked_at <= self.probe_interval * 3
+        ready = self.warmed_up and not self.draining and bool(self.upstream_ok) and probe_fresh
+        return ready, {
+            "warmed_up": self.warmed_up,
+            "warmup_seconds": round(self.warmup_seconds, 3) if self.warmup_seconds is not None else None,
+            "draining": self.draining,
+            "upstream": {
+                "ok": self.upstream_ok,
+                "error": self.upstream_error,
+                "latency": round(self.upstream_latency, 3) if self.upstream_latency is not None else None,
+                "checked_seconds_ago": round(now - self.upstream_checked_at, 1) if self.upstream_checked_at else None
+            },
+            "uptime": round(now - self.started_at, 1)
+        }
+
+
+# 全局健康状态实例（每个worker进程各自一份）
+health_state = HealthState()
+
+
+def get_health_state() -> HealthState:
+    """获取全局健康状态实例"""
+    return health_state
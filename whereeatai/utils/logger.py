@@ -1,10 +1,147 @@
 """日志配置模块"""
 import logging
 import sys
-from pathlib import Path
-from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
-from datetime import datetime
+import os
 import json
+import atexit
+import itertools
+import queue
+import threading
+from pathlib import Path
+from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler, QueueHandler, QueueListener
+from datetime import datetime, timezone
+from typing import Dict, Optional, Union
+import orjson
+
+from whereeatai.utils.context import get_request_id
+
+
+class RequestIdFilter(logging.Filter):
+    """从请求上下文为日志记录附加request_id（请求之外记为 -）"""
+    
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = get_request_id() or "-"
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按日志器对INFO及以下日志采样
+    
+    保留比例为rate时每 1/rate 条保留1条（按日志器计数，结果确定），
+    WARNING及以上始终保留。子日志器继承最近的父日志器配置。
+    """
+    
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._intervals: Dict[str, int] = {}
+        self._counters: Dict[str, itertools.count] = {}
+    
+    def _interval(self, name: str) -> int:
+        """解析日志器的采样间隔，1表示不采样"""
+        interval = self._intervals.get(name)
+        if interval is None:
+            interval = 1
+            parts = name.split(".")
+            for i in range(len(parts), 0, -1):
+                rate = self.rates.get(".".join(parts[:i]))
+                if rate is not None:
+                    interval = max(1, round(1 / rate)) if rate > 0 else 0
+                    break
+            self._intervals[name] = interval
+            self._counters[name] = itertools.count()
+        return interval
+    
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        interval = self._interval(record.name)
+        if interval == 1:
+            return True
+        if interval == 0:
+            return False
+        return next(self._counters[record.name]) % interval == 0
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    有界队列日志处理器
+    
+    调用线程只做消息格式化和入队，文件/控制台I/O由QueueListener线程完成。
+    队列满时按策略丢弃(drop)或阻塞等待(block，超时后丢弃)，丢弃数量会在恢复后补记一条警告。
+    """
+    
+    def __init__(self, log_queue: queue.Queue, policy: str = "drop", block_timeout: float = 1.0):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._reported = 0
+    
+    def prepare(self, record):
+        # 同进程内传递，只需固化消息文本，异常信息留给监听线程格式化
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+    
+    def enqueue(self, record):
+        try:
+            if self.policy == "block":
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return
+        
+        if self.dropped != self._reported:
+            lost = self.dropped - self._reported
+            self._reported = self.dropped
+            warning = logging.LogRecord(
+                __name__, logging.WARNING, __file__, 0,
+                f"日志队列已满，丢弃 {lost} 条日志（累计 {self.dropped} 条）", None, None
+            )
+            warning.request_id = "-"
+            try:
+                self.queue.put_nowait(warning)
+            except queue.Full:
+                pass
+
+
+class DrainingQueueListener(QueueListener):
+    """队列满时停止也会等待监听线程写完剩余日志"""
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+class FanOutHandler(logging.Handler):
+    """
+    同步写日志时的分发处理器
+    
+    过滤器只在这里执行一次，再按各处理器自身的级别分发，与QueueListener的respect_handler_level一致。
+    """
+    
+    def __init__(self, *handlers: logging.Handler):
+        super().__init__()
+        self.handlers = handlers
+    
+    def emit(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+    
+    def flush(self):
+        for handler in self.handlers:
+            handler.flush()
+    
+    def close(self):
+        for handler in self.handlers:
+            handler.close()
+        super().close()
 
 
 class JSONFormatter(logging.Formatter):
@@ -12,7 +149,7 @@ class JSONFormatter(logging.Formatter):
     
     def format(self, record):
         log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
             "level": record.levelname,
             "logger": record.name,
             "message": record.getMessage(),
@@ -31,7 +168,59 @@ class JSONFormatter(logging.Formatter):
         if hasattr(record, "request_id"):
             log_data["request_id"] = record.request_id
         
-        return json.dumps(log_data, ensure_ascii=False)
+        return orjson.dumps(log_data, default=str).decode()
+
+
+# 异步日志监听器（setup_logging开启队列时创建）
+_listener: Optional[DrainingQueueListener] = None
+_queue_handler: Optional[BoundedQueueHandler] = None
+_listener_lock = threading.Lock()
+
+
+def parse_sampling(value: Union[str, Dict[str, float], None]) -> Dict[str, float]:
+    """
+    解析日志采样配置
+    
+    Args:
+        value: JSON字符串或字典
+    
+    Returns:
+        Dict[str, float]: {日志器名: 保留比例}
+    """
+    if not value:
+        return {}
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            logging.getLogger(__name__).warning(f"日志采样配置解析失败，已忽略: {value}")
+            return {}
+    return {str(name): float(rate) for name, rate in value.items()}
+
+
+def stop_logging():
+    """停止异步日志监听器并写出队列中剩余的日志"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _restart_listener_after_fork():
+    """fork后子进程中没有监听线程，用新队列重建监听器"""
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    log_queue = queue.Queue(maxsize=_queue_handler.queue.maxsize)
+    _queue_handler.queue = log_queue
+    _listener = DrainingQueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+atexit.register(stop_logging)
 
 
 def setup_logging(
@@ -40,7 +229,10 @@ def setup_logging(
     log_dir: str = "logs",
     use_json: bool = False,
     max_bytes: int = 10 * 1024 * 1024,  # 10MB
-    backup_count: int = 5
+    backup_count: int = 5,
+    queue_size: int = 10000,
+    queue_policy: str = "drop",
+    sampling: Union[str, Dict[str, float], None] = None
 ):
     """
     配置日志系统
@@ -52,7 +244,12 @@ def setup_logging(
         use_json: 是否使用JSON格式
         max_bytes: 单个日志文件最大大小
         backup_count: 保留的备份文件数量
+        queue_size: 异步日志队列容量，0表示在调用线程同步写日志
+        queue_policy: 队列满时的策略，drop(丢弃) / block(阻塞等待)
+        sampling: 按日志器采样配置（JSON字符串或字典）
     """
+    global _listener, _queue_handler
+    
     # 创建日志目录
     log_path = Path(log_dir)
     log_path.mkdir(parents=True, exist_ok=True)
@@ -65,6 +262,7 @@ def setup_logging(
     logger.setLevel(numeric_level)
     
     # 清除现有的处理器
+    stop_logging()
     logger.handlers.clear()
     
     # 控制台处理器
@@ -94,25 +292,42 @@ def setup_logging(
         formatter = JSONFormatter()
     else:
         formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s',
             datefmt='%Y-%m-%d %H:%M:%S'
         )
     
     console_handler.setFormatter(formatter)
     file_handler.setFormatter(formatter)
     error_handler.setFormatter(formatter)
+    handlers = (console_handler, file_handler, error_handler)
+    
+    # 请求ID和采样必须在调用线程完成（请求上下文只在调用线程可见）
+    filters = [RequestIdFilter()]
+    sampling_rates = parse_sampling(sampling)
+    if sampling_rates:
+        filters.append(SamplingFilter(sampling_rates))
     
-    # 添加处理器
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
-    logger.addHandler(error_handler)
+    if queue_size > 0:
+        # 调用线程只入队，I/O由监听线程完成
+        _queue_handler = BoundedQueueHandler(queue.Queue(maxsize=queue_size), policy=queue_policy)
+        for log_filter in filters:
+            _queue_handler.addFilter(log_filter)
+        _listener = DrainingQueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        logger.addHandler(_queue_handler)
+    else:
+        _queue_handler = None
+        fan_out_handler = FanOutHandler(*handlers)
+        for log_filter in filters:
+            fan_out_handler.addFilter(log_filter)
+        logger.addHandler(fan_out_handler)
     
     # 设置第三方库的日志级别
     logging.getLogger("urllib3").setLevel(logging.WARNING)
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("httpcore").setLevel(logging.WARNING)
     
-    logger.info(f"日志系统已配置 - 级别: {log_level}, 文件: {log_path / log_file}")
+    logger.info(f"日志系统已配置 - 级别: {log_level}, 文件: {log_path / log_file}, 队列: {queue_size}")
     
     return logger
 
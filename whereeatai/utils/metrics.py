@@ -0,0 +1,109 @@
+"""Prometheus监控指标定义"""
+from prometheus_client import Counter, Gauge, Histogram
+
+# LLM调用指标（按模型和路由拆分，用于权衡延迟与成本）
+LLM_REQUESTS = Counter(
+    "whereeatai_llm_requests_total",
+    "LLM调用次数",
+    ["model", "route", "status"]
+)
+
+LLM_LATENCY = Histogram(
+    "whereeatai_llm_latency_seconds",
+    "LLM调用延迟(秒)",
+    ["model", "route"],
+    buckets=(0.5, 1, 2, 4, 8, 15, 30, 60, 120)
+)
+
+LLM_TOKENS = Counter(
+    "whereeatai_llm_tokens_total",
+    "LLM token用量",
+    ["model", "route", "type"]
+)
+
+LLM_FALLBACKS = Counter(
+    "whereeatai_llm_fallbacks_total",
+    "模型过载后切换到备用模型的次数",
+    ["model", "fallback_model"]
+)
+
+# LLM调度器指标
+LLM_CONCURRENCY_LIMIT = Gauge(
+    "whereeatai_llm_concurrency_limit",
+    "自适应LLM并发上限"
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "whereeatai_llm_in_flight",
+    "正在执行的LLM调用数"
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    "whereeatai_llm_queue_depth",
+    "等待LLM槽位的调用数"
+)
+
+LLM_QUEUE_DELAY = Histogram(
+    "whereeatai_llm_queue_delay_seconds",
+    "LLM调用等待槽位的时间(秒)",
+    ["priority"],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+)
+
+LLM_SHED = Counter(
+    "whereeatai_llm_shed_total",
+    "因过载被快速拒绝的LLM调用数",
+    ["reason"]
+)
+
+# 响应缓存指标
+RESPONSE_CACHE_REQUESTS = Counter(
+    "whereeatai_response_cache_requests_total",
+    "响应缓存查询次数",
+    ["result"]
+)
+
+# 过载降级指标
+DEGRADATION_LEVEL = Gauge(
+    "whereeatai_degradation_level",
+    "当前降级等级（0为正常）"
+)
+
+DEGRADED_RESPONSES = Counter(
+    "whereeatai_degraded_responses_total",
+    "降级状态下返回的响应数",
+    ["level"]
+)
+
+# 生成内容存储指标
+PLAN_STORE_REQUESTS = Counter(
+    "whereeatai_plan_store_requests_total",
+    "生成内容存储查询次数",
+    ["kind", "result"]
+)
+
+# 推测预取指标（命中率 = hit / issued）
+PREFETCH_EVENTS = Counter(
+    "whereeatai_prefetch_events_total",
+    "推测预取事件数（issued发起、hit被真实请求用到、wasted超时未用到、over_budget超出预算未发起）",
+    ["result"]
+)
+
+# 笔记批量分析近似重复检测指标
+NOTE_DEDUP_REQUESTS = Counter(
+    "whereeatai_note_dedup_total",
+    "批量分析的笔记数（novel新笔记、duplicate与已分析笔记近似重复、batch_duplicate与同批次笔记近似重复、error失败）",
+    ["result"]
+)
+
+# 视频帧预处理指标
+VIDEO_FRAMES = Counter(
+    "whereeatai_video_frames_total",
+    "视频分析输入的帧数（kept写入提示词、duplicate与其他帧近似重复、over_budget超出token预算）",
+    ["result"]
+)
+
+VIDEO_FRAME_TOKENS_SAVED = Counter(
+    "whereeatai_video_frame_tokens_saved_total",
+    "视频帧预处理节省的提示词token数（估算）"
+)
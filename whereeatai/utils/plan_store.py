@@ -0,0 +1,478 @@
+"""生成内容存储：持久化成功的Agent/工作流输出，供相同需求复用及管理查询
+
+条目按 Agent/工作流、规范化的目的地、兴趣和天数建立索引，内容zlib压缩后保存；
+全文索引使用SQLite FTS5（trigram分词，中文无需分词即可检索）。
+"""
+from typing import Any, Dict, Iterator, Iterable, List, Optional, Tuple
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from hashlib import blake2b
+import math
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import logging
+
+import orjson
+
+from whereeatai.config import (
+    PLAN_STORE_DB_PATH,
+    PLAN_STORE_MAX_AGE,
+    PLAN_STORE_RETENTION
+)
+from whereeatai.utils.metrics import PLAN_STORE_REQUESTS
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# 建立独立索引列的字段，其余字段规范化后只参与查找键
+INDEXED_FIELDS = ("destination", "location", "interests", "duration")
+# 写入全文索引的内容长度上限（字符）
+FTS_CONTENT_LIMIT = 4000
+
+# 刷新模式下的条目过期时间戳：设置后查询一律未命中（强制重新生成），新条目按该时间过期（inf表示不设过期时间）
+_refresh_expires_at: ContextVar[Optional[float]] = ContextVar("plan_store_refresh", default=None)
+
+_CHINESE_DIGITS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+
+def normalize_text(value: Any) -> str:
+    """规范化文本：全半角统一、去空白、转小写"""
+    text = unicodedata.normalize("NFKC", str(value or ""))
+    return re.sub(r"\s+", "", text).lower()
+
+
+def normalize_destination(value: Any) -> str:
+    """规范化目的地，如 " 北京市 " 与 "北京" 视为相同"""
+    text = normalize_text(value)
+    if len(text) > 2 and text[-1] in "市省":
+        text = text[:-1]
+    return text
+
+
+def normalize_interests(value: Any) -> str:
+    """规范化兴趣列表：去重、排序后以逗号连接，顺序不影响命中"""
+    if isinstance(value, str):
+        items = re.split(r"[,，、/;；]", value)
+    else:
+        items = list(value or [])
+    return ",".join(sorted({normalize_text(item) for item in items} - {""}))
+
+
+def normalize_duration(value: Any) -> str:
+    """规范化行程时长：能识别天数时统一为 "<n>d"（如 "3天2夜"、"3 days"、"三天"），否则为规范化文本"""
+    text = normalize_text(value)
+    match = re.search(r"(\d+)(?:天|日|d|day)", text)
+    if match:
+        return f"{int(match.group(1))}d"
+    match = re.search(r"([一二两三四五六七八九十])(?:天|日)", text)
+    if match:
+        return f"{_CHINESE_DIGITS[match.group(1)]}d"
+    return text
+
+
+def normalize_input(input_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    规范化请求输入
+    
+    Args:
+        input_data: 请求输入
+    
+    Returns:
+        Dict[str, str]: 规范化后的非空字段
+    """
+    normalized = {}
+    for name, value in input_data.items():
+        if name in ("destination", "location"):
+            text = normalize_destination(value)
+        elif name == "interests":
+            text = normalize_interests(value)
+        elif name == "duration":
+            text = normalize_duration(value)
+        elif isinstance(value, (list, tuple, set)):
+            text = normalize_interests(value)
+        else:
+            text = normalize_text(value)
+        if text:
+            normalized[name] = text
+    return normalized
+
+
+@contextmanager
+def refreshing(expires_at: Optional[float] = None) -> Iterator[None]:
+    """
+    在当前上下文内强制重新生成并刷新存储（预计算任务和缓存后台刷新使用）
+    
+    上下文内的查询都不命中，保存的条目（包括工作流内部各Agent的输出）在expires_at过期。
+    
+    Args:
+        expires_at: 条目过期时间戳，None表示只受max_age限制
+    """
+    token = _refresh_expires_at.set(math.inf if expires_at is None else expires_at)
+    try:
+        yield
+    finally:
+        _refresh_expires_at.reset(token)
+
+
+def _content_text(data: Any) -> Iterable[str]:
+    """提取结果中的文本内容用于全文索引"""
+    if isinstance(data, str):
+        yield data
+    elif isinstance(data, dict):
+        for value in data.values():
+            yield from _content_text(value)
+    elif isinstance(data, (list, tuple)):
+        for value in data:
+            yield from _content_text(value)
+
+
+class PlanStore(SQLiteStore):
+    """
+    基于SQLite的生成内容存储
+    
+    同一Agent/工作流下规范化输入相同的条目只保留最新一份；超过保留期的条目被清理。
+    """
+    
+    isolation_level = ""
+    purge_label = "过期生成内容"
+    
+    def __init__(
+        self,
+        db_path: str = PLAN_STORE_DB_PATH,
+        max_age: int = PLAN_STORE_MAX_AGE,
+        retention: int = PLAN_STORE_RETENTION,
+        purge_interval: int = 3600
+    ):
+        """
+        初始化存储
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            max_age: 直接用于回答请求的条目最大年龄(秒)
+            retention: 条目保留时间(秒)
+            purge_interval: 两次过期清理之间的最小间隔(秒)
+        """
+        self.max_age = max_age
+        self.retention = retention
+        self.fts_enabled = False
+        super().__init__(db_path, purge_interval)
+        logger.info(f"生成内容存储初始化完成: {self.db_path}, 全文索引: {self.fts_enabled}")
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表和全文索引"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS plans (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                lookup_key TEXT NOT NULL,
+                destination TEXT NOT NULL,
+                interests TEXT NOT NULL,
+                duration TEXT NOT NULL,
+                input_blob BLOB NOT NULL,
+                blob BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                last_hit_at REAL,
+                UNIQUE (kind, lookup_key)
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(plans)")}
+        if "expires_at" not in columns:
+            conn.execute("ALTER TABLE plans ADD COLUMN expires_at REAL")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_destination ON plans(destination, kind)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_created ON plans(created_at)")
+        try:
+            conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS plans_fts "
+                "USING fts5(destination, interests, content, tokenize='trigram')"
+            )
+            self.fts_enabled = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SQLite不支持FTS5 trigram分词，全文检索退化为LIKE匹配: {str(e)}")
+
+    @staticmethod
+    def make_key(kind: str, normalized: Dict[str, str]) -> str:
+        """按Agent/工作流和规范化输入生成查找键"""
+        raw = orjson.dumps([kind, normalized], option=orjson.OPT_SORT_KEYS)
+        return blake2b(raw, digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _index_fields(normalized: Dict[str, str]) -> Tuple[str, str, str]:
+        """独立索引列：目的地（无目的地时使用位置）、兴趣、天数"""
+        return (
+            normalized.get("destination") or normalized.get("location", ""),
+            normalized.get("interests", ""),
+            normalized.get("duration", "")
+        )
+    
+    def record(
+        self,
+        kind: str,
+        input_data: Dict[str, Any],
+        result: Dict[str, Any],
+        expires_at: Optional[float] = None
+    ) -> Optional[int]:
+        """
+        保存一次成功的输出（相同查找键的旧条目被替换）
+        
+        Args:
+            kind: Agent名称或工作流名称（如 agent:itinerary、workflow:travel_plan:standard）
+            input_data: 请求输入
+            result: 输出结果
+            expires_at: 过期时间戳，默认只受max_age限制（刷新模式下使用 refreshing 设置的时间）
+        
+        Returns:
+            int: 条目ID
+        """
+        normalized = normalize_input(input_data)
+        key = self.make_key(kind, normalized)
+        destination, interests, duration = self._index_fields(normalized)
+        blob = self._encode(result)
+        content = "\n".join(_content_text(result.get("data", result)))[:FTS_CONTENT_LIMIT]
+        now = time.time()
+        if expires_at is None and _refresh_expires_at.get() != math.inf:
+            expires_at = _refresh_expires_at.get()
+        with closing(self._connect()) as conn, conn:
+            old = conn.execute(
+                "SELECT id FROM plans WHERE kind = ? AND lookup_key = ?", (kind, key)
+            ).fetchone()
+            values = (destination, interests, duration, self._encode(input_data), blob, len(blob), now, expires_at)
+            if old:
+                plan_id = old[0]
+                conn.execute(
+                    "UPDATE plans SET destination = ?, interests = ?, duration = ?, input_blob = ?, blob = ?, size = ?, "
+                    "created_at = ?, expires_at = ?, hits = 0, last_hit_at = NULL WHERE id = ?",
+                    values + (plan_id,)
+                )
+                if self.fts_enabled:
+                    conn.execute("DELETE FROM plans_fts WHERE rowid = ?", (plan_id,))
+            else:
+                plan_id = conn.execute(
+                    "INSERT INTO plans (kind, lookup_key, destination, interests, duration, input_blob, blob, size, created_at, "
+                    "expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (kind, key) + values
+                ).lastrowid
+            if self.fts_enabled:
+                conn.execute(
+                    "INSERT INTO plans_fts (rowid, destination, interests, content) VALUES (?, ?, ?, ?)",
+                    (plan_id, destination, interests, content)
+                )
+        self.maybe_purge()
+        return plan_id
+    
+    def lookup(self, kind: str, input_data: Dict[str, Any], stale: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        查找规范化输入相同、且足够新的输出
+        
+        Args:
+            kind: Agent名称或工作流名称
+            input_data: 请求输入
+            stale: 是否接受保留期内已过期的条目（最高降级等级使用）
+        
+        Returns:
+            Dict: 保存的输出结果（附带 plan_store 元数据），未命中返回None
+        """
+        if _refresh_expires_at.get() is not None:
+            PLAN_STORE_REQUESTS.labels(kind=kind, result="refresh").inc()
+            return None
+        key = self.make_key(kind, normalize_input(input_data))
+        now = time.time()
+        if stale:
+            condition, params = "created_at >= ?", (now - self.retention,)
+        else:
+            condition = "created_at >= ? AND (expires_at IS NULL OR expires_at > ?)"
+            params = (now - self.max_age, now)
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                f"SELECT id, blob, created_at FROM plans WHERE kind = ? AND lookup_key = ? AND {condition}",
+                (kind, key) + params
+            ).fetchone()
+            if row is None:
+                PLAN_STORE_REQUESTS.labels(kind=kind, result="miss").inc()
+                return None
+            conn.execute("UPDATE plans SET hits = hits + 1, last_hit_at = ? WHERE id = ?", (time.time(), row[0]))
+        PLAN_STORE_REQUESTS.labels(kind=kind, result="hit").inc()
+        result = self._decode(row[1])
+        result["plan_store"] = {"id": row[0], "created_at": row[2]}
+        return result
+    
+    def search(
+        self,
+        query: str = "",
+        kind: Optional[str] = None,
+        destination: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        查询条目（不含内容）
+        
+        Args:
+            query: 全文检索关键词（匹配目的地、兴趣和生成内容）
+            kind: 按Agent/工作流过滤
+            destination: 按规范化目的地过滤
+            limit: 返回条数
+            offset: 跳过条数
+        
+        Returns:
+            List[Dict]: 条目元数据，按创建时间倒序
+        """
+        conditions, params = [], []
+        if kind:
+            conditions.append("p.kind = ?")
+            params.append(kind)
+        if destination:
+            conditions.append("p.destination = ?")
+            params.append(normalize_destination(destination))
+        query = (query or "").strip()
+        joins = ""
+        if query and self.fts_enabled:
+            joins = "JOIN plans_fts f ON f.rowid = p.id"
+            if len(query) >= 3:
+                # trigram分词要求关键词至少3个字符，短关键词用LIKE匹配
+                conditions.append("plans_fts MATCH ?")
+                params.append('"' + query.replace('"', '""') + '"')
+            else:
+                conditions.append("(f.destination LIKE ? OR f.interests LIKE ? OR f.content LIKE ?)")
+                params.extend([f"%{query}%"] * 3)
+        elif query:
+            conditions.append("(p.destination LIKE ? OR p.interests LIKE ?)")
+            params.extend([f"%{query}%"] * 2)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            "SELECT p.id, p.kind, p.destination, p.interests, p.duration, p.size, p.created_at, p.expires_at, p.hits, "
+            "p.last_hit_at "
+            f"FROM plans p {joins} {where} ORDER BY p.created_at DESC LIMIT ? OFFSET ?"
+        )
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params + [limit, offset]).fetchall()
+        columns = (
+            "id", "kind", "destination", "interests", "duration", "size", "created_at", "expires_at", "hits", "last_hit_at"
+        )
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def popular_inputs(self, since: float, limit: int = 50, kind: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        """
+        最近被复用最多的请求输入（预计算任务据此选择要提前生成的内容）
+        
+        Args:
+            since: 只统计该时间戳之后生成或命中过的条目
+            limit: 返回条数
+            kind: 按Agent/工作流过滤
+        
+        Returns:
+            List[Tuple[str, Dict]]: (条目类型, 请求输入)，按命中次数降序
+        """
+        sql = "SELECT kind, input_blob FROM plans WHERE MAX(created_at, COALESCE(last_hit_at, 0)) >= ?"
+        params: List[Any] = [since]
+        if kind:
+            sql += " AND kind = ?"
+            params.append(kind)
+        sql += " ORDER BY hits DESC, COALESCE(last_hit_at, created_at) DESC LIMIT ?"
+        with closing(self._connect()) as conn:
+            rows = conn.execute(sql, params + [limit]).fetchall()
+        return [(row[0], self._decode(row[1])) for row in rows]
+    
+    def get(self, plan_id: int) -> Optional[Dict[str, Any]]:
+        """
+        获取条目详情
+        
+        Args:
+            plan_id: 条目ID
+        
+        Returns:
+            Dict: 条目元数据、请求输入和输出结果，不存在返回None
+        """
+        with closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT kind, destination, interests, duration, input_blob, blob, created_at, expires_at, hits, last_hit_at "
+                "FROM plans WHERE id = ?",
+                (plan_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": plan_id,
+            "kind": row[0],
+            "destination": row[1],
+            "interests": row[2],
+            "duration": row[3],
+            "input_data": self._decode(row[4]),
+            "result": self._decode(row[5]),
+            "created_at": row[6],
+            "expires_at": row[7],
+            "hits": row[8],
+            "last_hit_at": row[9]
+        }
+    
+    def delete(self, plan_id: int) -> bool:
+        """
+        删除条目
+        
+        Args:
+            plan_id: 条目ID
+        
+        Returns:
+            bool: 是否删除
+        """
+        with closing(self._connect()) as conn, conn:
+            deleted = conn.execute("DELETE FROM plans WHERE id = ?", (plan_id,)).rowcount
+            if self.fts_enabled:
+                conn.execute("DELETE FROM plans_fts WHERE rowid = ?", (plan_id,))
+        return bool(deleted)
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理超过保留时间的条目
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的条目数
+        """
+        cutoff = (now or time.time()) - self.retention
+        with closing(self._connect()) as conn, conn:
+            if self.fts_enabled:
+                conn.execute(
+                    "DELETE FROM plans_fts WHERE rowid IN (SELECT id FROM plans WHERE created_at < ?)", (cutoff,)
+                )
+            purged = conn.execute("DELETE FROM plans WHERE created_at < ?", (cutoff,)).rowcount
+        if purged:
+            logger.info(f"清理过期生成内容: {purged}条")
+        return purged
+    
+    def stats(self) -> Dict[str, Any]:
+        """按Agent/工作流统计条目数、压缩后大小和命中次数"""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT kind, COUNT(*), SUM(size), SUM(hits) FROM plans GROUP BY kind ORDER BY kind"
+            ).fetchall()
+        return {
+            "kinds": {kind: {"entries": count, "bytes": size, "hits": hits} for kind, count, size, hits in rows},
+            "max_age": self.max_age,
+            "retention": self.retention,
+            "fts_enabled": self.fts_enabled
+        }
+
+
+# 全局生成内容存储实例（延迟创建）
+_plan_store: Optional[PlanStore] = None
+_plan_store_lock = threading.Lock()
+
+
+def get_plan_store() -> PlanStore:
+    """获取全局生成内容存储实例"""
+    global _plan_store
+    if _plan_store is None:
+        with _plan_store_lock:
+            if _plan_store is None:
+                _plan_store = PlanStore()
+    return _plan_store
@@ -0,0 +1,261 @@
+"""推测预取：根据近期流量学习端点间的跳转概率，提前生成用户很可能接着请求的内容
+
+例如用户拿到西安的行程后，大概率会接着请求西安的美食推荐和价格比价。每次请求后，
+对跳转概率足够高的后续端点以低优先级、用同一请求输入在后台执行，结果进入生成内容存储
+（各worker共享）和本worker的响应缓存。
+
+会话的上一个端点和已预取的条目记录在SQLite中，请求落在不同worker上也能学到跳转并统计命中；
+跳转计数只保留最近的若干次，流量模式变化后自动更新。
+"""
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from collections import Counter, deque
+from contextlib import closing
+import sqlite3
+import threading
+import time
+import logging
+
+from whereeatai.config import (
+    PREFETCH_DB_PATH,
+    PREFETCH_WINDOW,
+    PREFETCH_MIN_PROBABILITY,
+    PREFETCH_MIN_SAMPLES,
+    PREFETCH_MAX_FANOUT,
+    PREFETCH_BUDGET_PER_MINUTE,
+    PREFETCH_HISTORY
+)
+from whereeatai.utils.metrics import PREFETCH_EVENTS
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher(SQLiteStore):
+    """
+    推测预取器
+    
+    - 学习：同一会话在window秒内先后请求的两个端点记为一次跳转，只保留最近history次
+    - 预测：某端点之后跳转概率不低于min_probability的端点（样本不足min_samples时不预测）
+    - 预算：每个worker每分钟最多发起budget_per_minute次预取
+    - 命中：预取后window秒内被真实请求用到记为命中，否则记为浪费
+    """
+    
+    purge_label = "预取记录"
+    
+    def __init__(
+        self,
+        db_path: str = PREFETCH_DB_PATH,
+        window: int = PREFETCH_WINDOW,
+        min_probability: float = PREFETCH_MIN_PROBABILITY,
+        min_samples: int = PREFETCH_MIN_SAMPLES,
+        max_fanout: int = PREFETCH_MAX_FANOUT,
+        budget_per_minute: int = PREFETCH_BUDGET_PER_MINUTE,
+        history: int = PREFETCH_HISTORY,
+        purge_interval: int = 60
+    ):
+        """
+        初始化预取器
+        
+        Args:
+            db_path: 会话和预取记录的SQLite数据库路径（各worker共享）
+            window: 两次请求算作一次跳转、以及预取结果算作命中的时间窗口(秒)
+            min_probability: 发起预取的最小跳转概率
+            min_samples: 端点至少有多少次跳转样本才做预测
+            max_fanout: 一次请求后最多预取的端点数
+            budget_per_minute: 每分钟最多发起的预取次数
+            history: 保留的最近跳转次数
+            purge_interval: 两次清理过期记录之间的最小间隔(秒)
+        """
+        self.window = window
+        self.min_probability = min_probability
+        self.min_samples = min_samples
+        self.max_fanout = max_fanout
+        self.budget_per_minute = budget_per_minute
+        self._lock = threading.Lock()
+        self._history: Deque[Tuple[str, str]] = deque(maxlen=history)
+        self._counts: Dict[str, Counter] = {}
+        self._tokens = float(budget_per_minute)
+        self._refilled_at = time.monotonic()
+        super().__init__(db_path, purge_interval)
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prefetch_sessions (
+                session TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                seen_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS prefetched (
+                key TEXT PRIMARY KEY,
+                issued_at REAL NOT NULL,
+                hit_at REAL,
+                wasted INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+    
+    def _learn(self, source: str, target: str):
+        """记录一次跳转，超出history的最早跳转被移除"""
+        with self._lock:
+            if len(self._history) == self._history.maxlen:
+                old_source, old_target = self._history[0]
+                counts = self._counts[old_source]
+                counts[old_target] -= 1
+                if counts[old_target] <= 0:
+                    del counts[old_target]
+            self._history.append((source, target))
+            self._counts.setdefault(source, Counter())[target] += 1
+    
+    def observe(self, session: str, name: str, key: str) -> List[str]:
+        """
+        记录一次真实请求并给出值得预取的后续端点
+        
+        Args:
+            session: 会话标识
+            name: 端点名称（与缓存命名空间一致，如 agent:itinerary）
+            key: 本次请求的缓存键
+        
+        Returns:
+            List[str]: 值得预取的后续端点名称
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                previous = conn.execute(
+                    "SELECT name, seen_at FROM prefetch_sessions WHERE session = ?", (session,)
+                ).fetchone()
+                conn.execute(
+                    "INSERT INTO prefetch_sessions (session, name, seen_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session) DO UPDATE SET name = excluded.name, seen_at = excluded.seen_at",
+                    (session, name, now)
+                )
+                hit = conn.execute(
+                    "UPDATE prefetched SET hit_at = ? WHERE key = ? AND hit_at IS NULL AND issued_at >= ?",
+                    (now, key, now - self.window)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        if hit:
+            PREFETCH_EVENTS.labels(result="hit").inc()
+        if previous and previous[0] != name and now - previous[1] <= self.window:
+            self._learn(previous[0], name)
+        self.maybe_purge(now)
+        return [target for target, _ in self.predict(name)]
+    
+    def predict(self, name: str) -> List[Tuple[str, float]]:
+        """
+        预测某端点之后的请求
+        
+        Args:
+            name: 端点名称
+        
+        Returns:
+            List[Tuple[str, float]]: (后续端点, 跳转概率)，按概率降序
+        """
+        with self._lock:
+            counts = self._counts.get(name)
+            total = sum(counts.values()) if counts else 0
+            if total < self.min_samples:
+                return []
+            ranked = [(target, count / total) for target, count in counts.most_common(self.max_fanout)]
+        return [(target, probability) for target, probability in ranked if probability >= self.min_probability]
+    
+    def try_acquire(self) -> bool:
+        """从每分钟预算中取出一次预取（令牌桶），预算用完时返回False"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                float(self.budget_per_minute),
+                self._tokens + (now - self._refilled_at) * self.budget_per_minute / 60
+            )
+            self._refilled_at = now
+            if self._tokens < 1:
+                PREFETCH_EVENTS.labels(result="over_budget").inc()
+                return False
+            self._tokens -= 1
+            return True
+    
+    def mark_issued(self, key: str):
+        """
+        记录一次已发起的预取
+        
+        Args:
+            key: 预取条目的缓存键
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO prefetched (key, issued_at) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET issued_at = excluded.issued_at, hit_at = NULL, wasted = 0",
+                (key, time.time())
+            )
+        PREFETCH_EVENTS.labels(result="issued").inc()
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理过期会话，超出窗口仍未命中的预取记为浪费
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的会话数
+        """
+        now = now or time.time()
+        cutoff = now - self.window
+        with closing(self._connect()) as conn:
+            purged = conn.execute("DELETE FROM prefetch_sessions WHERE seen_at < ?", (cutoff,)).rowcount
+            wasted = conn.execute(
+                "UPDATE prefetched SET wasted = 1 WHERE issued_at < ? AND hit_at IS NULL AND wasted = 0", (cutoff,)
+            ).rowcount
+            # 预取记录保留一天，用于统计命中率
+            conn.execute("DELETE FROM prefetched WHERE issued_at < ?", (now - 86400,))
+        if wasted:
+            PREFETCH_EVENTS.labels(result="wasted").inc(wasted)
+        return purged
+    
+    def stats(self) -> Dict[str, Any]:
+        """跳转概率和最近一天的预取命中率（按所有worker发起、已过命中窗口或已命中的预取统计）"""
+        with self._lock:
+            transitions = {
+                source: {
+                    "samples": sum(counts.values()),
+                    "next": {target: round(count / sum(counts.values()), 3) for target, count in counts.most_common(5)}
+                }
+                for source, counts in self._counts.items() if counts
+            }
+        with closing(self._connect()) as conn:
+            issued, hits = conn.execute(
+                "SELECT COUNT(*), COUNT(hit_at) FROM prefetched WHERE hit_at IS NOT NULL OR issued_at < ?",
+                (time.time() - self.window,)
+            ).fetchone()
+        return {
+            "transitions": transitions,
+            "recent_prefetches": issued,
+            "recent_hits": hits,
+            "hit_rate": round(hits / issued, 3) if issued else None,
+            "budget_per_minute": self.budget_per_minute
+        }
+
+
+# 全局预取器实例（延迟创建）
+_prefetcher: Optional[Prefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def get_prefetcher() -> Prefetcher:
+    """获取全局预取器实例"""
+    global _prefetcher
+    if _prefetcher is None:
+        with _prefetcher_lock:
+            if _prefetcher is None:
+                _prefetcher = Prefetcher()
+    return _prefetcher
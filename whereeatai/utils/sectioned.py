@@ -0,0 +1,110 @@
+"""多日内容分段生成
+
+模型延迟主要由输出长度决定，7天的行程或游记一次生成就是一段很长的串行输出。分段生成先用一次简短的调用
+确定逐日大纲（每天的主题和主要地点），再以大纲为共享上下文并发生成每天的内容和收尾部分，按顺序拼接。
+总耗时约为大纲耗时加单天内容的耗时，与天数基本无关。
+"""
+from typing import Callable, Dict, List, Optional
+import re
+import logging
+
+from whereeatai.config import SECTIONED_GENERATION_MIN_DAYS, SECTIONED_GENERATION_CONCURRENCY
+from whereeatai.models.overload import DegradationLevel, get_degradation_level
+from whereeatai.utils.chunking import run_concurrently
+from whereeatai.utils.plan_store import normalize_duration
+
+logger = logging.getLogger(__name__)
+
+# 超过该天数时大纲本身就很长，不再分段
+MAX_SECTIONED_DAYS = 30
+
+_CHINESE_NUMBERS = {"一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_OUTLINE_LINE = re.compile(r"^\W*(?:第|day\s*|d)\s*([0-9一二两三四五六七八九十]+)\s*(?:天|日)?\s*[:：.、\-—)）]?\s*(.*)$", re.IGNORECASE)
+
+
+def duration_days(duration: str) -> Optional[int]:
+    """
+    从行程时长中识别天数（如 "7天6夜"、"7 days"、"七天"）
+    
+    Args:
+        duration: 行程时长
+    
+    Returns:
+        Optional[int]: 天数，无法识别时返回None
+    """
+    match = re.fullmatch(r"(\d+)d", normalize_duration(duration))
+    return int(match.group(1)) if match else None
+
+
+def should_section(days: Optional[int], min_days: int = SECTIONED_GENERATION_MIN_DAYS) -> bool:
+    """天数足够多且未降级时分段生成（分段生成的调用次数和输入token更多，降级时回到单次生成）"""
+    if not min_days or days is None or not min_days <= days <= MAX_SECTIONED_DAYS:
+        return False
+    return get_degradation_level() == DegradationLevel.NORMAL
+
+
+def _parse_number(text: str) -> Optional[int]:
+    """解析阿拉伯数字或不超过九十九的中文数字"""
+    if text.isdigit():
+        return int(text)
+    if "十" in text:
+        tens, _, ones = text.partition("十")
+        return (_CHINESE_NUMBERS.get(tens, 1) if tens else 1) * 10 + (_CHINESE_NUMBERS.get(ones, 0) if ones else 0)
+    return _CHINESE_NUMBERS.get(text)
+
+
+def parse_outline(outline: str, days: int) -> List[str]:
+    """
+    从大纲中提取每天的主题（每行形如 "第1天：主题"），缺失的天为空字符串
+    
+    Args:
+        outline: 大纲文本
+        days: 天数
+    
+    Returns:
+        List[str]: 按天排列的主题
+    """
+    themes: Dict[int, str] = {}
+    for line in outline.splitlines():
+        match = _OUTLINE_LINE.match(line.strip())
+        if not match:
+            continue
+        day = _parse_number(match.group(1))
+        if day and 1 <= day <= days and day not in themes:
+            themes[day] = match.group(2).strip()
+    return [themes.get(day, "") for day in range(1, days + 1)]
+
+
+def generate_sectioned(
+    generate: Callable[[str], str],
+    days: int,
+    outline_prompt: str,
+    day_prompt: Callable[[int, str, str], str],
+    closing_prompt: Optional[Callable[[str], str]] = None,
+    concurrency: int = SECTIONED_GENERATION_CONCURRENCY
+) -> str:
+    """
+    先生成逐日大纲，再并发生成每天的内容（和收尾部分），按顺序拼接
+    
+    Args:
+        generate: 模型调用函数（提示词 -> 生成内容）
+        days: 天数
+        outline_prompt: 大纲提示词（要求每行一天，形如 "第1天：主题"）
+        day_prompt: 生成单天提示词的函数，参数为(第几天, 当天主题, 完整大纲)
+        closing_prompt: 生成收尾部分（住宿、交通、预算等全程内容）提示词的函数，参数为完整大纲
+        concurrency: 同时生成的段数
+    
+    Returns:
+        str: 拼接后的完整内容（大纲、逐日内容、收尾部分）
+    """
+    outline = generate(outline_prompt).strip()
+    themes = parse_outline(outline, days)
+    missing = sum(1 for theme in themes if not theme)
+    if missing:
+        logger.warning(f"大纲中有{missing}/{days}天未识别出主题，按天数生成")
+    prompts = [day_prompt(day, theme, outline) for day, theme in enumerate(themes, 1)]
+    if closing_prompt:
+        prompts.append(closing_prompt(outline))
+    logger.info(f"分段生成: {days}天，{len(prompts)}段并发{concurrency}")
+    sections = run_concurrently(generate, prompts, concurrency)
+    return "\n\n".join([outline] + [section.strip() for section in sections])
@@ -0,0 +1,355 @@
+"""对话式规划会话存储：每个会话保存旅行需求、此前对话的滚动摘要和最近几轮原文
+
+客户端每轮只发送新消息，不必重发完整上下文。原文超过 SESSION_MAX_TURNS 条或 SESSION_HISTORY_CHARS 字时，
+较早的消息合并进滚动摘要（由调用方生成），每轮提示词只包含需求、摘要和最近几轮原文，对话再长大小也基本不变。
+
+会话保存在SQLite中（各worker共享，消息zlib压缩），会话数超过上限时淘汰最久未活动的会话，无活动超过ttl的会话被清理。
+"""
+from typing import Any, Dict, List, Optional
+from contextlib import closing
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+
+from whereeatai.config import (
+    SESSION_DB_PATH,
+    SESSION_MAX_SESSIONS,
+    SESSION_TTL,
+    SESSION_MAX_TURNS,
+    SESSION_RECENT_TURNS,
+    SESSION_HISTORY_CHARS
+)
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+class SessionConflictError(Exception):
+    """同一会话的上一条消息尚未处理完（会话消息数与读取时不一致）"""
+
+
+class SessionNotFoundError(Exception):
+    """会话不存在或已过期（如在读取后、追加消息前被删除）"""
+
+
+def history_chars(turns: List[Dict[str, Any]]) -> int:
+    """对话原文的总字符数"""
+    return sum(len(turn.get("content", "")) for turn in turns)
+
+
+def recent_turns(turns: List[Dict[str, Any]], max_chars: int = SESSION_HISTORY_CHARS) -> List[Dict[str, Any]]:
+    """
+    取不超过max_chars字的最近几条消息（从用户消息开始）
+    
+    Args:
+        turns: 对话原文
+        max_chars: 最大字符数
+    
+    Returns:
+        List[Dict]: 最近的消息
+    """
+    start = len(turns)
+    size = 0
+    while start > 0 and size + len(turns[start - 1].get("content", "")) <= max_chars:
+        start -= 1
+        size += len(turns[start].get("content", ""))
+    while start < len(turns) and turns[start].get("role") != "user":
+        start += 1
+    return turns[start:]
+
+
+def split_for_summary(
+    turns: List[Dict[str, Any]],
+    max_turns: int = SESSION_MAX_TURNS,
+    keep_turns: int = SESSION_RECENT_TURNS,
+    max_chars: int = SESSION_HISTORY_CHARS
+) -> int:
+    """
+    计算需要合并进滚动摘要的消息数
+    
+    原文超过max_turns条或max_chars字时，保留不超过keep_turns条、max_chars一半字数的最近消息
+    （从用户消息开始），其余较早的消息合并进摘要。
+    
+    Args:
+        turns: 对话原文
+        max_turns: 触发合并的消息数
+        keep_turns: 合并后保留原文的消息数
+        max_chars: 触发合并的字符数
+    
+    Returns:
+        int: 从头开始需要合并的消息数，0表示不需要合并
+    """
+    if len(turns) <= max_turns and history_chars(turns) <= max_chars:
+        return 0
+    kept = recent_turns(turns[-keep_turns:] if keep_turns > 0 else [], max_chars // 2)
+    return len(turns) - len(kept)
+
+
+class SessionStore(SQLiteStore):
+    """
+    基于SQLite的会话存储
+    
+    消息按会话的累计消息数做乐观并发控制：追加消息时累计数须与读取时一致，合并摘要时被合并的消息须仍在原文开头，
+    后台合并摘要和新一轮对话互不覆盖。
+    """
+    
+    purge_label = "过期会话"
+    
+    def __init__(
+        self,
+        db_path: str = SESSION_DB_PATH,
+        max_sessions: int = SESSION_MAX_SESSIONS,
+        ttl: int = SESSION_TTL,
+        max_turns: int = SESSION_MAX_TURNS,
+        purge_interval: int = 300
+    ):
+        """
+        初始化会话存储
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            max_sessions: 会话数上限，超出后淘汰最久未活动的会话
+            ttl: 会话无活动多久后过期(秒)
+            max_turns: 触发合并摘要的消息数；合并持续失败时原文最多保留其两倍，超出的最早消息直接丢弃
+            purge_interval: 两次过期清理之间的最小间隔(秒)
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        super().__init__(db_path, purge_interval)
+        logger.info(f"会话存储初始化完成: {self.db_path}")
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS planning_sessions (
+                session_id TEXT PRIMARY KEY,
+                tenant TEXT NOT NULL,
+                context_blob BLOB NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                turns_blob BLOB NOT NULL,
+                turn_count INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_planning_sessions_updated ON planning_sessions(updated_at)")
+    
+    def _row_to_session(self, session_id: str, row) -> Dict[str, Any]:
+        """数据行转换为会话字典"""
+        return {
+            "session_id": session_id,
+            "tenant": row[0],
+            "context": self._decode(row[1]),
+            "summary": row[2],
+            "turns": self._decode(row[3]),
+            "turn_count": row[4],
+            "created_at": row[5],
+            "updated_at": row[6]
+        }
+    
+    def _select(self, conn: sqlite3.Connection, session_id: str, tenant: str):
+        """读取未过期的会话行"""
+        return conn.execute(
+            "SELECT tenant, context_blob, summary, turns_blob, turn_count, created_at, updated_at "
+            "FROM planning_sessions WHERE session_id = ? AND tenant = ? AND updated_at >= ?",
+            (session_id, tenant, time.time() - self.ttl)
+        ).fetchone()
+    
+    def create(self, tenant: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        创建会话，会话数超过上限时淘汰最久未活动的会话
+        
+        Args:
+            tenant: 所属租户
+            context: 旅行需求（目的地、天数、兴趣等）
+        
+        Returns:
+            Dict: 会话
+        """
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO planning_sessions "
+                "(session_id, tenant, context_blob, turns_blob, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, tenant, self._encode(context), self._encode([]), now, now)
+            )
+            evicted = conn.execute(
+                "DELETE FROM planning_sessions WHERE session_id IN "
+                "(SELECT session_id FROM planning_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            ).rowcount
+        if evicted:
+            logger.info(f"会话数超过上限，淘汰最久未活动的会话: {evicted}个")
+        self.maybe_purge()
+        return {
+            "session_id": session_id,
+            "tenant": tenant,
+            "context": context,
+            "summary": "",
+            "turns": [],
+            "turn_count": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+    
+    def get(self, session_id: str, tenant: str) -> Optional[Dict[str, Any]]:
+        """
+        获取会话（只能读取本租户的会话）
+        
+        Args:
+            session_id: 会话ID
+            tenant: 当前租户
+        
+        Returns:
+            Dict: 会话，不存在或已过期返回None
+        """
+        with closing(self._connect()) as conn:
+            row = self._select(conn, session_id, tenant)
+        return self._row_to_session(session_id, row) if row else None
+    
+    def append(self, session_id: str, tenant: str, expected_count: int, turns: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        追加一轮对话的消息
+        
+        Args:
+            session_id: 会话ID
+            tenant: 当前租户
+            expected_count: 读取会话时的累计消息数
+            turns: 新消息
+        
+        Returns:
+            Dict: 更新后的会话，会话不存在或已过期返回None
+        
+        Raises:
+            SessionConflictError: 读取之后会话已有新消息（同一会话并发发送了多条消息）
+        """
+        now = time.time()
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._select(conn, session_id, tenant)
+                if row is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                if row[4] != expected_count:
+                    conn.execute("ROLLBACK")
+                    raise SessionConflictError(f"会话 {session_id} 的上一条消息尚未处理完")
+                history = self._decode(row[3]) + turns
+                # 摘要合并持续失败时限制原文长度，丢弃最早的消息
+                limit = max(2, self.max_turns * 2)
+                if len(history) > limit:
+                    logger.warning(f"会话原文超过{limit}条且未能合并摘要，丢弃最早的{len(history) - limit}条: {session_id}")
+                    history = history[-limit:]
+                conn.execute(
+                    "UPDATE planning_sessions SET turns_blob = ?, turn_count = ?, updated_at = ? WHERE session_id = ?",
+                    (self._encode(history), row[4] + len(turns), now, session_id)
+                )
+                conn.execute("COMMIT")
+            except SessionConflictError:
+                raise
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return {
+            **self._row_to_session(session_id, row),
+            "turns": history,
+            "turn_count": row[4] + len(turns),
+            "updated_at": now
+        }
+    
+    def fold(self, session_id: str, tenant: str, base: int, folded: int, summary: str) -> bool:
+        """
+        把原文开头的消息替换为新的滚动摘要
+        
+        Args:
+            session_id: 会话ID
+            tenant: 当前租户
+            base: 生成摘要时原文第一条消息的累计序号（累计消息数减原文消息数）
+            folded: 合并进摘要的消息数
+            summary: 新的滚动摘要（已包含原摘要的内容）
+        
+        Returns:
+            bool: 是否更新；原文开头已变化（其他worker已合并或消息被丢弃）时不更新
+        """
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._select(conn, session_id, tenant)
+                history = self._decode(row[3]) if row else []
+                if row is None or row[4] - len(history) != base or len(history) < folded:
+                    conn.execute("ROLLBACK")
+                    return False
+                # 合并摘要不算会话活动，不更新updated_at
+                conn.execute(
+                    "UPDATE planning_sessions SET summary = ?, turns_blob = ? WHERE session_id = ?",
+                    (summary, self._encode(history[folded:]), session_id)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return True
+    
+    def delete(self, session_id: str, tenant: str) -> bool:
+        """
+        删除会话
+        
+        Args:
+            session_id: 会话ID
+            tenant: 当前租户
+        
+        Returns:
+            bool: 是否删除
+        """
+        with closing(self._connect()) as conn:
+            deleted = conn.execute(
+                "DELETE FROM planning_sessions WHERE session_id = ? AND tenant = ?", (session_id, tenant)
+            ).rowcount
+        return bool(deleted)
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理无活动超过ttl的会话
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的会话数
+        """
+        with closing(self._connect()) as conn:
+            purged = conn.execute(
+                "DELETE FROM planning_sessions WHERE updated_at < ?", ((now or time.time()) - self.ttl,)
+            ).rowcount
+        if purged:
+            logger.info(f"清理过期会话: {purged}个")
+        return purged
+    
+    def stats(self) -> Dict[str, Any]:
+        """会话数、压缩后大小和上限"""
+        with closing(self._connect()) as conn:
+            count, size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(turns_blob) + LENGTH(summary)), 0) FROM planning_sessions"
+            ).fetchone()
+        return {"sessions": count, "bytes": size, "max_sessions": self.max_sessions, "ttl": self.ttl}
+
+
+# 全局会话存储实例（延迟创建）
+_session_store: Optional[SessionStore] = None
+_session_store_lock = threading.Lock()
+
+
+def get_session_store() -> SessionStore:
+    """获取全局会话存储实例"""
+    global _session_store
+    if _session_store is None:
+        with _session_store_lock:
+            if _session_store is None:
+                _session_store = SessionStore()
+    return _session_store
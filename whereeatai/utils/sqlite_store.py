@@ -0,0 +1,102 @@
+"""SQLite存储基类
+
+检查点、租户用量、刷新租约、预取记录、生成内容、内容指纹和会话存储共用：
+WAL模式、每次操作独立连接（便于多线程和多worker进程共享同一数据库文件）、zlib压缩的JSON、按间隔清理过期数据。
+"""
+from abc import ABC, abstractmethod
+from typing import Any, Optional
+from contextlib import closing
+from pathlib import Path
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+
+def encode_blob(data: Any) -> bytes:
+    """序列化并压缩数据"""
+    return zlib.compress(orjson.dumps(data, default=str), 6)
+
+
+def decode_blob(blob: bytes) -> Any:
+    """解压并反序列化数据"""
+    return orjson.loads(zlib.decompress(blob))
+
+
+class SQLiteStore(ABC):
+    """
+    基于SQLite的存储基类
+    
+    子类实现 _create_tables 和 purge_expired，写入后调用 maybe_purge 按间隔清理过期数据。
+    """
+    
+    # 连接的事务模式：None为自动提交（需要时显式BEGIN IMMEDIATE），""为sqlite3默认的隐式事务
+    isolation_level: Optional[str] = None
+    # 清理失败时日志中的数据名称
+    purge_label = "过期数据"
+    
+    def __init__(self, db_path: str, purge_interval: int = 3600):
+        """
+        初始化存储并创建数据表
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            purge_interval: 两次过期清理之间的最小间隔(秒)
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.purge_interval = purge_interval
+        self._last_purge = 0.0
+        self._purge_lock = threading.Lock()
+        self._init_db()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """创建数据库连接（每次操作独立连接，便于多线程使用）"""
+        return sqlite3.connect(str(self.db_path), timeout=10, isolation_level=self.isolation_level)
+    
+    def _init_db(self):
+        """开启WAL并创建数据表"""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._create_tables(conn)
+    
+    @abstractmethod
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表和索引"""
+        pass
+    
+    _encode = staticmethod(encode_blob)
+    _decode = staticmethod(decode_blob)
+    
+    @abstractmethod
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理过期数据
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的记录数
+        """
+        pass
+    
+    def maybe_purge(self, now: Optional[float] = None):
+        """距上次清理超过purge_interval时执行一次过期清理（同一时间只有一个线程清理，失败只记录日志）"""
+        now = now or time.time()
+        if now - self._last_purge < self.purge_interval:
+            return
+        if not self._purge_lock.acquire(blocking=False):
+            return
+        try:
+            self._last_purge = now
+            self.purge_expired(now)
+        except Exception as e:
+            logger.error(f"清理{self.purge_label}失败: {str(e)}")
+        finally:
+            self._purge_lock.release()
@@ -0,0 +1,311 @@
+"""多租户：API密钥认证、请求/token配额和租户权重"""
+from typing import Dict, Any, List, Optional, Tuple
+from contextlib import closing
+from hashlib import sha256
+from pathlib import Path
+from pydantic import BaseModel, Field
+import json
+import sqlite3
+import threading
+import time
+import logging
+
+from whereeatai.config import TENANTS, TENANT_DB_PATH
+from whereeatai.utils.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# 未配置租户时所有请求归属的默认租户
+DEFAULT_TENANT = "default"
+
+
+class Tenant(BaseModel):
+    """租户配置"""
+    tenant_id: str = Field(..., description="租户ID")
+    api_keys: List[str] = Field(default_factory=list, description="租户的API密钥")
+    weight: float = Field(default=1.0, gt=0.0, description="LLM调用公平调度权重")
+    requests_per_minute: int = Field(default=0, ge=0, description="每分钟请求数上限，0表示不限")
+    tokens_per_day: int = Field(default=0, ge=0, description="每天LLM token用量上限，0表示不限")
+
+
+class TenantUsageStore(SQLiteStore):
+    """
+    基于SQLite的租户用量存储
+    
+    按固定时间窗口（分钟/天）计数，多个worker进程共享同一个数据库文件，配额在进程间一致。
+    """
+    
+    purge_label = "过期用量窗口"
+    
+    def __init__(self, db_path: str = TENANT_DB_PATH, purge_interval: int = 3600):
+        """
+        初始化用量存储
+        
+        Args:
+            db_path: SQLite数据库文件路径
+            purge_interval: 两次过期窗口清理之间的最小间隔(秒)
+        """
+        super().__init__(db_path, purge_interval)
+    
+    def _create_tables(self, conn: sqlite3.Connection):
+        """创建数据表"""
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tenant_usage (
+                tenant TEXT NOT NULL,
+                window TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                tokens INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (tenant, window)
+            )
+            """
+        )
+    
+    @staticmethod
+    def _windows(now: float) -> Tuple[str, str]:
+        """当前的分钟窗口和天窗口（UTC）"""
+        return f"m{int(now // 60)}", f"d{int(now // 86400)}"
+    
+    @staticmethod
+    def _add(conn: sqlite3.Connection, tenant: str, window: str, requests: int, tokens: int, now: float):
+        conn.execute(
+            "INSERT INTO tenant_usage (tenant, window, requests, tokens, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(tenant, window) DO UPDATE SET "
+            "requests = requests + excluded.requests, tokens = tokens + excluded.tokens, "
+            "updated_at = excluded.updated_at",
+            (tenant, window, requests, tokens, now)
+        )
+    
+    @staticmethod
+    def _read(conn: sqlite3.Connection, tenant: str, window: str) -> Tuple[int, int]:
+        row = conn.execute(
+            "SELECT requests, tokens FROM tenant_usage WHERE tenant = ? AND window = ?",
+            (tenant, window)
+        ).fetchone()
+        return (row[0], row[1]) if row else (0, 0)
+    
+    def admit(self, tenant: Tenant) -> Tuple[bool, str, int]:
+        """
+        检查配额并记录一次请求（检查与计数在同一事务中完成）
+        
+        Args:
+            tenant: 租户
+        
+        Returns:
+            Tuple[bool, str, int]: (是否放行, 拒绝原因, 建议重试秒数)
+        """
+        now = time.time()
+        minute, day = self._windows(now)
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if tenant.tokens_per_day:
+                    _, tokens = self._read(conn, tenant.tenant_id, day)
+                    if tokens >= tenant.tokens_per_day:
+                        conn.execute("ROLLBACK")
+                        return False, "今日token配额已用完", int(86400 - now % 86400) + 1
+                if tenant.requests_per_minute:
+                    requests, _ = self._read(conn, tenant.tenant_id, minute)
+                    if requests >= tenant.requests_per_minute:
+                        conn.execute("ROLLBACK")
+                        return False, "请求频率超过配额", int(60 - now % 60) + 1
+                self._add(conn, tenant.tenant_id, minute, 1, 0, now)
+                self._add(conn, tenant.tenant_id, day, 1, 0, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        self.maybe_purge(now)
+        return True, "", 0
+    
+    def charge_tokens(self, tenant_id: str, tokens: int):
+        """
+        按实际LLM用量扣减token配额
+        
+        Args:
+            tenant_id: 租户ID
+            tokens: token数
+        """
+        if tokens <= 0:
+            return
+        now = time.time()
+        _, day = self._windows(now)
+        with closing(self._connect()) as conn:
+            self._add(conn, tenant_id, day, 0, tokens, now)
+    
+    def get_usage(self, tenant_id: str) -> Dict[str, int]:
+        """
+        获取租户当前窗口的用量
+        
+        Args:
+            tenant_id: 租户ID
+        
+        Returns:
+            Dict[str, int]: 本分钟请求数、今日请求数和今日token数
+        """
+        minute, day = self._windows(time.time())
+        with closing(self._connect()) as conn:
+            minute_requests, _ = self._read(conn, tenant_id, minute)
+            day_requests, day_tokens = self._read(conn, tenant_id, day)
+        return {
+            "requests_this_minute": minute_requests,
+            "requests_today": day_requests,
+            "tokens_today": day_tokens
+        }
+    
+    def purge_expired(self, now: Optional[float] = None) -> int:
+        """
+        清理两天前的用量窗口
+        
+        Args:
+            now: 当前时间戳（可选）
+        
+        Returns:
+            int: 清理的窗口数
+        """
+        with closing(self._connect()) as conn:
+            return conn.execute(
+                "DELETE FROM tenant_usage WHERE updated_at < ?", ((now or time.time()) - 2 * 86400,)
+            ).rowcount
+
+
+class TenantRegistry:
+    """
+    租户注册表
+    
+    配置格式:
+        {
+            "partner-a": {"api_keys": ["..."], "weight": 1, "requests_per_minute": 600, "tokens_per_day": 2000000},
+            "web": {"api_keys": ["..."], "weight": 4}
+        }
+    
+    未配置任何租户时不做认证，所有请求归属默认租户且不计配额。
+    """
+    
+    def __init__(self, tenants: Optional[Dict[str, Dict[str, Any]]] = None, db_path: str = TENANT_DB_PATH):
+        """
+        初始化租户注册表
+        
+        Args:
+            tenants: 租户配置
+            db_path: 用量数据库路径
+        """
+        self.tenants: Dict[str, Tenant] = {}
+        self._key_index: Dict[str, str] = {}
+        for tenant_id, config in (tenants or {}).items():
+            tenant = Tenant(tenant_id=tenant_id, **config)
+            self.tenants[tenant_id] = tenant
+            for api_key in tenant.api_keys:
+                self._key_index[self._hash_key(api_key)] = tenant_id
+        self._default = Tenant(tenant_id=DEFAULT_TENANT)
+        self._db_path = db_path
+        self._usage_store: Optional[TenantUsageStore] = None
+        self._store_lock = threading.Lock()
+        if self.tenants:
+            logger.info(f"租户配置加载完成: {list(self.tenants)}")
+    
+    @classmethod
+    def from_config(cls, value: str = TENANTS) -> "TenantRegistry":
+        """
+        从配置值创建租户注册表
+        
+        Args:
+            value: JSON字符串或JSON文件路径
+        
+        Returns:
+            TenantRegistry: 租户注册表
+        """
+        value = (value or "").strip()
+        if not value:
+            return cls()
+        if not value.startswith("{"):
+            value = Path(value).read_text(encoding="utf-8")
+        return cls(json.loads(value))
+    
+    @staticmethod
+    def _hash_key(api_key: str) -> str:
+        """内存中只保存密钥摘要"""
+        return sha256(api_key.encode("utf-8")).hexdigest()
+    
+    @property
+    def enabled(self) -> bool:
+        """是否启用多租户认证"""
+        return bool(self.tenants)
+    
+    @property
+    def usage_store(self) -> TenantUsageStore:
+        """用量存储（首次使用时创建）"""
+        if self._usage_store is None:
+            with self._store_lock:
+                if self._usage_store is None:
+                    self._usage_store = TenantUsageStore(self._db_path)
+        return self._usage_store
+    
+    def authenticate(self, api_key: Optional[str]) -> Optional[Tenant]:
+        """
+        按API密钥查找租户
+        
+        Args:
+            api_key: 请求携带的API密钥
+        
+        Returns:
+            Tenant: 租户，密钥无效返回None
+        """
+        if not api_key:
+            return None
+        tenant_id = self._key_index.get(self._hash_key(api_key))
+        return self.tenants.get(tenant_id) if tenant_id else None
+    
+    def get(self, tenant_id: str) -> Tenant:
+        """获取租户配置，未知租户返回默认配置"""
+        return self.tenants.get(tenant_id, self._default)
+    
+    def admit(self, tenant: Tenant) -> Tuple[bool, str, int]:
+        """
+        检查租户配额并记录请求
+        
+        Returns:
+            Tuple[bool, str, int]: (是否放行, 拒绝原因, 建议重试秒数)
+        """
+        if not self.enabled:
+            return True, "", 0
+        return self.usage_store.admit(tenant)
+    
+    def charge_tokens(self, tenant_id: str, tokens: int):
+        """按实际LLM用量扣减租户token配额"""
+        if not self.enabled or tenant_id not in self.tenants:
+            return
+        try:
+            self.usage_store.charge_tokens(tenant_id, tokens)
+        except sqlite3.Error as e:
+            logger.error(f"记录租户token用量失败: {tenant_id}, 错误: {str(e)}")
+    
+    def get_usage(self, tenant_id: str) -> Dict[str, Any]:
+        """
+        获取租户用量及配额
+        
+        Args:
+            tenant_id: 租户ID
+        
+        Returns:
+            Dict: 用量和配额
+        """
+        tenant = self.get(tenant_id)
+        usage = self.usage_store.get_usage(tenant_id) if self.enabled else {}
+        return {
+            "tenant": tenant.tenant_id,
+            "weight": tenant.weight,
+            "requests_per_minute": tenant.requests_per_minute,
+            "tokens_per_day": tenant.tokens_per_day,
+            "usage": usage
+        }
+
+
+# 全局租户注册表实例
+tenant_registry = TenantRegistry.from_config()
+
+
+def get_tenant_registry() -> TenantRegistry:
+    """获取全局租户注册表实例"""
+    return tenant_registry